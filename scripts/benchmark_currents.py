@@ -0,0 +1,57 @@
+"""
+Compare depth averaged current predictions with and without the precomputed
+complex coefficients.
+
+    python scripts/benchmark_currents.py [currents.nc] [n_points]
+"""
+
+import shutil
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+
+import tidepredictor as tp
+
+source = Path(sys.argv[1] if len(sys.argv) > 1 else "tests/data/currents.nc")
+n_points = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+with tempfile.TemporaryDirectory() as tmp:
+    # the store is saved next to the constituent file
+    path = Path(tmp) / source.name
+    shutil.copy(source, path)
+
+    with xr.open_dataset(path) as ds:
+        lon0, lon1 = float(ds.lon.min()), float(ds.lon.max())
+        lat0, lat1 = float(ds.lat.min()), float(ds.lat.max())
+    rng = np.random.default_rng(0)
+    lons = rng.uniform(lon0, lon1, n_points)
+    lats = rng.uniform(lat0, lat1, n_points)
+
+    for lookup in ["nearest", "bilinear"]:
+        for precompute in [False, True]:
+            repo = tp.NetCDFConstituentRepository(
+                path, keep_open=True, lookup=lookup, precompute=precompute
+            )
+            predictor = tp.CurrentPredictor(repo)
+            for days in [1, 30]:
+
+                def predict() -> None:
+                    predictor.predict_depth_averaged_many(
+                        lons,
+                        lats,
+                        datetime(2024, 1, 1),
+                        datetime(2024, 1, 1) + timedelta(days=days),
+                    )
+
+                predict()  # build the store and the time basis
+                seconds = min(timeit.repeat(predict, number=1, repeat=5))
+                print(
+                    f"{lookup:8} precompute={precompute!s:5} {n_points} points "
+                    f"{days:2} days: {seconds * 1000:8.1f} ms"
+                )
+            repo.close()
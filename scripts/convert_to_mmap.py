@@ -0,0 +1,5 @@
+import tidepredictor as tp
+
+for prediction_type in tp.PredictionType:
+    path = tp.get_default_constituent_path(prediction_type)
+    tp.convert_to_mmap(path, path.with_suffix(".tpc"))
@@ -3,6 +3,7 @@ import polars as pl
 from datetime import datetime, timedelta
 
 import tidepredictor as tp
+from tidepredictor.batch import predict_batch
 
 
 def predict_from_pfs(specs: mikeio.PfsDocument) -> None:
@@ -15,17 +16,17 @@ def predict_from_pfs(specs: mikeio.PfsDocument) -> None:
     points = pl.from_pandas(specs.File_1.to_dataframe("Point")).to_dicts()
 
     fp = tp.get_default_constituent_path(tp.PredictionType.level)
-    repo = tp.NetCDFConstituentRepository(fp)
-    predictor = tp.LevelPredictor(repo)
-    dfs_list = [
-        predictor.predict(
-            lon=p["x"], lat=p["y"], start=start, end=end, interval=timestep
-        ).with_columns(pl.lit(p["description"]).alias("description"))
-        for p in points
-    ]
-    long_df = pl.concat(dfs_list)
-
-    wide_df = long_df.pivot(values="level", index="time", on="description")
+    wide_df = predict_batch(
+        fp,
+        lons=[p["x"] for p in points],
+        lats=[p["y"] for p in points],
+        start=start,
+        end=end,
+        interval=timestep,
+        prediction_type=tp.PredictionType.level,
+        ids=[p["description"] for p in points],
+        wide=True,
+    )
 
     mikeio.from_polars(
         wide_df, items=mikeio.ItemInfo(mikeio.EUMType.Water_Level)
@@ -1,4 +1,7 @@
 import json
+from datetime import datetime
+
+import polars as pl
 from typer.testing import CliRunner
 from tidepredictor.main import app
 
@@ -51,6 +54,51 @@ def test_success_json_file(tmp_path) -> None:
     assert "level" in data[0]
 
 
+def test_json_output_in_chunks():
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        ["-x", -2.75, "-y", 56.1, "-s", "2020-01-01", "-e", "2020-01-03"]
+        + ["--chunk", "1", "--format", "json"],
+    )
+    assert result.exit_code == 0
+
+    data = json.loads(result.stdout)
+    assert len(data) == 2 * 48 + 1
+    assert data[0]["time"].startswith("2020-01-01")
+
+
+def test_ndjson_output():
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        ["-x", -2.75, "-y", 56.1, "-s", "2020-01-01", "-e", "2020-01-02"]
+        + ["--format", "ndjson"],
+    )
+    assert result.exit_code == 0
+
+    rows = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(rows) == 49
+    assert set(rows[0]) == {"time", "level"}
+
+
+def test_arrow_stream_output():
+    import pyarrow as pa
+
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        ["-x", -2.75, "-y", 56.1, "-s", "2020-01-01", "-e", "2020-01-03"]
+        + ["--chunk", "1", "--format", "arrow"],
+    )
+    assert result.exit_code == 0
+
+    reader = pa.ipc.open_stream(result.stdout_bytes)
+    df = pl.from_arrow(reader.read_all())
+    assert df.columns == ["time", "level"]
+    assert len(df) == 2 * 48 + 1
+
+
 def test_output_file(tmp_path) -> None:
     path = tmp_path / "foo.csv"
 
@@ -104,3 +152,173 @@ def test_no_args():
         app,
     )
     assert result.exit_code != 0
+
+
+def test_parquet_file(tmp_path) -> None:
+    path = tmp_path / "foo.parquet"
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        [
+            "-s",
+            "2020-01-01",
+            "-e",
+            "2020-01-05",
+            "-x",
+            -2.75,
+            "-y",
+            56.1,
+            "--chunk",
+            "1",
+            "-o",
+            str(path),
+        ],
+    )
+    assert result.exit_code == 0
+    df = pl.read_parquet(path)
+    assert df.columns == ["time", "level"]
+    assert len(df) == 4 * 48 + 1
+
+
+def test_chunked_csv_is_identical(tmp_path) -> None:
+    runner = CliRunner()
+    args = ["-s", "2020-01-01", "-e", "2020-01-05", "-x", -2.75, "-y", 56.1]
+
+    chunked = runner.invoke(app, args + ["--chunk", "1"])
+    whole = runner.invoke(app, args + ["--chunk", "10"])
+
+    assert chunked.exit_code == 0
+    assert chunked.stdout == whole.stdout
+    assert chunked.stdout.count("time,level") == 1
+
+
+def test_nearest_wet_cell_on_land() -> None:
+    runner = CliRunner()
+    args = [
+        "--lon",
+        "-3.3",
+        "--lat",
+        "55.55",
+        "--start",
+        "2024-01-01",
+        "--end",
+        "2024-01-02",
+    ]
+    land = runner.invoke(app, args)
+    assert land.exit_code == 0
+    levels = pl.read_csv(land.stdout.encode())["level"]
+    assert (levels == 0.0).all()
+
+    result = runner.invoke(app, [*args, "--lookup", "nearest_wet"])
+    assert result.exit_code == 0
+    levels = pl.read_csv(result.stdout.encode())["level"]
+    assert levels.abs().max() > 0.1
+
+
+def test_batch_stations_file(tmp_path) -> None:
+    stations = tmp_path / "stations.csv"
+    stations.write_text(
+        "id,lon,lat,start,end\n"
+        "a,-2.75,56.1,,\n"
+        "b,-3.0,55.9,2020-01-02,2020-01-03\n"
+        "c,-1.9,56.3,,\n"
+    )
+    path = tmp_path / "out.parquet"
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        [
+            "batch",
+            str(stations),
+            "-s",
+            "2020-01-01",
+            "-e",
+            "2020-01-02",
+            "-o",
+            str(path),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    df = pl.read_parquet(path)
+    assert df.columns == ["station", "time", "level"]
+    assert df["station"].unique(maintain_order=True).to_list() == ["a", "b", "c"]
+    assert df.filter(pl.col("station") == "b")["time"].min() == datetime(2020, 1, 2)
+    assert len(df) == 3 * (48 + 1)
+
+
+def test_batch_arrow_output(tmp_path) -> None:
+    stations = tmp_path / "stations.parquet"
+    pl.DataFrame({"lon": [-2.75, -3.0], "lat": [56.1, 55.9]}).write_parquet(stations)
+    path = tmp_path / "out.arrow"
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        [
+            "batch",
+            str(stations),
+            "-s",
+            "2020-01-01",
+            "-e",
+            "2020-01-02",
+            "--type",
+            "current",
+            "--batch-size",
+            "1",
+            "-o",
+            str(path),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    df = pl.read_ipc(path)
+    assert df.columns == ["station", "time", "u", "v"]
+    assert df["station"].unique(maintain_order=True).to_list() == [0, 1]
+
+
+def test_batch_invalid_output(tmp_path) -> None:
+    stations = tmp_path / "stations.csv"
+    stations.write_text("id,lon,lat\na,-2.75,56.1\n")
+    runner = CliRunner()
+    result = runner.invoke(app, ["batch", str(stations), "-o", str(tmp_path / "x.csv")])
+    assert result.exit_code != 0
+
+
+def test_grid_netcdf_output(tmp_path) -> None:
+    import xarray as xr
+
+    output = tmp_path / "grid.nc"
+    runner = CliRunner()
+    result = runner.invoke(
+        app,
+        [
+            "grid",
+            "--bbox",
+            "-3,55.8,-2,56.3",
+            "-s",
+            "2024-01-01",
+            "-e",
+            "2024-01-01T06:00:00",
+            "-i",
+            "60",
+            "--type",
+            "current",
+            "--stride",
+            "2",
+            "-o",
+            str(output),
+        ],
+    )
+
+    assert result.exit_code == 0
+    with xr.open_dataset(output) as ds:
+        assert ds["u"].dims == ("time", "lat", "lon")
+        assert ds.sizes["time"] == 7
+
+
+def test_grid_invalid_bbox(tmp_path) -> None:
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(
+        app, ["grid", "--bbox", "-3,55.8", "-o", str(tmp_path / "grid.nc")]
+    )
+
+    assert result.exit_code == 2
+    assert "west,south,east,north" in result.stderr
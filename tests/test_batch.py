@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from tidepredictor import PredictionType, convert_to_mmap
+from tidepredictor.batch import predict_batch, predict_stations
+
+LONS = [-2.75, -3.0, -1.9, -2.2, -3.3]
+LATS = [56.1, 55.9, 56.3, 55.6, 56.0]
+IDS = ["a", "b", "c", "d", "e"]
+
+
+def test_parallel_level_batch_matches_serial() -> None:
+    kwargs = dict(
+        path=Path("tests/data/level.nc"),
+        lons=LONS,
+        lats=LATS,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 2),
+        interval=timedelta(hours=1),
+        ids=IDS,
+    )
+
+    serial = predict_batch(**kwargs)
+    parallel = predict_batch(workers=2, **kwargs)
+
+    assert parallel["station"].to_list() == serial["station"].to_list()
+    assert parallel["time"].equals(serial["time"])
+    np.testing.assert_allclose(parallel["level"], serial["level"])
+    assert serial["station"].unique(maintain_order=True).to_list() == IDS
+
+
+def test_parallel_current_batch_wide() -> None:
+    df = predict_batch(
+        Path("tests/data/currents.nc"),
+        LONS,
+        LATS,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 2),
+        prediction_type=PredictionType.current,
+        ids=IDS,
+        wide=True,
+        workers=3,
+    )
+
+    assert isinstance(df, pl.DataFrame)
+    assert df.columns == ["time"] + [f"{c}_{i}" for i in IDS for c in ("u", "v")]
+    assert len(df) == 25
+
+
+def test_batch_from_mmap_file(tmp_path) -> None:
+    path = tmp_path / "level.tpc"
+    convert_to_mmap(Path("tests/data/level.nc"), path)
+    kwargs = dict(
+        lons=[-2.0, -2.5],
+        lats=[56.0, 55.8],
+        start=datetime(2022, 1, 1),
+        end=datetime(2022, 1, 3),
+    )
+    expected = predict_batch(Path("tests/data/level.nc"), **kwargs)
+    df = predict_batch(path, **kwargs)
+    np.testing.assert_allclose(df["level"].to_numpy(), expected["level"].to_numpy())
+
+
+def test_empty_batch_with_workers() -> None:
+    df = predict_batch(
+        Path("tests/data/level.nc"),
+        lons=[],
+        lats=[],
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 2),
+        workers=2,
+    )
+    assert len(df) == 0
+
+
+def test_predict_stations_in_workers_keeps_order() -> None:
+    stations = pl.DataFrame(
+        {
+            "id": IDS,
+            "lon": LONS,
+            "lat": LATS,
+            "start": [None, datetime(2024, 1, 2), None, datetime(2024, 1, 2), None],
+        },
+        schema_overrides={"start": pl.Datetime("us")},
+    )
+    kwargs = dict(
+        path=Path("tests/data/level.nc"),
+        stations=stations,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 3),
+        batch_size=2,
+    )
+
+    serial = list(predict_stations(**kwargs))
+    parallel = list(predict_stations(**kwargs, workers=2))
+
+    assert len(parallel) == 3
+    df = pl.concat(parallel)
+    assert df.equals(pl.concat(serial))
+    assert df["station"].unique(maintain_order=True).to_list() == IDS
+    b = df.filter(pl.col("station") == "b")
+    assert b["time"].min() == datetime(2024, 1, 2)
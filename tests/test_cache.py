@@ -0,0 +1,99 @@
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+from typer.testing import CliRunner
+
+from tidepredictor.cache import ResultCache, result_key
+from tidepredictor.main import app
+
+ARGS = ["-x", "-2.75", "-y", "56.1", "-s", "2020-01-01", "-e", "2020-01-03"]
+
+
+def _frame(n: int) -> pl.DataFrame:
+    return pl.DataFrame({"level": np.arange(n, dtype=float)})
+
+
+def test_put_and_get(tmp_path):
+    cache = ResultCache(tmp_path)
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, _frame(10))
+    assert cache.get("ab" * 32).equals(_frame(10))
+    info = cache.info()
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+
+
+def test_key_depends_on_source_and_params(tmp_path):
+    source = tmp_path / "constituents.nc"
+    source.write_bytes(b"x")
+    key = result_key(source, lon=1.0, start=datetime(2020, 1, 1))
+    assert key == result_key(source, start=datetime(2020, 1, 1), lon=1.0)
+    assert key != result_key(source, lon=2.0, start=datetime(2020, 1, 1))
+    assert result_key(source, lons=np.array([1.0])) != result_key(
+        source, lons=np.array([1.0, 2.0])
+    )
+
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert key != result_key(source, lon=1.0, start=datetime(2020, 1, 1))
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache.put("00" * 32, _frame(1000))
+    size = cache.info().nbytes
+    cache.max_bytes = 2 * size
+    cache.put("11" * 32, _frame(1000))
+    # a hit makes the first entry the most recently used
+    os.utime(cache.path("11" * 32), (0, 0))
+    assert cache.get("00" * 32) is not None
+    cache.put("22" * 32, _frame(1000))
+
+    assert cache.get("11" * 32) is None
+    assert cache.get("00" * 32) is not None
+    assert cache.info().entries == 2
+
+
+def test_chunks_are_stored_once_consumed(tmp_path):
+    cache = ResultCache(tmp_path)
+    chunks = cache.cached("ab" * 32, iter([_frame(3), _frame(2)]))
+    assert next(chunks).equals(_frame(3))
+    assert cache.get("ab" * 32) is None
+    (rest,) = list(chunks)
+    assert rest.equals(_frame(2))
+    assert cache.get("ab" * 32).equals(pl.concat([_frame(3), _frame(2)]))
+
+    (stored,) = cache.cached("ab" * 32, iter([]))
+    assert len(stored) == 5
+
+
+def test_concurrent_writers(tmp_path):
+    cache = ResultCache(tmp_path)
+    threads = [
+        threading.Thread(target=cache.put, args=("ab" * 32, _frame(10_000)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.get("ab" * 32).equals(_frame(10_000))
+    assert [p.name for p in cache.path("ab" * 32).parent.iterdir()] == [
+        cache.path("ab" * 32).name
+    ]
+
+
+def test_cli_prediction_is_cached(tmp_path):
+    runner = CliRunner()
+    args = ARGS + ["--cache", "--cache-dir", str(tmp_path)]
+    first = runner.invoke(app, args)
+    assert first.exit_code == 0
+    assert len(list(tmp_path.glob("*/*.arrow"))) == 1
+
+    second = runner.invoke(app, args)
+    assert second.exit_code == 0
+    assert second.stdout == first.stdout
+    assert second.stdout == runner.invoke(app, ARGS).stdout
@@ -1,11 +1,14 @@
+import shutil
 from datetime import datetime, timedelta
 from pathlib import Path
 
 # import mikeio
+import numpy as np
 import polars as pl
 import pytest
 from tidepredictor import (
     CurrentPredictor,
+    LevelPredictor,
     NetCDFConstituentRepository,
 )
 
@@ -78,6 +81,187 @@ def test_predict_current_profile_default_levels() -> None:
     assert depths.max() == pytest.approx(0.0)
 
 
+def test_predict_depth_averaged_many() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    kwargs = dict(
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 2),
+        interval=timedelta(hours=1),
+    )
+
+    df = predictor.predict_depth_averaged_many([-2.75, -3.0], [56.1, 55.9], **kwargs)
+    wide = predictor.predict_depth_averaged_many(
+        [-2.75, -3.0], [56.1, 55.9], ids=["x", "y"], wide=True, **kwargs
+    )
+    single = predictor.predict_depth_averaged(lon=-3.0, lat=55.9, **kwargs)
+
+    assert df.columns == ["station", "time", "u", "v"]
+    assert wide.columns == ["time", "u_x", "v_x", "u_y", "v_y"]
+    stn = df.filter(pl.col("station") == 1)
+    assert np.allclose(stn["u"], single["u"], atol=1e-12)
+    assert np.allclose(wide["v_y"], single["v"], atol=1e-12)
+
+
+def test_predict_depth_averaged_many_with_precomputed_coefficients(tmp_path) -> None:
+    source = tmp_path / "currents.nc"
+    shutil.copy("tests/data/currents.nc", source)
+    kwargs = dict(
+        lons=[-2.75, -2.5, -2.0],
+        lats=[56.1, 56.0, 56.2],
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 3),
+        interval=timedelta(minutes=30),
+    )
+
+    expected = CurrentPredictor(
+        NetCDFConstituentRepository(source)
+    ).predict_depth_averaged_many(**kwargs)
+    df = CurrentPredictor(
+        NetCDFConstituentRepository(source, precompute=True)
+    ).predict_depth_averaged_many(**kwargs)
+
+    # the precomputed coefficients are stored as complex64
+    assert np.allclose(df["u"], expected["u"], atol=1e-5)
+    assert np.allclose(df["v"], expected["v"], atol=1e-5)
+
+
+def test_predict_depth_averaged_at_track_matches_many() -> None:
+    predictor = CurrentPredictor(
+        NetCDFConstituentRepository(Path("tests/data/currents.nc"), lookup="bilinear")
+    )
+    lons = np.array([-2.75, -2.5, -2.0])
+    lats = np.array([56.1, 56.0, 56.2])
+    many = predictor.predict_depth_averaged_many(
+        lons, lats, datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1)
+    )
+    samples = many[np.random.default_rng(1).permutation(len(many))]
+    station = samples["station"].to_numpy()
+
+    df = predictor.predict_depth_averaged_at(
+        lons[station], lats[station], samples["time"].to_numpy(), batch_size=5
+    )
+
+    assert df.columns == ["time", "lon", "lat", "u", "v"]
+    assert np.allclose(df["u"], samples["u"], atol=1e-12)
+    assert np.allclose(df["v"], samples["v"], atol=1e-12)
+
+
+def test_predict_depth_averaged_iter_is_identical() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    kwargs = dict(
+        lon=-2.75,
+        lat=56.1,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 10),
+        interval=timedelta(minutes=10),
+    )
+
+    chunks = predictor.predict_depth_averaged_iter(chunk=timedelta(hours=25), **kwargs)
+
+    assert pl.concat(chunks).equals(predictor.predict_depth_averaged(**kwargs))
+
+
+def test_predict_profile_matches_power_law() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo, alpha=0.2)
+    kwargs = dict(
+        lon=-2.75,
+        lat=56.1,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 1, 5),
+    )
+
+    df = predictor.predict_profile(**kwargs, levels=[-20.0, -5.0])
+    depth_averaged = predictor.predict_depth_averaged(**kwargs)
+    h = repo.get_bathymetry(-2.75, 56.1)
+
+    assert df.columns == [
+        "time",
+        "depth",
+        "uavg",
+        "u",
+        "vavg",
+        "v",
+        "total_water_depth",
+    ]
+    assert (
+        df["time"].to_list()[:4]
+        == [depth_averaged["time"][0]] * 2 + [depth_averaged["time"][1]] * 2
+    )
+    factor = 1.2 * ((np.tile([-20.0, -5.0], 6) + h) / h) ** 0.2
+    assert np.allclose(df["u"], np.repeat(depth_averaged["u"], 2) * factor)
+    assert np.allclose(df["v"], np.repeat(depth_averaged["v"], 2) * factor)
+
+
+def test_predict_profiles_per_point_depths_and_alpha() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    lons, lats = [-2.75, -2.5, -2.0], [56.1, 56.0, 56.2]
+    kwargs = dict(start=datetime(2024, 1, 1), end=datetime(2024, 1, 2))
+
+    profile = predictor.predict_profiles(
+        lons,
+        lats,
+        **kwargs,
+        depths=[[-10.0, -1.0], [-5.0, -2.0], [-1000.0, -3.0]],
+        alpha=[0.1, 0.2, 0.3],
+        ids=["a", "b", "c"],
+    )
+
+    assert profile.u.shape == (25, 2, 3)
+    # each point on its own gives the same profile
+    for i, (lon, lat) in enumerate(zip(lons, lats)):
+        single = CurrentPredictor(repo, alpha=[0.1, 0.2, 0.3][i]).predict_profiles(
+            [lon], [lat], **kwargs, depths=profile.depth[:, i]
+        )
+        assert np.allclose(single.u[:, :, 0], profile.u[:, :, i], equal_nan=True)
+    # below the bed
+    assert np.isnan(profile.u[:, 0, 2]).all()
+    assert not np.isnan(profile.u[:, 1, 2]).any()
+
+    df = profile.to_frame()
+    assert len(df) == 25 * 2 * 3
+    assert df["station"].unique(maintain_order=True).to_list() == ["a", "b", "c"]
+    assert np.allclose(df.filter(station="b", depth=-2.0)["v"], profile.v[:, 1, 1])
+
+    ds = profile.to_xarray()
+    assert ds.u.dims == ("time", "level", "point")
+    assert ds.depth.dims == ("level", "point")
+    assert list(ds.station.values) == ["a", "b", "c"]
+
+
+def test_predict_profiles_with_tidal_water_depth() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    level_repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    lons, lats = [-2.75, -2.5], [56.1, 56.0]
+    kwargs = dict(start=datetime(2024, 1, 1), end=datetime(2024, 1, 3))
+
+    profile = predictor.predict_profiles(
+        lons, lats, **kwargs, depths=[-20.0, -1.0], level_repo=level_repo
+    )
+
+    level = LevelPredictor(level_repo).predict_many(lons, lats, **kwargs, wide=True)
+    currents = predictor.predict_depth_averaged_many(lons, lats, **kwargs, wide=True)
+    assert profile.level is not None
+    assert np.allclose(profile.level, level.drop("time").to_numpy())
+    assert np.allclose(profile.uavg, currents.select("u_0", "u_1").to_numpy())
+    assert np.allclose(profile.vavg, currents.select("v_0", "v_1").to_numpy())
+
+    bathymetry = repo.get_bathymetry_batch(lons, lats)
+    h = bathymetry + profile.level
+    assert np.allclose(profile.water_depth, h)
+    factor = (1 + 1 / 7) * ((-20.0 + h) / h) ** (1 / 7)
+    assert np.allclose(profile.u[:, 0, :], profile.uavg * factor)
+
+    df = profile.to_frame()
+    assert "level" in df.columns
+    assert df["total_water_depth"].n_unique() > 2
+    assert profile.to_xarray().total_water_depth.dims == ("time", "point")
+
+
 # def test_utide_vs_mike_precalculated_currents():
 #     ds = mikeio.read("tests/data/tide_currents.dfs0")
 #     v_item = "Tidal current component (geographic North) (Current (0,0))"
@@ -105,3 +289,76 @@ def test_predict_current_profile_default_levels() -> None:
 
 #     diff = both["utide"] - both["mike"]
 #     assert diff.abs().max() < 0.0008
+
+
+def test_current_events_match_dense_prediction() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 3)
+
+    events = predictor.events(lon=-2.5, lat=56.0, start=start, end=end)
+    dense = predictor.predict_depth_averaged(
+        -2.5, 56.0, start, end, timedelta(seconds=10)
+    )
+
+    speed = np.hypot(dense["u"].to_numpy(), dense["v"].to_numpy())
+    rate = np.sign(np.diff(speed))
+    turning = np.nonzero(rate[1:] != rate[:-1])[0] + 1
+    extrema = events.filter(pl.col("type") != "reversal")
+    assert events.columns == ["time", "type", "speed", "direction"]
+    assert events["time"].is_sorted()
+    assert len(extrema) == len(turning)
+    expected = np.where(rate[turning] > 0, "slack", "peak")
+    assert (extrema["type"].to_numpy() == expected).all()
+    lag = extrema["time"].to_numpy() - dense["time"].to_numpy()[turning]
+    assert np.abs(lag).max() <= np.timedelta64(10, "s")
+    assert np.allclose(extrema["speed"], speed[turning], atol=1e-5)
+    # a reversal next to every slack water of this nearly rectilinear current
+    assert (events["type"] == "reversal").sum() == (events["type"] == "slack").sum()
+
+
+def test_current_events_iter_chunks_match_events_many() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    args = ([-2.75, -2.5], [56.1, 56.0], datetime(2024, 1, 1), datetime(2024, 1, 9))
+
+    chunks = list(predictor.events_iter(*args, chunk=timedelta(days=2)))
+    df = predictor.events_many(*args)
+
+    assert all(
+        c["time"].max() - c["time"].min() < timedelta(days=2) for c in chunks if len(c)
+    )
+    merged = pl.concat(chunks).sort("station", maintain_order=True)
+    assert merged.select("station", "time", "type").equals(
+        df.select("station", "time", "type")
+    )
+    assert np.allclose(merged["speed"], df["speed"])
+
+
+def test_slack_windows_are_below_the_threshold() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    predictor = CurrentPredictor(constituent_repo=repo)
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 3)
+
+    windows = predictor.slack_windows(
+        [-2.5, -2.0], [56.0, 56.2], start, end, threshold=0.1, ids=["a", "b"]
+    )
+    dense = predictor.predict_depth_averaged_many(
+        [-2.5, -2.0], [56.0, 56.2], start, end, timedelta(minutes=1), ids=["a", "b"]
+    ).with_columns(speed=(pl.col("u") ** 2 + pl.col("v") ** 2).sqrt())
+
+    assert windows.columns == ["station", "start", "end"]
+    assert (windows["start"] < windows["end"]).all()
+
+    def within(margin: int) -> pl.DataFrame:
+        return dense.join_where(
+            windows.rename({"station": "window"}),
+            pl.col("station") == pl.col("window"),
+            pl.col("time") >= pl.col("start").dt.offset_by(f"{margin}s"),
+            pl.col("time") <= pl.col("end").dt.offset_by(f"{-margin}s"),
+        )
+
+    assert (within(1)["speed"] < 0.1).all()
+    # every slow minute is in a window
+    slow = dense.filter(pl.col("speed") < 0.1)
+    assert (within(-1)["speed"] < 0.1).sum() == len(slow)
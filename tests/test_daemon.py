@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+from tidepredictor.daemon import DaemonError, PredictionServer
+from tidepredictor.main import app
+
+ARGS = ["-x", "-2.75", "-y", "56.1", "-s", "2020-01-01", "-e", "2020-01-03"]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    path = tmp_path / "tp.sock"
+    server = PredictionServer(path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_forwarded_prediction_is_identical(daemon):
+    runner = CliRunner()
+    local = runner.invoke(app, ARGS)
+    served = runner.invoke(app, ARGS + ["--socket", str(daemon)])
+    assert served.exit_code == 0
+    assert served.stdout == local.stdout
+
+    served = runner.invoke(
+        app, ARGS + ["--socket", str(daemon), "--type", "current", "--format", "json"]
+    )
+    assert served.exit_code == 0
+    assert (
+        served.stdout
+        == runner.invoke(app, ARGS + ["--type", "current", "--format", "json"]).stdout
+    )
+
+
+def test_forwarded_prediction_to_file(daemon, tmp_path):
+    import polars as pl
+
+    path = tmp_path / "out.parquet"
+    result = CliRunner().invoke(app, ARGS + ["--socket", str(daemon), "-o", str(path)])
+    assert result.exit_code == 0
+    assert len(pl.read_parquet(path)) == 2 * 48 + 1
+
+
+def test_daemon_error_is_reported(daemon):
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(app, ["-x", "10.0", "-y", "56.1", "--socket", str(daemon)])
+    assert result.exit_code == 1
+    assert "outside" in result.stderr
+    assert result.stdout == ""
+
+
+def test_no_daemon_predicts_in_process(tmp_path):
+    runner = CliRunner()
+    result = runner.invoke(app, ARGS + ["--socket", str(tmp_path / "none.sock")])
+    assert result.exit_code == 0
+    assert result.stdout.startswith("time,level\n")
+
+
+def test_second_daemon_on_same_socket(daemon):
+    with pytest.raises(DaemonError):
+        PredictionServer(daemon)
+
+
+def test_stale_socket_is_replaced(tmp_path):
+    path = tmp_path / "tp.sock"
+    PredictionServer(path).socket.close()
+    # the socket file is left behind without a listener
+    assert path.exists()
+    server = PredictionServer(path)
+    server.server_close()
+    assert not path.exists()
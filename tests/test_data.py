@@ -1,7 +1,22 @@
+import multiprocessing
+import os
+import pickle
+import shutil
+
+import numpy as np
 import pytest
+import xarray as xr
 from pathlib import Path
-from tidepredictor import PredictionType, get_default_constituent_path
-from tidepredictor.data import ConstituentReader
+from tidepredictor import (
+    MmapConstituentRepository,
+    NetCDFConstituentRepository,
+    PredictionType,
+    convert_to_mmap,
+    get_default_constituent_path,
+)
+from tidepredictor.coefficients import CurrentCoefficientStore, uv_coefficients
+from tidepredictor.data import ConstituentReader, Lookup
+from tidepredictor.index import WetCellIndex, great_circle_distance
 
 
 @pytest.fixture
@@ -65,3 +80,416 @@ def test_get_default_constiutent_path() -> None:
         assert "minor_axis" in ds.variables
         assert "inclination" in ds.variables
         assert "phase" in ds.variables
+
+
+def test_keep_open_reuses_handle(level_constituent_file_path) -> None:
+    reader = ConstituentReader(level_constituent_file_path, keep_open=True)
+
+    first = reader.get_level_constituents(lat=56.1, lon=-2.75)
+    handle = reader._handle
+    second = reader.get_level_constituents(lat=56.1, lon=-2.75)
+
+    assert handle is not None
+    assert reader._handle is handle
+    assert first == second
+
+    reader.close()
+    assert reader._handle is None
+
+
+def test_repository_context_manager(level_constituent_file_path) -> None:
+    with NetCDFConstituentRepository(level_constituent_file_path) as repo:
+        depth = repo.get_bathymetry(lon=-2.75, lat=56.1)
+        const = repo.get_level_constituents(lon=-2.75, lat=56.1)
+        assert repo._reader._handle is not None
+
+    assert depth > 0
+    assert "M2" in const
+    assert repo._reader._handle is None
+
+    # the file is no longer kept open after the block
+    repo.get_bathymetry(lon=-2.75, lat=56.1)
+    assert not repo._reader.keep_open
+    assert repo._reader._handle is None
+
+
+def _m2_amplitude(repo: NetCDFConstituentRepository, queue=None) -> float:
+    amplitude = repo.get_level_constituents(lon=-2.75, lat=56.1)["M2"].amplitude
+    if queue is not None:
+        queue.put((repo._reader._handle.pid, amplitude))
+    return amplitude
+
+
+def test_keep_open_after_fork(level_constituent_file_path) -> None:
+    repo = NetCDFConstituentRepository(level_constituent_file_path, keep_open=True)
+    expected = _m2_amplitude(repo)
+    parent_pid = repo._reader._handle.pid
+
+    # with fork the repository (and its open handle) is inherited, not pickled
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_m2_amplitude, args=(repo, queue))
+    proc.start()
+    child_pid, amplitude = queue.get(timeout=30)
+    proc.join()
+
+    assert proc.exitcode == 0
+    assert child_pid != parent_pid
+    assert amplitude == expected
+    # the parent handle is still usable
+    assert _m2_amplitude(repo) == expected
+    assert repo._reader._handle.pid == parent_pid
+    repo.close()
+
+
+def test_keep_open_repository_can_be_pickled(level_constituent_file_path) -> None:
+    repo = NetCDFConstituentRepository(level_constituent_file_path, keep_open=True)
+    expected = _m2_amplitude(repo)
+
+    copy = pickle.loads(pickle.dumps(repo))
+
+    assert _m2_amplitude(copy) == expected
+    copy.close()
+    repo.close()
+
+
+def test_batch_level_constituents_match_single_point(
+    level_constituent_file_path,
+) -> None:
+    repo = NetCDFConstituentRepository(level_constituent_file_path)
+    lons = np.array([-2.75, -3.0, -1.9])
+    lats = np.array([56.1, 55.9, 56.3])
+
+    arrays = repo.get_level_constituents_batch(lons, lats)
+
+    assert arrays.amplitude.shape == (3, len(arrays.names))
+    assert arrays.phase.shape == (3, len(arrays.names))
+    for i, (lon, lat) in enumerate(zip(lons, lats)):
+        const = repo.get_level_constituents(lon=lon, lat=lat)
+        assert list(const.keys()) == arrays.names
+        assert [c.amplitude for c in const.values()] == arrays.amplitude[i].tolist()
+        assert [c.phase for c in const.values()] == arrays.phase[i].tolist()
+
+
+def test_batch_current_constituents_and_bathymetry(
+    current_constituent_file_path,
+) -> None:
+    repo = NetCDFConstituentRepository(current_constituent_file_path)
+    lons = [-2.75, -3.0]
+    lats = [56.1, 55.9]
+
+    arrays = repo.get_current_constituents_batch(lons, lats)
+    depths = repo.get_bathymetry_batch(lons, lats)
+
+    n = len(arrays.names)
+    assert arrays.major_axis.shape == (2, n)
+    assert arrays.minor_axis.shape == (2, n)
+    assert arrays.inclination.shape == (2, n)
+    assert arrays.phase.shape == (2, n)
+    assert depths[0] == repo.get_bathymetry(lon=-2.75, lat=56.1)
+    const = repo.get_current_constituents(lon=-3.0, lat=55.9)
+    assert const["M2"].major_axis == arrays.major_axis[1, arrays.names.index("M2")]
+
+
+def test_batch_outside_data_fails(level_constituent_file_path) -> None:
+    repo = NetCDFConstituentRepository(level_constituent_file_path)
+
+    with pytest.raises(ValueError, match="outside"):
+        repo.get_level_constituents_batch([-2.75, -10.0], [56.1, 56.1])
+
+
+@pytest.fixture
+def level_mmap_path(level_constituent_file_path, tmp_path) -> Path:
+    path = tmp_path / "level.tpc"
+    convert_to_mmap(level_constituent_file_path, path, block_rows=7)
+    return path
+
+
+def test_mmap_level_matches_netcdf(level_constituent_file_path, level_mmap_path):
+    lons = np.array([-3.4, -2.81, -2.0, -1.52])
+    lats = np.array([55.51, 55.91, 56.2, 56.46])
+    expected = NetCDFConstituentRepository(level_constituent_file_path)
+    repo = MmapConstituentRepository(level_mmap_path)
+
+    arrays = repo.get_level_constituents_batch(lons, lats)
+    reference = expected.get_level_constituents_batch(lons, lats)
+    assert list(arrays.names) == list(reference.names)
+    np.testing.assert_array_equal(arrays.amplitude, reference.amplitude)
+    np.testing.assert_array_equal(arrays.phase, reference.phase)
+    np.testing.assert_allclose(
+        repo.get_bathymetry_batch(lons, lats),
+        expected.get_bathymetry_batch(lons, lats),
+    )
+    assert repo.get_level_constituents(lon=-2.81, lat=55.91) == (
+        expected.get_level_constituents(lon=-2.81, lat=55.91)
+    )
+
+
+def test_mmap_current_matches_netcdf(current_constituent_file_path, tmp_path):
+    path = tmp_path / "currents.tpc"
+    convert_to_mmap(current_constituent_file_path, path)
+    lons = np.array([-3.4, -2.81, -2.0])
+    lats = np.array([55.51, 55.91, 56.2])
+    expected = NetCDFConstituentRepository(
+        current_constituent_file_path
+    ).get_current_constituents_batch(lons, lats)
+
+    arrays = MmapConstituentRepository(path).get_current_constituents_batch(lons, lats)
+    for field in ["phase", "major_axis", "minor_axis", "inclination"]:
+        np.testing.assert_array_equal(getattr(arrays, field), getattr(expected, field))
+
+
+def test_mmap_wrong_kind_or_outside_fails(level_mmap_path):
+    repo = MmapConstituentRepository(level_mmap_path)
+    with pytest.raises(ValueError, match="level"):
+        repo.get_current_constituents(lon=-2.0, lat=56.0)
+    with pytest.raises(ValueError, match="outside"):
+        repo.get_level_constituents(lon=0.0, lat=56.0)
+
+
+def test_mmap_repository_can_be_pickled(level_mmap_path):
+    repo = MmapConstituentRepository(level_mmap_path)
+    repo.get_bathymetry(lon=-2.0, lat=56.0)
+    clone = pickle.loads(pickle.dumps(repo))
+    assert clone.get_bathymetry(lon=-2.0, lat=56.0) == repo.get_bathymetry(
+        lon=-2.0, lat=56.0
+    )
+
+
+@pytest.fixture
+def level_copy_path(level_constituent_file_path, tmp_path) -> Path:
+    # the wet cell index is saved next to the file
+    path = tmp_path / "level.nc"
+    shutil.copy(level_constituent_file_path, path)
+    return path
+
+
+def test_nearest_wet_avoids_land(level_copy_path) -> None:
+    lons, lats = [-3.3, -2.0], [55.55, 56.0]
+    nearest = NetCDFConstituentRepository(level_copy_path)
+    wet = NetCDFConstituentRepository(level_copy_path, lookup="nearest_wet")
+
+    land = nearest.get_level_constituents_batch(lons, lats)
+    assert np.all(land.amplitude[0] == 0.0)
+
+    arrays = wet.get_level_constituents_batch(lons, lats)
+    assert np.all(arrays.amplitude[0] > 0.0)
+    # points in the water are not moved
+    np.testing.assert_array_equal(arrays.amplitude[1], land.amplitude[1])
+    assert arrays.snap_distance is not None
+    assert arrays.snap_distance[0] > arrays.snap_distance[1]
+    assert wet.get_bathymetry(-3.3, 55.55) > 0.0
+
+    cells = wet.locate(lons, lats)
+    np.testing.assert_allclose(cells.distance, arrays.snap_distance)
+    snapped = nearest.get_level_constituents_batch(cells.lon, cells.lat)
+    np.testing.assert_array_equal(snapped.amplitude, arrays.amplitude)
+
+
+def test_nearest_wet_matches_brute_force(level_copy_path) -> None:
+    ds = xr.open_dataset(level_copy_path)
+    lon_grid, lat_grid = np.meshgrid(ds.lon.values, ds.lat.values)
+    wet = ds.bathymetry.transpose("lat", "lon").values < 0
+    rng = np.random.default_rng(1)
+    lons = rng.uniform(-3.46, -1.51, 200)
+    lats = rng.uniform(55.51, 56.46, 200)
+
+    cells = NetCDFConstituentRepository(level_copy_path, lookup="nearest_wet").locate(
+        lons, lats
+    )
+
+    distance = great_circle_distance(
+        lons[:, None], lats[:, None], lon_grid[wet][None, :], lat_grid[wet][None, :]
+    )
+    np.testing.assert_allclose(cells.distance, distance.min(axis=1))
+    assert np.all(wet[cells.ilat, cells.ilon])
+
+
+def test_wet_cell_index_sidecar(level_copy_path) -> None:
+    repo = NetCDFConstituentRepository(level_copy_path, lookup="nearest_wet")
+    repo.locate([-3.3], [55.55])
+    sidecar = WetCellIndex.sidecar_path(level_copy_path)
+    assert sidecar.exists()
+    assert WetCellIndex.load(sidecar, level_copy_path) is not None
+
+    # a modified constituent file invalidates the index
+    os.utime(level_copy_path, ns=(0, 0))
+    assert WetCellIndex.load(sidecar, level_copy_path) is None
+
+
+def test_mmap_nearest_wet_matches_netcdf(level_copy_path, tmp_path) -> None:
+    path = tmp_path / "level.tpc"
+    convert_to_mmap(level_copy_path, path)
+    lons, lats = [-3.3, -2.9, -2.0], [55.55, 55.6, 56.0]
+
+    expected = NetCDFConstituentRepository(
+        level_copy_path, lookup="nearest_wet"
+    ).get_level_constituents_batch(lons, lats)
+    arrays = MmapConstituentRepository(
+        path, lookup="nearest_wet"
+    ).get_level_constituents_batch(lons, lats)
+    np.testing.assert_array_equal(arrays.amplitude, expected.amplitude)
+    np.testing.assert_allclose(arrays.snap_distance, expected.snap_distance)
+
+
+def test_bilinear_at_cell_centre_matches_nearest(level_copy_path) -> None:
+    ds = xr.open_dataset(level_copy_path)
+    lons, lats = ds.lon.values[[45, 50]], ds.lat.values[[25, 20]]
+    nearest = NetCDFConstituentRepository(level_copy_path)
+    bilinear = NetCDFConstituentRepository(level_copy_path, lookup="bilinear")
+
+    expected = nearest.get_level_constituents_batch(lons, lats)
+    arrays = bilinear.get_level_constituents_batch(lons, lats)
+    np.testing.assert_allclose(arrays.amplitude, expected.amplitude, rtol=1e-6)
+    np.testing.assert_allclose(arrays.phase, expected.phase, atol=1e-4)
+    np.testing.assert_allclose(
+        bilinear.get_bathymetry_batch(lons, lats),
+        nearest.get_bathymetry_batch(lons, lats),
+    )
+
+
+def test_bilinear_is_continuous_between_cells(level_copy_path) -> None:
+    ds = xr.open_dataset(level_copy_path)
+    boundary = (ds.lon.values[40] + ds.lon.values[41]) / 2
+    lons = [boundary - 1e-6, boundary + 1e-6]
+    lats = [ds.lat.values[15]] * 2
+
+    def jump(lookup: Lookup) -> float:
+        repo = NetCDFConstituentRepository(level_copy_path, lookup=lookup)
+        amplitude = repo.get_level_constituents_batch(lons, lats).amplitude
+        return np.abs(amplitude[1] - amplitude[0]).max()
+
+    assert jump("bilinear") < 1e-4 * jump("nearest")
+
+
+def test_bilinear_ignores_land_cells(level_copy_path) -> None:
+    ds = xr.open_dataset(level_copy_path)
+    wet = ds.bathymetry.transpose("lat", "lon").values < 0
+    # a point between cells on the coast line
+    ilat = 15
+    ilon = np.nonzero(~wet[ilat, :-1] & wet[ilat, 1:])[0][0]
+    lon = (ds.lon.values[ilon] + ds.lon.values[ilon + 1]) / 2
+    lat = (ds.lat.values[ilat] + ds.lat.values[ilat + 1]) / 2
+
+    arrays = NetCDFConstituentRepository(
+        level_copy_path, lookup="bilinear"
+    ).get_level_constituents_batch([lon], [lat])
+    m2 = arrays.names.index("M2")
+    neighbours = ds.amplitude.sel(cons="M2").values[ilat : ilat + 2, ilon : ilon + 2]
+    wet_neighbours = neighbours[wet[ilat : ilat + 2, ilon : ilon + 2]]
+    assert wet_neighbours.min() - 1e-6 <= arrays.amplitude[0, m2]
+    assert arrays.amplitude[0, m2] <= wet_neighbours.max() + 1e-6
+
+
+def test_bilinear_surrounded_by_land_uses_nearest_wet(level_copy_path) -> None:
+    lons, lats = [-3.3], [55.55]
+    arrays = NetCDFConstituentRepository(
+        level_copy_path, lookup="bilinear"
+    ).get_level_constituents_batch(lons, lats)
+    expected = NetCDFConstituentRepository(
+        level_copy_path, lookup="nearest_wet"
+    ).get_level_constituents_batch(lons, lats)
+    np.testing.assert_allclose(arrays.amplitude, expected.amplitude, rtol=1e-6)
+    np.testing.assert_allclose(arrays.snap_distance, expected.snap_distance)
+
+
+def test_mmap_bilinear_matches_netcdf(current_constituent_file_path, tmp_path) -> None:
+    source = tmp_path / "currents.nc"
+    shutil.copy(current_constituent_file_path, source)
+    path = tmp_path / "currents.tpc"
+    convert_to_mmap(source, path)
+    rng = np.random.default_rng(2)
+    lons = rng.uniform(-3.46, -1.51, 20)
+    lats = rng.uniform(55.51, 56.46, 20)
+
+    expected = NetCDFConstituentRepository(
+        source, lookup="bilinear"
+    ).get_current_constituents_batch(lons, lats)
+    arrays = MmapConstituentRepository(
+        path, lookup="bilinear"
+    ).get_current_constituents_batch(lons, lats)
+    np.testing.assert_allclose(arrays.major_axis, expected.major_axis)
+    np.testing.assert_allclose(arrays.inclination, expected.inclination)
+    np.testing.assert_allclose(arrays.snap_distance, expected.snap_distance)
+
+
+def test_nearest_wet_without_bathymetry(level_constituent_file_path, tmp_path) -> None:
+    # land is stored as zero amplitudes when there is no bathymetry
+    path = tmp_path / "level.nc"
+    with xr.open_dataset(level_constituent_file_path) as ds:
+        ds.drop_vars("bathymetry").to_netcdf(path)
+
+    arrays = NetCDFConstituentRepository(
+        path, lookup="nearest_wet"
+    ).get_level_constituents_batch([-3.3], [55.55])
+    assert np.all(arrays.amplitude[0] > 0.0)
+
+
+def test_wet_cell_index_save_failure_leaves_no_files(tmp_path) -> None:
+    index = WetCellIndex.from_mask(
+        np.array([0.0, 1.0]), np.array([0.0, 1.0]), np.ones((2, 2), dtype=bool)
+    )
+    with pytest.raises(OSError):
+        index.save(tmp_path / "grid.nc.wetcells.npz", tmp_path / "missing.nc")
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("lookup", ["nearest", "nearest_wet", "bilinear"])
+def test_precomputed_current_coefficients_match_ellipses(
+    current_constituent_file_path, tmp_path, lookup
+) -> None:
+    source = tmp_path / "currents.nc"
+    shutil.copy(current_constituent_file_path, source)
+    path = tmp_path / "currents.tpc"
+    convert_to_mmap(source, path)
+    rng = np.random.default_rng(3)
+    lons = rng.uniform(-3.46, -1.51, 20)
+    lats = rng.uniform(55.51, 56.46, 20)
+
+    ccons = NetCDFConstituentRepository(
+        source, lookup=lookup
+    ).get_current_constituents_batch(lons, lats)
+    expected = uv_coefficients(
+        ccons.major_axis, ccons.minor_axis, ccons.inclination, ccons.phase
+    )
+    for repo in [
+        NetCDFConstituentRepository(source, lookup=lookup, precompute=True),
+        MmapConstituentRepository(path, lookup=lookup, precompute=True),
+    ]:
+        arrays = repo.get_current_coefficients_batch(lons, lats)
+        assert arrays.names == ccons.names
+        # stored as complex64
+        np.testing.assert_allclose(arrays.uv, expected, atol=1e-6)
+        np.testing.assert_allclose(arrays.snap_distance, ccons.snap_distance)
+
+
+def test_current_coefficient_sidecar(current_constituent_file_path, tmp_path) -> None:
+    source = tmp_path / "currents.nc"
+    shutil.copy(current_constituent_file_path, source)
+    repo = NetCDFConstituentRepository(source, precompute=True)
+    repo.get_current_coefficients_batch([-2.75], [56.1])
+    sidecar = CurrentCoefficientStore.sidecar_path(source)
+    assert sidecar.exists()
+    store = CurrentCoefficientStore.load(sidecar, source)
+    assert store is not None
+    assert store.uv.shape == (30, 60, 26)
+
+    # a copy of the repository maps the saved store
+    copy = pickle.loads(pickle.dumps(repo))
+    np.testing.assert_array_equal(
+        copy.get_current_coefficients_batch([-2.75], [56.1]).uv,
+        repo.get_current_coefficients_batch([-2.75], [56.1]).uv,
+    )
+
+    # a modified constituent file invalidates the store
+    os.utime(source, ns=(0, 0))
+    assert CurrentCoefficientStore.load(sidecar, source) is None
+
+
+def test_current_coefficients_without_precompute(current_constituent_file_path):
+    repo = NetCDFConstituentRepository(current_constituent_file_path)
+    arrays = repo.get_current_coefficients_batch([-2.75], [56.1])
+    assert arrays.uv.shape == (1, 26)
+    assert not CurrentCoefficientStore.sidecar_path(
+        current_constituent_file_path
+    ).exists()
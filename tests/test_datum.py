@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from tidepredictor import LevelPredictor, NetCDFConstituentRepository
+from tidepredictor.prediction.datum import DATUMS, tidal_datums
+
+
+def test_datums_match_brute_force_prediction() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    lons = [-2.75, -2.5, -2.0]
+    lats = [56.1, 56.0, 56.2]
+    start, period = datetime(2024, 1, 1), timedelta(days=60)
+
+    datums = tidal_datums(
+        repo, lons, lats, ids=["a", "b", "c"], start=start, period=period
+    )
+    dense = LevelPredictor(repo).predict_many(
+        lons, lats, start, start + period, timedelta(minutes=1), wide=True
+    )
+
+    assert datums.columns == ["station", *DATUMS]
+    assert datums["station"].to_list() == ["a", "b", "c"]
+    for i, station in enumerate(["a", "b", "c"]):
+        level = dense[str(i)].to_numpy()
+        rate = np.sign(np.diff(level))
+        turning = np.nonzero(rate[1:] != rate[:-1])[0] + 1
+        high = turning[rate[turning] < 0]
+        low = turning[rate[turning] > 0]
+        row = datums.row(i, named=True)
+        # the dense series samples the extremes to within a minute
+        assert level.max() <= row["HAT"] < level.max() + 1e-4
+        assert level.min() - 1e-4 < row["LAT"] <= level.min()
+        assert np.isclose(row["MHW"], level[high].mean(), atol=1e-4)
+        assert np.isclose(row["MLW"], level[low].mean(), atol=1e-4)
+        assert row["LAT"] < row["MLWS"] < row["MLWN"] < row["MSL"]
+        assert row["MSL"] < row["MHWN"] < row["MHWS"] < row["HAT"]
+
+
+def test_datums_do_not_depend_on_batches_and_chunks() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    lons = [-2.75, -2.5, -2.0]
+    lats = [56.1, 56.0, 56.2]
+    kwargs = dict(start=datetime(2024, 1, 1), period=timedelta(days=30))
+
+    whole = tidal_datums(repo, lons, lats, **kwargs)
+    parts = tidal_datums(
+        repo, lons, lats, batch_size=2, chunk=timedelta(days=4), **kwargs
+    )
+
+    assert np.allclose(
+        whole.drop("station").to_numpy(), parts.drop("station").to_numpy()
+    )
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from tidepredictor import (
+    CurrentPredictor,
+    LevelPredictor,
+    MmapConstituentRepository,
+    NetCDFConstituentRepository,
+    convert_to_mmap,
+)
+from tidepredictor.grid import predict_grid, write_netcdf
+from tidepredictor.prediction.harmonics import time_grid
+
+BBOX = (-3.0, 55.8, -2.0, 56.3)
+TIMES = time_grid(datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1))
+
+
+def test_level_grid_matches_point_predictions() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+
+    ds = xr.concat(list(predict_grid(repo, BBOX, TIMES, chunk_size=10)), "time")
+
+    assert ds["level"].dims == ("time", "lat", "lon")
+    assert ds["level"].dtype == np.float32
+    assert (ds["time"].values == TIMES).all()
+    assert ds["lon"].min() >= BBOX[0] and ds["lon"].max() <= BBOX[2]
+    assert ds["lat"].min() >= BBOX[1] and ds["lat"].max() <= BBOX[3]
+    lon, lat = np.meshgrid(ds["lon"].values, ds["lat"].values)
+    wet = ~np.isnan(ds["level"].values[0])
+    assert 0 < wet.sum() < wet.size
+    points = LevelPredictor(repo).predict_many(
+        lon[wet], lat[wet], TIMES[0], TIMES[-1], timedelta(hours=1), wide=True
+    )
+    assert np.allclose(
+        ds["level"].values[:, wet], points.drop("time").to_numpy(), atol=1e-5
+    )
+
+
+def test_current_grid_with_stride_matches_points(tmp_path: Path) -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+
+    ds = xr.concat(list(predict_grid(repo, BBOX, TIMES, stride=3)), "time")
+
+    full = next(predict_grid(repo, BBOX, TIMES[:1]))
+    assert (ds["lon"].values == full["lon"].values[::3]).all()
+    assert (ds["lat"].values == full["lat"].values[::3]).all()
+    lon, lat = np.meshgrid(ds["lon"].values, ds["lat"].values)
+    wet = ~np.isnan(ds["u"].values[0])
+    points = CurrentPredictor(repo).predict_depth_averaged_many(
+        lon[wet], lat[wet], TIMES[0], TIMES[-1], timedelta(hours=1), wide=True
+    )
+    for item in ["u", "v"]:
+        expected = points.select(f"^{item}_.*$").to_numpy()
+        assert np.allclose(ds[item].values[:, wet], expected, atol=1e-5)
+
+
+def test_mmap_grid_is_identical(tmp_path: Path) -> None:
+    path = tmp_path / "currents.tpc"
+    convert_to_mmap(Path("tests/data/currents.nc"), path)
+    netcdf = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+
+    expected = next(predict_grid(netcdf, BBOX, TIMES, stride=2))
+    actual = next(predict_grid(MmapConstituentRepository(path), BBOX, TIMES, stride=2))
+
+    xr.testing.assert_identical(actual, expected)
+
+
+def test_write_netcdf_appends_compressed_chunks(tmp_path: Path) -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    path = tmp_path / "grid.nc"
+
+    write_netcdf(path, predict_grid(repo, BBOX, TIMES, chunk_size=7))
+
+    expected = xr.concat(list(predict_grid(repo, BBOX, TIMES)), "time")
+    with xr.open_dataset(path) as ds:
+        assert (ds["time"].values == TIMES).all()
+        assert ds["level"].encoding["zlib"]
+        assert ds["level"].encoding["chunksizes"] == (
+            1,
+            ds.sizes["lat"],
+            ds.sizes["lon"],
+        )
+        xr.testing.assert_allclose(ds["level"], expected["level"])
+
+
+def test_bbox_outside_the_domain(tmp_path: Path) -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    path = tmp_path / "grid.nc"
+
+    with pytest.raises(ValueError, match="longitude"):
+        write_netcdf(path, predict_grid(repo, (5.0, 55.8, 6.0, 56.3), TIMES))
+    assert not path.exists()
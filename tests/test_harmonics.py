@@ -0,0 +1,230 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from tidepredictor import (
+    CurrentPredictor,
+    LevelPredictor,
+    NetCDFConstituentRepository,
+)
+from tidepredictor.prediction.coef import Coef
+from tidepredictor.prediction.harmonics import (
+    BasisCache,
+    align_coefficients,
+    astronomical_arguments,
+    basis_cache,
+    datenum,
+    derivative_coefficients,
+    from_datenum,
+    grid_basis,
+    nodal_corrections,
+    time_basis,
+    time_grid,
+    ut_constants,
+)
+
+# the constituents are stored as float32, which the utide path keeps in its
+# complex coefficients while the native engine works in float64, the two agree
+# to within 1e-6 m (m/s)
+TOLERANCE = 1e-6
+
+POINTS = [(-2.75, 56.1), (-3.2, 55.7), (-1.6, 56.4)]
+
+
+@pytest.mark.parametrize("lon,lat", POINTS)
+def test_native_level_matches_utide(lon, lat) -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    kwargs = dict(
+        lon=lon,
+        lat=lat,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 2, 1),
+        interval=timedelta(minutes=30),
+    )
+
+    native = LevelPredictor(repo).predict(**kwargs)
+    reference = LevelPredictor(repo, backend="utide").predict(**kwargs)
+
+    assert native["time"].equals(reference["time"])
+    assert native["time"].dtype == reference["time"].dtype
+    np.testing.assert_allclose(native["level"], reference["level"], atol=TOLERANCE)
+
+
+@pytest.mark.parametrize("lon,lat", POINTS)
+def test_native_current_matches_utide(lon, lat) -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/currents.nc"))
+    kwargs = dict(
+        lon=lon,
+        lat=lat,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 2, 1),
+        interval=timedelta(minutes=30),
+    )
+
+    native = CurrentPredictor(repo).predict_depth_averaged(**kwargs)
+    reference = CurrentPredictor(repo, backend="utide").predict_depth_averaged(**kwargs)
+
+    assert native["time"].equals(reference["time"])
+    np.testing.assert_allclose(native["u"], reference["u"], atol=TOLERANCE)
+    np.testing.assert_allclose(native["v"], reference["v"], atol=TOLERANCE)
+
+
+def test_nodal_corrections_match_utide() -> None:
+    from utide.harmonics import FUV
+    from utide import ut_constants
+
+    names = ("MM", "MF", "O1", "K1", "M2", "S2", "K2", "MN4", "M4", "MS4")
+    unames = ut_constants["const"]["name"].tolist()
+    lind = np.array([unames.index(n) for n in names])
+    t = datenum(
+        time_grid(datetime(2020, 1, 1), datetime(2039, 1, 1), timedelta(days=5))
+    )
+
+    F, U, V = FUV(t, t[0], lind, 56.1, [0, 0, 0, 0])
+    F_native, U_native = nodal_corrections(t, names, lat=56.1)
+    V_native = astronomical_arguments(t, names)
+
+    def cycle_diff(a, b):
+        return np.abs((a - b + 0.5) % 1 - 0.5)
+
+    np.testing.assert_allclose(F_native, F, atol=1e-12)
+    assert cycle_diff(U_native, U).max() < 1e-12
+    assert cycle_diff(V_native, V).max() < 1e-12
+
+
+def test_time_grid_includes_end() -> None:
+    times = time_grid(datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1))
+
+    assert len(times) == 25
+    assert times[-1] == np.datetime64("2024-01-02T00:00", "ns")
+
+
+def test_basis_cache_counts_hits_and_evicts() -> None:
+    names = ("M2", "S2")
+    cache = BasisCache(max_bytes=2 * 25 * 4 * 8)  # room for two 25x4 matrices
+    start = datetime(2024, 1, 1)
+    hour = timedelta(hours=1)
+
+    first = grid_basis(start, hour, 25, names, cache=cache)
+    again = grid_basis(start, hour, 25, names, cache=cache)
+
+    assert again is first
+    assert not first.matrix.flags.writeable
+    assert cache.info().hits == 1
+    assert cache.info().misses == 1
+
+    grid_basis(start + hour, hour, 25, names, cache=cache)
+    grid_basis(start + 2 * hour, hour, 25, names, cache=cache)
+
+    info = cache.info()
+    assert info.entries == 2
+    assert info.nbytes <= info.max_bytes
+    # the least recently used (first) entry was evicted
+    assert grid_basis(start, hour, 25, names, cache=cache) is not first
+
+
+def test_cached_basis_matches_uncached() -> None:
+    names = ("K1", "M2", "M4")
+    start = datetime(2024, 3, 1)
+    cached = grid_basis(start, timedelta(minutes=10), 100, names, cache=BasisCache())
+    times = time_grid(start, start + timedelta(minutes=990), timedelta(minutes=10))
+
+    np.testing.assert_array_equal(
+        cached.matrix, time_basis(datenum(times), names).matrix
+    )
+
+
+def test_predictors_share_basis_cache() -> None:
+    basis_cache.clear()
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = LevelPredictor(repo)
+    kwargs = dict(start=datetime(2024, 1, 1), end=datetime(2024, 1, 3))
+
+    first = predictor.predict(lon=-2.75, lat=56.1, **kwargs)
+    second = predictor.predict(lon=-3.0, lat=55.9, **kwargs)
+
+    info = basis_cache.info()
+    assert info.misses == 1
+    assert info.hits == 1
+    assert not first["level"].equals(second["level"])
+
+
+def test_aligned_coefficients_give_the_same_prediction() -> None:
+    times = time_grid(datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1))
+    names = ("M2", "S2")
+    coefficients = np.array([[0.5, 0.1], [0.2, 0.3], [0.1, 0.0], [0.4, 0.2]])
+
+    aligned = align_coefficients(coefficients, names, ("K1", "S2", "M2"))
+
+    assert aligned.shape == (6, 2)
+    assert np.allclose(
+        time_basis(datenum(times), ("K1", "S2", "M2")).synthesize(aligned),
+        time_basis(datenum(times), names).synthesize(coefficients),
+    )
+
+
+def test_derivative_coefficients_match_finite_differences() -> None:
+    names = ("M2", "S2", "K1", "M4")
+    coefficients = np.array([[0.5, 0.2], [0.1, -0.3], [0.2, 0.0], [0.01, 0.05]] * 2)
+    t = datenum(
+        time_grid(datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1))
+    )
+    dt = 1e-5
+
+    derivative = time_basis(t, names).synthesize(
+        derivative_coefficients(coefficients, names)
+    )
+    upper = time_basis(t + dt, names).synthesize(coefficients)
+    lower = time_basis(t - dt, names).synthesize(coefficients)
+
+    assert np.allclose(derivative, (upper - lower) / (2 * dt), rtol=1e-5, atol=1e-6)
+
+
+def test_from_datenum_inverts_datenum() -> None:
+    times = time_grid(
+        datetime(1990, 1, 1), datetime(2040, 1, 1), timedelta(days=97, seconds=7)
+    )
+
+    assert (from_datenum(datenum(times)) == times).all()
+
+
+def test_complex_synthesis_matches_real_and_imaginary_parts() -> None:
+    names = ("M2", "S2", "K1")
+    rng = np.random.default_rng(1)
+    cu, cv = rng.normal(size=(2, 6, 4))
+    basis = time_basis(
+        datenum(
+            time_grid(datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1))
+        ),
+        names,
+    )
+
+    uv = basis.synthesize_complex(cu + 1j * cv)
+    single = basis.synthesize_complex(cu[:, 0] + 1j * cv[:, 0])
+
+    assert np.allclose(uv.real, basis.synthesize(cu))
+    assert np.allclose(uv.imag, basis.synthesize(cv))
+    assert np.allclose(single, uv[:, 0])
+
+
+def test_prepared_coefficients_share_the_constituent_skeleton() -> None:
+    names = ("M2", "S2", "K1")
+    first = Coef.level(names, [1.0, 0.5, 0.2], [10.0, 20.0, 30.0])
+    second = Coef.level(names, [0.9, 0.4, 0.1], [15.0, 25.0, 35.0])
+    current = Coef.current(names, [1.0] * 3, [0.1] * 3, [45.0] * 3, [0.0] * 3)
+
+    assert first.skeleton is second.skeleton
+    assert current.skeleton is not first.skeleton
+    assert current.as_dict()["aux"]["opt"]["twodim"]
+    assert not first.as_dict()["aux"]["opt"]["twodim"]
+    assert list(first.skeleton.aux["lind"]) == [
+        ut_constants()["const"]["name"].tolist().index(name) for name in names
+    ]
+    with pytest.raises(AttributeError):
+        first.A = np.zeros(3)
+    with pytest.raises(ValueError):
+        first.g[0] = 0.0
+    with pytest.raises(ValueError, match="Unknown constituent"):
+        Coef.level(("M2", "XX"), [1.0, 1.0], [0.0, 0.0])
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+# seconds, importing the level predictor took about 1.8 s when it pulled in
+# xarray, pandas and utide and takes about 0.3 s without them
+IMPORT_BUDGET = 1.0
+
+_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+print(" ".join(sys.modules))
+"""
+
+
+def _import(statement: str) -> tuple[float, set[str]]:
+    """Time an import statement in a fresh interpreter, and the modules loaded."""
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(statement=statement)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, modules = result.stdout.splitlines()
+    return float(seconds), set(modules.split())
+
+
+def test_import_package_is_cheap():
+    _, modules = _import("import tidepredictor")
+    assert not {"polars", "xarray", "pandas", "utide"} & modules
+
+
+def test_import_level_predictor_within_budget():
+    seconds, modules = _import(
+        "from tidepredictor import LevelPredictor, NetCDFConstituentRepository"
+    )
+    assert not {"xarray", "pandas", "utide"} & modules
+    assert seconds < IMPORT_BUDGET
@@ -0,0 +1,67 @@
+import numpy as np
+
+from tidepredictor.interpolation import (
+    bilinear_stencil,
+    interpolate_current,
+    interpolate_level,
+    land_aware_weights,
+)
+from tidepredictor.prediction.harmonics import current_coefficients, level_coefficients
+
+
+def test_bilinear_stencil_weights() -> None:
+    grid_lon = np.array([0.0, 1.0, 2.0])
+    grid_lat = np.array([10.0, 11.0])
+    ilon, ilat, weights = bilinear_stencil(
+        grid_lon, grid_lat, np.array([0.5, 2.0]), np.array([10.25, 10.0])
+    )
+    np.testing.assert_array_equal(ilon[0], [0, 1, 0, 1])
+    np.testing.assert_array_equal(ilat[0], [0, 0, 1, 1])
+    np.testing.assert_allclose(weights[0], [0.375, 0.375, 0.125, 0.125])
+    # on the last grid line all weight is on the last cell
+    assert weights[1, ilon[1] == 2].sum() == 1.0
+
+
+def test_bilinear_stencil_descending_coordinates() -> None:
+    ilon, ilat, weights = bilinear_stencil(
+        np.array([0.0, 1.0]), np.array([11.0, 10.0]), np.array([0.0]), np.array([10.25])
+    )
+    np.testing.assert_allclose(weights[0, ilat[0] == 1], [0.75, 0.0])
+    np.testing.assert_allclose(weights[0, ilat[0] == 0], [0.25, 0.0])
+
+
+def test_land_aware_weights_renormalise() -> None:
+    weights = np.array([[0.25, 0.25, 0.25, 0.25], [0.5, 0.5, 0.0, 0.0]])
+    wet = np.array([[True, False, True, False], [False, False, True, True]])
+    np.testing.assert_allclose(
+        land_aware_weights(weights, wet), [[0.5, 0.0, 0.5, 0.0], [0.0, 0.0, 0.0, 0.0]]
+    )
+
+
+def test_interpolated_phase_wraps_around() -> None:
+    amplitude = np.ones((1, 4, 1))
+    phase = np.array([359.0, 1.0, 359.0, 1.0]).reshape(1, 4, 1)
+    _, g = interpolate_level(amplitude, phase, np.full((1, 4), 0.25))
+    assert min(g.item(), 360.0 - g.item()) < 1e-9
+
+
+def test_interpolation_is_linear_in_basis_coefficients() -> None:
+    rng = np.random.default_rng(3)
+    shape = (6, 4, 5)
+    amplitude = rng.uniform(0.1, 2.0, shape)
+    phase = rng.uniform(0, 360, shape)
+    major = rng.uniform(0.1, 1.0, shape)
+    minor = rng.uniform(-0.2, 0.2, shape)
+    inclination = rng.uniform(0, 180, shape)
+    weights = rng.dirichlet(np.ones(4), size=6)
+
+    A, g = interpolate_level(amplitude, phase, weights)
+    expected = np.einsum("ps,ksp->kp", weights, level_coefficients(amplitude, phase))
+    np.testing.assert_allclose(level_coefficients(A, g), expected, atol=1e-12)
+
+    g, ma, mi, th = interpolate_current(phase, major, minor, inclination, weights)
+    assert np.all((th >= 0) & (th < 180))
+    cu, cv = current_coefficients(major, minor, inclination, phase)
+    iu, iv = current_coefficients(ma, mi, th, g)
+    np.testing.assert_allclose(iu, np.einsum("ps,ksp->kp", weights, cu), atol=1e-12)
+    np.testing.assert_allclose(iv, np.einsum("ps,ksp->kp", weights, cv), atol=1e-12)
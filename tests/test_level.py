@@ -2,7 +2,9 @@ from datetime import datetime, timedelta
 from pathlib import Path
 
 # import mikeio
+import numpy as np
 import polars as pl
+import pytest
 from tidepredictor import (
     LevelPredictor,
     NetCDFConstituentRepository,
@@ -100,3 +102,149 @@ def test_utide_returns_dataframe_with_levels() -> None:
 
 #     diff = both["utide"] - both["mike"]
 #     assert diff.abs().max() < 0.08
+
+
+def test_predict_many_matches_single_point() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = LevelPredictor(constituent_repo=repo)
+    lons = [-2.75, -3.0, -1.9]
+    lats = [56.1, 55.9, 56.3]
+    kwargs = dict(
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 3),
+        interval=timedelta(hours=1),
+    )
+
+    df = predictor.predict_many(lons, lats, ids=["a", "b", "c"], **kwargs)
+
+    assert df.columns == ["station", "time", "level"]
+    assert len(df) == 3 * 49
+    for station, lon, lat in zip(["a", "b", "c"], lons, lats):
+        single = predictor.predict(lon=lon, lat=lat, **kwargs)
+        stn = df.filter(pl.col("station") == station)
+        assert stn["time"].equals(single["time"])
+        assert np.allclose(stn["level"], single["level"], atol=1e-12)
+
+
+@pytest.mark.parametrize("lookup", ["nearest", "bilinear"])
+def test_predict_at_track_matches_predict_many(lookup) -> None:
+    predictor = LevelPredictor(
+        NetCDFConstituentRepository(Path("tests/data/level.nc"), lookup=lookup)
+    )
+    lons = np.array([-2.75, -2.5, -2.0])
+    lats = np.array([56.1, 56.0, 56.2])
+    many = predictor.predict_many(
+        lons, lats, datetime(2024, 1, 1), datetime(2024, 1, 2), timedelta(hours=1)
+    )
+    # the samples of a track in random order, several per cell
+    samples = many[np.random.default_rng(0).permutation(len(many))]
+    station = samples["station"].to_numpy()
+
+    df = predictor.predict_at(
+        lons[station], lats[station], samples["time"].to_numpy(), batch_size=7
+    )
+
+    assert df.columns == ["time", "lon", "lat", "level"]
+    assert df["time"].equals(samples["time"])
+    assert np.allclose(df["level"], samples["level"], atol=1e-12)
+
+
+def test_predict_at_irregular_times_of_one_point() -> None:
+    predictor = LevelPredictor(NetCDFConstituentRepository(Path("tests/data/level.nc")))
+    times = np.array(
+        ["2024-01-01T03:00", "2024-01-01T00:00", "2024-01-01T01:30"],
+        dtype="datetime64[ns]",
+    )
+    single = predictor.predict(
+        lon=-2.75,
+        lat=56.1,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 1, 3),
+        interval=timedelta(minutes=30),
+    )
+
+    df = predictor.predict_at(-2.75, 56.1, times)
+
+    assert np.allclose(df["level"], single["level"].to_numpy()[[6, 0, 3]], atol=1e-12)
+    assert predictor.predict_at(-2.75, 56.1, times[:0]).is_empty()
+    with pytest.raises(ValueError, match="positions"):
+        predictor.predict_at([-2.75, -2.5], [56.1, 56.0], times)
+
+
+def test_predict_many_wide() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = LevelPredictor(constituent_repo=repo)
+
+    df = predictor.predict_many(
+        [-2.75, -3.0],
+        [56.1, 55.9],
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 1, 2),
+        wide=True,
+    )
+
+    assert df.columns == ["time", "0", "1"]
+    assert len(df) == 25
+
+
+def test_predict_iter_is_identical_to_predict() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = LevelPredictor(constituent_repo=repo)
+    kwargs = dict(
+        lon=-2.75,
+        lat=56.1,
+        start=datetime(2024, 1, 1),
+        end=datetime(2024, 3, 1, 7),
+        interval=timedelta(minutes=7),
+    )
+
+    chunks = list(predictor.predict_iter(chunk=timedelta(days=3), **kwargs))
+    df = predictor.predict(**kwargs)
+
+    assert len(chunks) == 21
+    assert all(len(c) <= 3 * 24 * 60 // 7 for c in chunks)
+    assert pl.concat(chunks).equals(df)
+
+
+def test_extrema_match_dense_prediction() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = LevelPredictor(constituent_repo=repo)
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 4)
+
+    events = predictor.extrema(lon=-2.5, lat=56.0, start=start, end=end)
+    dense = predictor.predict(-2.5, 56.0, start, end, timedelta(seconds=10))
+
+    level = dense["level"].to_numpy()
+    rate = np.sign(np.diff(level))
+    turning = np.nonzero(rate[1:] != rate[:-1])[0] + 1
+    assert events.columns == ["time", "level", "type"]
+    assert len(events) == len(turning)
+    assert (
+        events["type"].to_numpy() == np.where(rate[turning] > 0, "low", "high")
+    ).all()
+    lag = events["time"].to_numpy() - dense["time"].to_numpy()[turning]
+    assert np.abs(lag).max() <= np.timedelta64(10, "s")
+    assert np.allclose(events["level"], level[turning], atol=1e-5)
+
+
+def test_extrema_many_matches_single_station_across_chunks() -> None:
+    repo = NetCDFConstituentRepository(Path("tests/data/level.nc"))
+    predictor = LevelPredictor(constituent_repo=repo)
+    lons = [-2.75, -2.5, -2.0]
+    lats = [56.1, 56.0, 56.2]
+    start, end = datetime(2024, 1, 1), datetime(2024, 2, 1)
+
+    df = predictor.extrema_many(
+        lons, lats, start, end, ids=["a", "b", "c"], chunk=timedelta(days=2)
+    )
+
+    assert df.columns == ["station", "time", "level", "type"]
+    assert df["station"].unique(maintain_order=True).to_list() == ["a", "b", "c"]
+    for station, lon, lat in zip(["a", "b", "c"], lons, lats):
+        single = predictor.extrema(lon, lat, start, end)
+        stn = df.filter(pl.col("station") == station).drop("station")
+        assert stn["time"].is_sorted()
+        assert stn["time"].equals(single["time"])
+        assert np.allclose(stn["level"], single["level"])
+        # highs and lows alternate
+        assert (stn["type"] != stn["type"].shift(1)).all()
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+import pytest
+
+from tidepredictor import (
+    LevelPredictor,
+    NetCDFConstituentRepository,
+    PredictionType,
+    get_default_constituent_path,
+)
+from tidepredictor.cache import ResultCache
+from tidepredictor.service import PredictionService
+
+PERIOD = "start=2020-01-01&end=2020-01-02"
+
+
+@contextlib.contextmanager
+def _serve(service: PredictionService):
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    port = server.sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+        service.close()
+
+
+@pytest.fixture
+def service():
+    # a long window, so that concurrent test requests are coalesced
+    service = PredictionService(workers=2, window=0.5)
+    with _serve(service) as url:
+        yield service, url
+
+
+def _get(url: str):
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def test_single_point(service):
+    _, url = service
+    rows = _get(f"{url}/predict?lon=-2.75&lat=56.1&{PERIOD}")
+
+    repo = NetCDFConstituentRepository(
+        get_default_constituent_path(PredictionType.level)
+    )
+    expected = LevelPredictor(repo).predict(
+        -2.75, 56.1, datetime(2020, 1, 1), datetime(2020, 1, 2)
+    )
+    assert len(rows) == 24 * 2 + 1
+    assert set(rows[0]) == {"time", "level"}
+    # the default interval is 30 minutes
+    assert np.allclose([r["level"] for r in rows[::2]], expected["level"])
+
+
+def test_concurrent_requests_are_coalesced(service):
+    service, url = service
+    lats = [55.9, 56.0, 56.1, 56.2]
+    with ThreadPoolExecutor(len(lats)) as pool:
+        results = list(
+            pool.map(
+                lambda lat: _get(f"{url}/predict?lon=-2.75&lat={lat}&{PERIOD}"),
+                lats,
+            )
+        )
+
+    metrics = _get(f"{url}/metrics")
+    assert metrics["coalescing"]["batches"] == 1
+    assert metrics["coalescing"]["largest_batch"] == len(lats)
+    assert metrics["endpoints"]["/predict"]["requests"] == len(lats)
+
+    # each request gets its own point
+    for lat, rows in zip(lats, results):
+        alone = _get(f"{url}/predict?lon=-2.75&lat={lat}&{PERIOD}&interval=29")
+        assert rows[0]["level"] == pytest.approx(alone[0]["level"])
+
+
+def test_repeated_request_is_cached(service):
+    _, url = service
+    first = _get(f"{url}/predict?lon=-2.75&lat=56.1&{PERIOD}")
+    second = _get(f"{url}/predict?lon=-2.75&lat=56.1&{PERIOD}")
+    assert first == second
+
+    cache = _get(f"{url}/metrics")["result_cache"]
+    assert cache["hits"] == 1
+    assert cache["misses"] == 1
+
+
+def test_disk_cache_is_shared_between_services(tmp_path):
+    query = f"/predict?lon=-2.75&lat=56.1&{PERIOD}"
+    with _serve(PredictionService(disk_cache=ResultCache(tmp_path))) as url:
+        first = _get(url + query)
+        assert _get(f"{url}/metrics")["disk_cache"]["misses"] == 1
+    with _serve(PredictionService(disk_cache=ResultCache(tmp_path))) as url:
+        assert _get(url + query) == first
+        cache = _get(f"{url}/metrics")["disk_cache"]
+    assert cache["hits"] == 1
+    assert cache["entries"] == 1
+
+
+def test_bad_point_does_not_fail_others(service):
+    _, url = service
+    with ThreadPoolExecutor(2) as pool:
+        good = pool.submit(_get, f"{url}/predict?lon=-2.75&lat=56.1&{PERIOD}")
+        bad = pool.submit(_get, f"{url}/predict?lon=10.0&lat=56.1&{PERIOD}")
+        assert len(good.result()) == 49
+        with pytest.raises(urllib.error.HTTPError) as e:
+            bad.result()
+    assert e.value.code == 400
+    assert "outside" in json.load(e.value)["error"]
+
+
+def test_batch_endpoint(service):
+    _, url = service
+    body = {
+        "start": "2020-01-01",
+        "end": "2020-01-02",
+        "interval": 60,
+        "type": "current",
+        "stations": [
+            {"id": "a", "lon": -2.75, "lat": 56.1},
+            {"id": "b", "lon": -2.5, "lat": 56.0},
+        ],
+    }
+    request = urllib.request.Request(
+        f"{url}/predict", data=json.dumps(body).encode(), method="POST"
+    )
+    with urllib.request.urlopen(request) as response:
+        df = pl.DataFrame(json.load(response))
+    assert df.columns == ["station", "time", "u", "v"]
+    assert df["station"].unique(maintain_order=True).to_list() == ["a", "b"]
+    assert len(df) == 2 * 25
+
+
+@pytest.mark.parametrize(
+    "path, code",
+    [
+        ("/predict?lat=56.1", 400),
+        ("/predict?lon=-2.75&lat=56.1&type=wind", 400),
+        ("/nothing", 404),
+    ],
+)
+def test_errors(service, path, code):
+    _, url = service
+    with pytest.raises(urllib.error.HTTPError) as e:
+        _get(f"{url}{path}")
+    assert e.value.code == code
@@ -1,9 +1,35 @@
 """Tidepredictor package."""
 
+import importlib
 from enum import Enum
 from pathlib import Path
-from .prediction import LevelPredictor, CurrentPredictor
-from .data import NetCDFConstituentRepository
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .prediction import LevelPredictor, CurrentPredictor
+    from .data import (
+        MmapConstituentRepository,
+        NetCDFConstituentRepository,
+        convert_to_mmap,
+    )
+
+# the predictors and repositories are imported on first access, keeping
+# `import tidepredictor` (and the CLI startup) cheap
+_LAZY = {
+    "LevelPredictor": ".prediction",
+    "CurrentPredictor": ".prediction",
+    "MmapConstituentRepository": ".data",
+    "NetCDFConstituentRepository": ".data",
+    "convert_to_mmap": ".data",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class PredictionType(str, Enum):
@@ -37,5 +63,7 @@ __all__ = [
     "CurrentPredictor",
     "PredictionType",
     "NetCDFConstituentRepository",
+    "MmapConstituentRepository",
+    "convert_to_mmap",
     "get_default_constituent_path",
 ]
@@ -0,0 +1,349 @@
+"""
+Parallel predictions for batches of stations.
+
+The stations are split into contiguous parts, one per worker process. Each
+worker opens its own repository once and predicts its part with a single
+shared time basis. The results are concatenated in station order.
+
+`predict_stations` yields the predictions for a stations table part by part,
+so that large batches can be written without holding all of it in memory.
+"""
+
+import math
+import multiprocessing
+from collections import deque
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+from numpy.typing import ArrayLike
+
+from tidepredictor import PredictionType
+from tidepredictor.data import (
+    ConstituentRepository,
+    Lookup,
+    MmapConstituentRepository,
+    NetCDFConstituentRepository,
+)
+from tidepredictor.prediction import CurrentPredictor, LevelPredictor
+
+# repository opened by each worker process
+_worker_repo: ConstituentRepository | None = None
+
+
+def _open_repository(
+    path: Path, lookup: Lookup = "nearest"
+) -> NetCDFConstituentRepository | MmapConstituentRepository:
+    if Path(path).suffix == ".nc":
+        return NetCDFConstituentRepository(path, keep_open=True, lookup=lookup)
+    return MmapConstituentRepository(path, lookup=lookup)
+
+
+def _init_worker(path: Path, lookup: Lookup) -> None:
+    global _worker_repo
+    _worker_repo = _open_repository(path, lookup)
+
+
+def _executor(
+    workers: int, path: Path, lookup: Lookup, lons: np.ndarray, lats: np.ndarray
+) -> ProcessPoolExecutor:
+    """
+    A pool of workers, each with its own repository.
+
+    The workers are spawned rather than forked, forking a process with live
+    polars or BLAS threads can deadlock the child.
+    """
+    if lookup != "nearest":
+        # build the wet cell index once, before the workers load it
+        with _open_repository(path, lookup) as repo:
+            repo.locate(lons[:1], lats[:1])
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(path, lookup),
+    )
+
+
+def _predict_part(
+    repo: ConstituentRepository,
+    prediction_type: PredictionType,
+    lons: np.ndarray,
+    lats: np.ndarray,
+    ids: list,
+    start: datetime,
+    end: datetime,
+    interval: timedelta,
+    wide: bool,
+) -> pl.DataFrame:
+    match prediction_type:
+        case PredictionType.level:
+            return LevelPredictor(repo).predict_many(
+                lons, lats, start, end, interval, ids=ids, wide=wide
+            )
+        case PredictionType.current:
+            return CurrentPredictor(repo).predict_depth_averaged_many(
+                lons, lats, start, end, interval, ids=ids, wide=wide
+            )
+    raise ValueError(f"Unknown prediction type {prediction_type}")
+
+
+def _in_worker(task: tuple[Callable[..., pl.DataFrame], tuple]) -> pl.DataFrame:
+    # call a prediction function with the repository of this worker
+    func, args = task
+    assert _worker_repo is not None
+    return func(_worker_repo, *args)
+
+
+def predict_batch(
+    path: Path,
+    lons: ArrayLike,
+    lats: ArrayLike,
+    start: datetime,
+    end: datetime,
+    interval: timedelta = timedelta(hours=1),
+    prediction_type: PredictionType = PredictionType.level,
+    ids: Sequence | None = None,
+    wide: bool = False,
+    workers: int = 1,
+    lookup: Lookup = "nearest",
+) -> pl.DataFrame:
+    """
+    Predict levels or depth averaged currents for many stations in parallel.
+
+    Parameters
+    ----------
+    path : Path
+        The constituent file, NetCDF or a memory-mapped file written by
+        `convert_to_mmap`.
+    lons : array_like
+        The longitudes.
+    lats : array_like
+        The latitudes.
+    start : datetime
+        The start date.
+    end : datetime
+        The end date.
+    interval : timedelta
+        The interval between predictions.
+    prediction_type : PredictionType
+        Level or current.
+    ids : Sequence, optional
+        Station ids, default is 0, 1, ..., n-1.
+    wide : bool, optional
+        Return one column per station (and item) instead of the long format.
+    workers : int, optional
+        Number of worker processes, default 1 predicts in this process.
+    lookup : Lookup, optional
+        How stations are mapped to grid cells, "nearest", "nearest_wet" or
+        "bilinear".
+
+    Returns
+    -------
+    pl.DataFrame
+        The predictions, as returned by `LevelPredictor.predict_many` or
+        `CurrentPredictor.predict_depth_averaged_many` for all stations, with
+        the stations in input order.
+    """
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    stations = list(range(len(lons))) if ids is None else list(ids)
+    if len(stations) != len(lons):
+        raise ValueError(f"Expected {len(lons)} station ids, got {len(stations)}")
+    prediction_type = PredictionType(prediction_type)
+
+    if workers <= 1 or len(lons) <= 1:
+        with _open_repository(path, lookup) as repo:
+            return _predict_part(
+                repo,
+                prediction_type,
+                lons,
+                lats,
+                stations,
+                start,
+                end,
+                interval,
+                wide,
+            )
+
+    size = math.ceil(len(lons) / workers)
+    parts = [
+        (
+            prediction_type,
+            lons[i : i + size],
+            lats[i : i + size],
+            stations[i : i + size],
+            start,
+            end,
+            interval,
+            wide,
+        )
+        for i in range(0, len(lons), size)
+    ]
+    with _executor(len(parts), path, lookup, lons, lats) as executor:
+        # map returns the results in the order of the parts
+        frames = list(
+            executor.map(_in_worker, [(_predict_part, part) for part in parts])
+        )
+
+    if wide:
+        return pl.concat(
+            [frames[0]] + [df.drop("time") for df in frames[1:]], how="horizontal"
+        )
+    return pl.concat(frames)
+
+
+def read_stations(path: Path) -> pl.DataFrame:
+    """
+    Read stations from a CSV or Parquet file.
+
+    The file has the columns lon and lat, and optionally id (default is the
+    row number) and start and end for a per-station prediction window.
+
+    Parameters
+    ----------
+    path : Path
+        The stations file, .csv or .parquet.
+
+    Returns
+    -------
+    pl.DataFrame
+        The columns id, lon, lat and, if in the file, start and end.
+    """
+    match path.suffix.lower():
+        case ".csv":
+            df = pl.read_csv(path, try_parse_dates=True)
+        case ".parquet":
+            df = pl.read_parquet(path)
+        case _:
+            raise ValueError(f"Unsupported stations file {path}, use csv or parquet")
+
+    missing = [name for name in ["lon", "lat"] if name not in df.columns]
+    if missing:
+        raise ValueError(f"Stations file {path} has no column {missing[0]}")
+    if "id" not in df.columns:
+        df = df.with_row_index("id")
+    windows = [name for name in ["start", "end"] if name in df.columns]
+    return df.select(
+        "id",
+        pl.col("lon", "lat").cast(pl.Float64),
+        *[pl.col(name).cast(pl.Datetime("us")) for name in windows],
+    )
+
+
+def _predict_stations(
+    repo: ConstituentRepository,
+    prediction_type: PredictionType,
+    stations: pl.DataFrame,
+    start: datetime,
+    end: datetime,
+    interval: timedelta,
+) -> pl.DataFrame:
+    """Long format predictions, one call per distinct prediction window."""
+    n = len(stations)
+    windows = pl.DataFrame(
+        {
+            "start": stations["start"] if "start" in stations.columns else [None] * n,
+            "end": stations["end"] if "end" in stations.columns else [None] * n,
+        },
+        schema={"start": pl.Datetime("us"), "end": pl.Datetime("us")},
+    ).with_columns(
+        pl.col("start").fill_null(start),
+        pl.col("end").fill_null(end),
+        row=pl.int_range(n),
+    )
+    lons = stations["lon"].to_numpy()
+    lats = stations["lat"].to_numpy()
+    ids = stations["id"]
+
+    frames = []
+    for _, group in windows.group_by("start", "end", maintain_order=True):
+        rows = group["row"].to_numpy()
+        df = _predict_part(
+            repo,
+            prediction_type,
+            lons[rows],
+            lats[rows],
+            ids.gather(rows).to_list(),
+            group["start"][0],
+            group["end"][0],
+            interval,
+            False,
+        )
+        frames.append(
+            df.with_columns(row=pl.Series(np.repeat(rows, len(df) // len(rows))))
+        )
+    if len(frames) == 1:
+        return frames[0].drop("row")
+    # back to the order of the stations
+    return pl.concat(frames).sort("row", maintain_order=True).drop("row")
+
+
+def predict_stations(
+    path: Path,
+    stations: pl.DataFrame,
+    start: datetime,
+    end: datetime,
+    interval: timedelta = timedelta(hours=1),
+    prediction_type: PredictionType = PredictionType.level,
+    lookup: Lookup = "nearest",
+    batch_size: int = 1000,
+    workers: int = 1,
+) -> Iterator[pl.DataFrame]:
+    """
+    Predict levels or depth averaged currents for a table of stations.
+
+    Parameters
+    ----------
+    path : Path
+        The constituent file, NetCDF or a memory-mapped file written by
+        `convert_to_mmap`.
+    stations : pl.DataFrame
+        The stations, as returned by `read_stations`.
+    start : datetime
+        The start date, for stations without their own.
+    end : datetime
+        The end date, for stations without their own.
+    interval : timedelta
+        The interval between predictions.
+    prediction_type : PredictionType
+        Level or current.
+    lookup : Lookup, optional
+        How stations are mapped to grid cells.
+    batch_size : int, optional
+        Number of stations per yielded frame.
+    workers : int, optional
+        Number of worker processes, default 1 predicts in this process.
+
+    Yields
+    ------
+    pl.DataFrame
+        Long format predictions (station, time, then level or u and v) for
+        `batch_size` stations at a time, in station order.
+    """
+    prediction_type = PredictionType(prediction_type)
+    parts = [
+        (prediction_type, stations.slice(i, batch_size), start, end, interval)
+        for i in range(0, len(stations), batch_size)
+    ]
+
+    if workers <= 1 or len(parts) <= 1:
+        with _open_repository(path, lookup) as repo:
+            for part in parts:
+                yield _predict_stations(repo, *part)
+        return
+
+    lons = stations["lon"].to_numpy()
+    lats = stations["lat"].to_numpy()
+    with _executor(workers, path, lookup, lons, lats) as executor:
+        # a bounded number of parts in flight keeps the memory use flat
+        pending: deque[Future[pl.DataFrame]] = deque()
+        for part in parts:
+            pending.append(executor.submit(_in_worker, (_predict_stations, part)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
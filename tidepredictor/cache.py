@@ -0,0 +1,214 @@
+"""
+Persistent cache of prediction results.
+
+Dashboards and scripts often request the same prediction (same station, same
+day, same interval) again and again, across processes and restarts. The
+cache stores each result as an Arrow IPC file, named by a hash of everything
+the prediction depends on: the identity of the constituent file (path, size
+and modification time), the coordinates, the time grid, the prediction type
+and the other options. A modified constituent file gives new keys, the old
+entries age out.
+
+Entries are written to a temporary file and moved into place, so concurrent
+writers of the same entry and readers never see a partial file. The total
+size is bounded, the least recently used entries (by modification time,
+which a hit refreshes) are removed first.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+_VERSION = 1
+_SUFFIX = ".arrow"
+# temporary files of writers that died are removed after this many seconds
+_STALE_SECONDS = 3600
+
+
+def default_cache_dir() -> Path:
+    """The cache directory, `$XDG_CACHE_HOME/tidepredictor` or ~/.cache/tidepredictor."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path("~/.cache").expanduser()
+    return Path(base) / "tidepredictor"
+
+
+def result_key(source: Path, **params: object) -> str:
+    """
+    The key of a prediction.
+
+    Parameters
+    ----------
+    source : Path
+        The constituent file, identified by its path, size and modification
+        time.
+    **params
+        Everything else the prediction depends on, JSON serializable values
+        (datetimes and enums as strings) or NumPy arrays.
+
+    Returns
+    -------
+    str
+        A hex SHA-256 digest.
+    """
+    stat = os.stat(source)
+    h = hashlib.sha256(
+        json.dumps(
+            [_VERSION, str(Path(source).resolve()), stat.st_size, stat.st_mtime_ns]
+        ).encode()
+    )
+    for name, value in sorted(params.items()):
+        h.update(b"\0" + name.encode() + b"\0")
+        if isinstance(value, np.ndarray):
+            h.update(f"{value.dtype}{value.shape}".encode())
+            h.update(np.ascontiguousarray(value).tobytes())
+        else:
+            h.update(json.dumps(value, default=str).encode())
+    return h.hexdigest()
+
+
+@dataclass
+class ResultCacheInfo:
+    """Statistics of a `ResultCache`."""
+
+    hits: int
+    misses: int
+    entries: int
+    nbytes: int
+    max_bytes: int
+
+
+class ResultCache:
+    """
+    Prediction results on disk, shared between processes.
+
+    Parameters
+    ----------
+    directory : Path, optional
+        Where the results are stored, default `default_cache_dir()`.
+    max_bytes : int, optional
+        Bound of the total size of the stored results, default 1 GiB.
+    """
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = 2**30) -> None:
+        self.directory = (
+            Path(directory) if directory is not None else default_cache_dir()
+        )
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def path(self, key: str) -> Path:
+        """The file of an entry."""
+        return self.directory / key[:2] / (key + _SUFFIX)
+
+    def get(self, key: str) -> pl.DataFrame | None:
+        """The stored result, or None if there is none (or it is unreadable)."""
+        path = self.path(key)
+        try:
+            df = pl.read_ipc(path, memory_map=False)
+            # the modification time orders the entries for eviction
+            os.utime(path)
+        except (OSError, pl.exceptions.PolarsError):
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        return df
+
+    def put(self, key: str, df: pl.DataFrame) -> None:
+        """
+        Store a result and evict the least recently used entries beyond the
+        size bound. A result that can not be written is not stored.
+        """
+        path = self.path(key)
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            df.write_ipc(tmp)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        finally:
+            tmp.unlink(missing_ok=True)
+        self.evict()
+
+    def get_or_predict(
+        self, key: str, predict: Callable[[], pl.DataFrame]
+    ) -> pl.DataFrame:
+        """The stored result, or the prediction, which is stored."""
+        df = self.get(key)
+        if df is None:
+            df = predict()
+            self.put(key, df)
+        return df
+
+    def cached(
+        self, key: str, frames: Iterable[pl.DataFrame]
+    ) -> Iterator[pl.DataFrame]:
+        """
+        The stored result as a single frame, or the chunks of a prediction.
+
+        The chunks are passed on as they arrive and stored together once all
+        of them have been consumed.
+        """
+        df = self.get(key)
+        if df is not None:
+            yield df
+            return
+        chunks = []
+        for chunk in frames:
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            self.put(key, pl.concat(chunks))
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob(f"*/*{_SUFFIX}*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                # removed by another process
+                continue
+            if path.suffix == ".tmp":
+                if time.time() - stat.st_mtime > _STALE_SECONDS:
+                    path.unlink(missing_ok=True)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self) -> None:
+        """Remove the least recently used entries beyond the size bound."""
+        entries = self._entries()
+        nbytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if nbytes <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            nbytes -= size
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def info(self) -> ResultCacheInfo:
+        """Hits and misses of this instance, entries and size on disk."""
+        entries = self._entries()
+        return ResultCacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            entries=len(entries),
+            nbytes=sum(size for _, size, _ in entries),
+            max_bytes=self.max_bytes,
+        )
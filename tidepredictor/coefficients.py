@@ -0,0 +1,194 @@
+"""
+Precomputed complex coefficients of the current constituents.
+
+The current constituents are stored as tidal ellipses (major and minor axis,
+inclination and phase), which are converted to the coefficients of the
+harmonic basis, with a few trigonometric functions per constituent, on every
+lookup. The store holds the converted coefficients of every grid cell as one
+complex vector c = c_u + i c_v, so the depth averaged current u + iv of many
+points is a single complex matrix product with the time basis, see
+`TimeBasis.synthesize_complex`. It is built once per constituent file and
+stored next to it as a memory-mapped sidecar file.
+"""
+
+import json
+import os
+import struct
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from tidepredictor.prediction.harmonics import current_coefficients
+
+SIDECAR_SUFFIX = ".uv"
+
+_MAGIC = b"TPUVCOE1"
+_ALIGN = 4096
+_VERSION = 1
+
+
+def uv_coefficients(
+    major_axis: ArrayLike,
+    minor_axis: ArrayLike,
+    inclination: ArrayLike,
+    phase: ArrayLike,
+) -> np.ndarray:
+    """
+    Complex basis coefficients of the current, c_u + i c_v.
+
+    Parameters
+    ----------
+    major_axis : array_like
+        Semi major axes, shape (..., n_constituents).
+    minor_axis : array_like
+        Semi minor axes (negative for clockwise rotation), same shape.
+    inclination : array_like
+        Inclination of the major axis, degrees counterclockwise from east.
+    phase : array_like
+        Greenwich phase lags in degrees.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (..., 2 n_constituents), the real part are the coefficients of
+        u and the imaginary part those of v, see `current_coefficients`.
+    """
+    major = np.asarray(major_axis, dtype=float)
+    *shape, n = major.shape
+    cu, cv = current_coefficients(
+        major_axis=major.reshape(-1, n),
+        minor_axis=np.asarray(minor_axis, dtype=float).reshape(-1, n),
+        inclination=np.asarray(inclination, dtype=float).reshape(-1, n),
+        phase=np.asarray(phase, dtype=float).reshape(-1, n),
+    )
+    return (cu.T + 1j * cv.T).reshape(*shape, 2 * n)
+
+
+def _fingerprint(path: Path) -> list[int]:
+    stat = os.stat(path)
+    return [_VERSION, stat.st_size, stat.st_mtime_ns]
+
+
+class CurrentCoefficientStore:
+    """
+    Complex current coefficients of all cells of a constituent grid.
+
+    Parameters
+    ----------
+    names : list[str]
+        The constituent names.
+    uv : np.ndarray
+        The coefficients, complex of shape (n_lat, n_lon, 2 n_constituents),
+        typically memory-mapped.
+    """
+
+    def __init__(self, names: list[str], uv: np.ndarray) -> None:
+        self.names = names
+        self.uv = uv
+
+    @staticmethod
+    def sidecar_path(path: Path) -> Path:
+        """The sidecar file of a constituent file."""
+        return path.with_name(path.name + SIDECAR_SUFFIX)
+
+    @staticmethod
+    def save(
+        path: Path,
+        source: Path,
+        names: list[str],
+        shape: tuple[int, int],
+        blocks: Iterator[np.ndarray],
+    ) -> None:
+        """
+        Write the coefficients, tagged with the size and modification time of
+        the constituent file they were computed from.
+
+        The file starts with a magic string, the length of a JSON header and
+        the header, followed by the coefficients as complex64 in (lat, lon)
+        row major order. `blocks` yields consecutive rows of the grid, shape
+        (n_rows, n_lon, 2 n_constituents), so the memory use is bounded by a
+        block.
+        """
+        header = {
+            "fingerprint": _fingerprint(source),
+            "names": names,
+            "nlat": shape[0],
+            "nlon": shape[1],
+        }
+        # with room for the offset itself
+        size = len(_MAGIC) + 8 + len(json.dumps(header).encode()) + 64
+        data_offset = -(-size // _ALIGN) * _ALIGN
+        encoded = json.dumps({**header, "data_offset": data_offset}).encode()
+
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_MAGIC)
+                f.write(struct.pack("<Q", len(encoded)))
+                f.write(encoded)
+                f.write(b"\0" * (data_offset - f.tell()))
+                for block in blocks:
+                    f.write(block.astype("<c8").tobytes())
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    @staticmethod
+    def load(path: Path, source: Path) -> "CurrentCoefficientStore | None":
+        """
+        Map a saved store, or None if it is missing or out of date.
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    return None
+                (size,) = struct.unpack("<Q", f.read(8))
+                header = json.loads(f.read(size))
+            if header["fingerprint"] != _fingerprint(source):
+                return None
+            uv = np.memmap(
+                path,
+                dtype="<c8",
+                mode="r",
+                offset=header["data_offset"],
+                shape=(header["nlat"], header["nlon"], 2 * len(header["names"])),
+            )
+        except (OSError, KeyError, ValueError, struct.error):
+            return None
+        return CurrentCoefficientStore(header["names"], uv)
+
+    def read(self, ilon: np.ndarray, ilat: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        The coefficients of a batch of cells, shape (n_cells, 2 n_constituents).
+        """
+        return {"uv": self.uv[ilat, ilon].astype(complex)}
+
+
+def load_or_build_store(
+    source: Path,
+    names: list[str],
+    shape: tuple[int, int],
+    blocks: Callable[[], Iterator[np.ndarray]],
+) -> CurrentCoefficientStore:
+    """
+    Load the sidecar store of a constituent file, building it if needed.
+
+    `blocks` yields the coefficients of consecutive rows of the grid, see
+    `CurrentCoefficientStore.save`; it is only called when the sidecar is
+    missing or out of date. When the sidecar can not be written (e.g. a
+    read-only data directory) the coefficients are kept in memory.
+    """
+    path = CurrentCoefficientStore.sidecar_path(source)
+    store = CurrentCoefficientStore.load(path, source)
+    if store is not None:
+        return store
+    try:
+        CurrentCoefficientStore.save(path, source, names, shape, blocks())
+    except OSError:
+        uv = np.concatenate(list(blocks()), axis=0).astype("<c8")
+        return CurrentCoefficientStore(names, uv)
+    store = CurrentCoefficientStore.load(path, source)
+    assert store is not None
+    return store
@@ -0,0 +1,293 @@
+"""
+A resident prediction process serving the CLI over a Unix socket.
+
+Each CLI call pays for starting Python, opening the constituent file and
+computing the time basis. `serve` keeps the repositories open and the basis
+cache warm in one process, and the CLI forwards its request to it when the
+socket exists, falling back to predicting in-process when it does not.
+
+The protocol is a single JSON line with the request, answered by a JSON line
+with the status, followed by the output in the requested format until the
+server closes the connection.
+"""
+
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, cast
+
+import polars as pl
+
+from tidepredictor import PredictionType, get_default_constituent_path
+from tidepredictor.cache import ResultCache, result_key
+from tidepredictor.data import (
+    ConstituentRepository,
+    Lookup,
+    NetCDFConstituentRepository,
+)
+from tidepredictor.output import Format, write_frames
+from tidepredictor.prediction import CurrentPredictor, LevelPredictor
+
+
+class DaemonError(Exception):
+    """The daemon could not serve a request."""
+
+
+class DaemonUnavailable(DaemonError):
+    """No daemon is listening on the socket."""
+
+
+def default_socket_path() -> Path:
+    """The socket used when none is given, private to the current user."""
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(directory) / f"tidepredictor-{os.getuid()}.sock"
+
+
+@dataclass
+class Request:
+    """
+    A point prediction, as given on the command line.
+
+    Attributes
+    ----------
+    lon, lat : float
+        The location.
+    start, end : datetime
+        The period.
+    interval : int
+        Interval in minutes.
+    type : PredictionType
+        Level or depth averaged current.
+    lookup : Lookup
+        How the location is mapped to grid cells.
+    format : Format
+        The output format.
+    precision : int
+        Number of decimal places, csv only.
+    chunk : int
+        Number of days predicted and written at a time.
+    alpha : float
+        Alpha factor for the current profile.
+    cache : bool
+        Serve the prediction from the result cache, storing it when it is not
+        there.
+    cache_dir : str, optional
+        The directory of the result cache, default `default_cache_dir()`.
+    """
+
+    lon: float
+    lat: float
+    start: datetime
+    end: datetime
+    interval: int = 30
+    type: PredictionType = PredictionType.level
+    lookup: Lookup = "nearest"
+    format: Format = Format.csv
+    precision: int = 3
+    chunk: int = 30
+    alpha: float = 1.0 / 7
+    cache: bool = False
+    cache_dir: str | None = None
+
+    def to_json(self) -> str:
+        d = asdict(self)
+        d["start"] = self.start.isoformat()
+        d["end"] = self.end.isoformat()
+        d["type"] = self.type.value
+        d["format"] = self.format.value
+        return json.dumps(d)
+
+    @staticmethod
+    def from_json(line: str | bytes) -> "Request":
+        d = json.loads(line)
+        d["start"] = datetime.fromisoformat(d["start"])
+        d["end"] = datetime.fromisoformat(d["end"])
+        d["type"] = PredictionType(d["type"])
+        d["format"] = Format(d["format"])
+        return Request(**d)
+
+    def frames(self, repo: ConstituentRepository) -> Iterator[pl.DataFrame]:
+        """The prediction, chunk by chunk, or from the result cache."""
+        if not self.cache:
+            return self._predict(repo)
+        cache = ResultCache(None if self.cache_dir is None else Path(self.cache_dir))
+        key = result_key(
+            get_default_constituent_path(self.type),
+            type=self.type,
+            lookup=self.lookup,
+            lon=self.lon,
+            lat=self.lat,
+            start=self.start,
+            end=self.end,
+            interval=self.interval,
+            alpha=self.alpha,
+        )
+        return cache.cached(key, self._predict(repo))
+
+    def _predict(self, repo: ConstituentRepository) -> Iterator[pl.DataFrame]:
+        interval = timedelta(minutes=self.interval)
+        chunk = timedelta(days=self.chunk)
+        match self.type:
+            case PredictionType.level:
+                return LevelPredictor(constituent_repo=repo).predict_iter(
+                    self.lon, self.lat, self.start, self.end, interval, chunk
+                )
+            case PredictionType.current:
+                return CurrentPredictor(
+                    constituent_repo=repo, alpha=self.alpha
+                ).predict_depth_averaged_iter(
+                    self.lon, self.lat, self.start, self.end, interval, chunk
+                )
+        raise ValueError(f"Unknown prediction type {self.type}")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "PredictionServer"
+
+    def handle(self) -> None:
+        try:
+            request = Request.from_json(self.rfile.readline())
+            frames = request.frames(self.server.repository(request))
+            # errors such as a point outside the domain are raised when the
+            # coefficients are looked up, before the first chunk
+            first = next(frames)
+        except Exception as e:
+            self._status(error=str(e) or type(e).__name__)
+            return
+        self._status()
+        try:
+            write_frames(
+                itertools.chain([first], frames),
+                request.format,
+                cast(BinaryIO, self.wfile),
+                precision=request.precision,
+            )
+        except (BrokenPipeError, ConnectionResetError):
+            # the client went away
+            pass
+
+    def _status(self, error: str | None = None) -> None:
+        self.wfile.write((json.dumps({"error": error}) + "\n").encode())
+        self.wfile.flush()
+
+
+class PredictionServer(socketserver.UnixStreamServer):
+    """
+    Serves predictions on a Unix socket, one request at a time.
+
+    The constituent repositories are opened on first use and kept open.
+
+    Parameters
+    ----------
+    socket_path : Path
+        The socket to listen on.
+    """
+
+    def __init__(self, socket_path: Path) -> None:
+        socket_path = Path(socket_path)
+        if socket_path.exists():
+            if _is_listening(socket_path):
+                raise DaemonError(f"A daemon is already listening on {socket_path}")
+            # left behind by a daemon that was killed
+            socket_path.unlink()
+        self.socket_path = socket_path
+        self._repositories: dict[
+            tuple[PredictionType, Lookup], NetCDFConstituentRepository
+        ] = {}
+        super().__init__(str(socket_path), _Handler)
+        os.chmod(socket_path, 0o600)
+
+    def repository(self, request: Request) -> NetCDFConstituentRepository:
+        """The open repository for a request."""
+        key = (request.type, request.lookup)
+        if key not in self._repositories:
+            self._repositories[key] = NetCDFConstituentRepository(
+                get_default_constituent_path(request.type),
+                keep_open=True,
+                lookup=request.lookup,
+            )
+        return self._repositories[key]
+
+    def server_close(self) -> None:
+        super().server_close()
+        for repo in self._repositories.values():
+            repo.close()
+        self._repositories.clear()
+        self.socket_path.unlink(missing_ok=True)
+
+
+def _is_listening(socket_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def serve(socket_path: Path) -> None:
+    """
+    Run the daemon until it is interrupted.
+
+    Parameters
+    ----------
+    socket_path : Path
+        The socket to listen on.
+    """
+    # a terminated daemon removes its socket like an interrupted one
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with PredictionServer(socket_path) as server:
+        print(f"Listening on {socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def forward(socket_path: Path, request: Request, sink: BinaryIO) -> None:
+    """
+    Have the daemon serve a request and copy its output.
+
+    Parameters
+    ----------
+    socket_path : Path
+        The socket of the daemon.
+    request : Request
+        The prediction.
+    sink : BinaryIO
+        Where the output is written.
+
+    Raises
+    ------
+    DaemonUnavailable
+        If no daemon is listening, nothing has been written.
+    DaemonError
+        If the daemon could not serve the request, nothing has been written.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(str(socket_path))
+        except OSError as e:
+            raise DaemonUnavailable(f"No daemon on {socket_path}") from e
+        with s.makefile("rwb") as f:
+            f.write((request.to_json() + "\n").encode())
+            f.flush()
+            line = f.readline()
+            if not line:
+                raise DaemonError("The daemon closed the connection")
+            error = json.loads(line)["error"]
+            if error is not None:
+                raise DaemonError(error)
+            # pass on whatever has arrived, the output streams as it is predicted
+            while data := f.read1(1 << 16):
+                sink.write(data)
+                sink.flush()
@@ -2,11 +2,53 @@
 Data handling.
 """
 
+import json
+import os
+import struct
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Protocol
+from typing import TYPE_CHECKING, Callable, Iterator, Literal, Protocol
 
-import xarray as xr
+import numpy as np
+from numpy.typing import ArrayLike
+
+from tidepredictor.coefficients import (
+    CurrentCoefficientStore,
+    load_or_build_store,
+    uv_coefficients,
+)
+from tidepredictor.index import (
+    CellLookup,
+    WetCellIndex,
+    cell_lookup,
+    great_circle_distance,
+    load_or_build,
+)
+from tidepredictor.interpolation import (
+    bilinear_stencil,
+    interpolate,
+    interpolate_current,
+    interpolate_level,
+    land_aware_weights,
+)
+
+if TYPE_CHECKING:
+    # xarray is imported when a NetCDF file is first opened
+    import xarray as xr
+
+Lookup = Literal["nearest", "nearest_wet", "bilinear"]
+"""
+How points are mapped to grid cells.
+
+- "nearest": the nearest grid cell, which may be a land cell.
+- "nearest_wet": the nearest wet (ocean) cell, using a spatial index that is
+  stored next to the constituent file.
+- "bilinear": bilinear interpolation between the four surrounding cells,
+  ignoring land cells. Points surrounded by land use the nearest wet cell.
+"""
+
+_LOOKUPS = ("nearest", "nearest_wet", "bilinear")
 
 
 @dataclass
@@ -33,14 +75,553 @@ class CurrentConstituent:
     inclination: float
 
 
+@dataclass
+class LevelConstituentArrays:
+    """
+    Level constituents for many points, as dense arrays.
+
+    The arrays have shape (n_points, n_constituents), with the columns in the
+    order given by `names`. `snap_distance` is the distance in metres from each
+    point to the centre of its grid cell.
+    """
+
+    names: list[str]
+    amplitude: np.ndarray
+    phase: np.ndarray
+    snap_distance: np.ndarray | None = None
+
+
+@dataclass
+class CurrentConstituentArrays:
+    """
+    Current constituents for many points, as dense arrays.
+
+    The arrays have shape (n_points, n_constituents), with the columns in the
+    order given by `names`. `snap_distance` is the distance in metres from each
+    point to the centre of its grid cell.
+    """
+
+    names: list[str]
+    phase: np.ndarray
+    major_axis: np.ndarray
+    minor_axis: np.ndarray
+    inclination: np.ndarray
+    snap_distance: np.ndarray | None = None
+
+
+@dataclass
+class CurrentCoefficientArrays:
+    """
+    Complex basis coefficients of the current for many points.
+
+    `uv` has shape (n_points, 2 n_constituents), the real part are the
+    coefficients of u and the imaginary part those of v, see
+    `tidepredictor.coefficients.uv_coefficients`. `snap_distance` is the
+    distance in metres from each point to the centre of its grid cell.
+    """
+
+    names: list[str]
+    uv: np.ndarray
+    snap_distance: np.ndarray | None = None
+
+
+def _nearest_index(coords: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Index of the nearest coordinate for each value.
+
+    Ties are resolved towards the larger coordinate, like `xr.Dataset.sel` with
+    `method="nearest"`.
+    """
+    descending = coords[0] > coords[-1]
+    if descending:
+        coords = coords[::-1]
+    right = np.clip(np.searchsorted(coords, values), 1, len(coords) - 1)
+    left = right - 1
+    use_left = np.abs(values - coords[left]) < np.abs(coords[right] - values)
+    idx = np.where(use_left, left, right)
+    if descending:
+        idx = len(coords) - 1 - idx
+    return idx
+
+
+def _as_points(lons: ArrayLike, lats: ArrayLike) -> tuple[np.ndarray, np.ndarray]:
+    lon = np.atleast_1d(np.asarray(lons, dtype=float))
+    lat = np.atleast_1d(np.asarray(lats, dtype=float))
+    if lon.shape != lat.shape or lon.ndim != 1:
+        raise ValueError("lons and lats must be 1-D arrays of the same length")
+    return lon, lat
+
+
+# land is stored as zero amplitude or major axis in files without bathymetry,
+# which gives zero current coefficients
+_SIZE_VARIABLES = ("amplitude", "major_axis", "uv")
+
+# the constituent variables of level and current files
+_VARIABLES = {
+    "level": ["amplitude", "phase"],
+    "current": ["phase", "major_axis", "minor_axis", "inclination"],
+}
+
+Bbox = tuple[float, float, float, float]
+"""A bounding box, (west, south, east, north) in degrees."""
+
+
+@dataclass
+class ConstituentGrid:
+    """
+    Constituents of a rectangular block of grid cells.
+
+    Attributes
+    ----------
+    kind : str
+        "level" or "current".
+    names : list[str]
+        The constituent names.
+    lon : np.ndarray
+        The longitudes of the block, shape (n_lon,).
+    lat : np.ndarray
+        The latitudes of the block, shape (n_lat,).
+    values : dict[str, np.ndarray]
+        The constituent variables of the kind, each of shape
+        (n_lat, n_lon, n_constituents).
+    wet : np.ndarray
+        Boolean mask of the wet cells, shape (n_lat, n_lon).
+    """
+
+    kind: str
+    names: list[str]
+    lon: np.ndarray
+    lat: np.ndarray
+    values: dict[str, np.ndarray]
+    wet: np.ndarray
+
+
+def _block(
+    grid_lon: np.ndarray, grid_lat: np.ndarray, bbox: Bbox, stride: int
+) -> tuple[slice, slice]:
+    """The longitude and latitude slices of the cells in a bounding box."""
+    if stride < 1:
+        raise ValueError(f"Stride must be at least 1, got {stride}")
+    west, south, east, north = bbox
+
+    def axis(coords: np.ndarray, low: float, high: float, name: str) -> slice:
+        inside = np.flatnonzero((coords >= low) & (coords <= high))
+        if len(inside) == 0:
+            raise ValueError(
+                f"No grid cells with {name} between {low} and {high} in the data domain"
+            )
+        return slice(int(inside[0]), int(inside[-1]) + 1, stride)
+
+    return axis(grid_lon, west, east, "longitude"), axis(
+        grid_lat, south, north, "latitude"
+    )
+
+
+def _constituent_grid(
+    kind: str,
+    names: list[str],
+    lon: np.ndarray,
+    lat: np.ndarray,
+    values: dict[str, np.ndarray],
+) -> ConstituentGrid:
+    """A block from its variables, the bathymetry (if any) used for the mask."""
+    wet = _is_wet(values)
+    values = {name: values[name] for name in _VARIABLES[kind]}
+    return ConstituentGrid(kind, names, lon, lat, values, wet)
+
+
+def _is_wet(values: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Wet cells among gathered values of shape (..., n_constituents) or, for the
+    bathymetry, (...). A NaN bathymetry is treated as unknown, cells where all
+    amplitudes (or major axes) are zero are dry.
+    """
+    wet: np.ndarray | None = None
+    for name, value in values.items():
+        if name == "bathymetry":
+            defined = ~(value >= 0)
+        else:
+            defined = np.isfinite(value).all(axis=-1)
+            if name in _SIZE_VARIABLES:
+                defined &= (value != 0).any(axis=-1)
+        wet = defined if wet is None else wet & defined
+    assert wet is not None
+    return wet
+
+
+@dataclass
+class _Gathered:
+    """
+    Values read for a batch of points.
+
+    With `weights` the values have a stencil axis, shape (n_points, 4, ...),
+    to be combined with the weights of shape (n_points, 4).
+    """
+
+    values: dict[str, np.ndarray]
+    weights: np.ndarray | None
+    distance: np.ndarray
+
+    def level(self) -> tuple[np.ndarray, np.ndarray]:
+        amplitude, phase = self.values["amplitude"], self.values["phase"]
+        if self.weights is None:
+            return amplitude, phase
+        return interpolate_level(amplitude, phase, self.weights)
+
+    def current(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        phase = self.values["phase"]
+        major_axis = self.values["major_axis"]
+        minor_axis = self.values["minor_axis"]
+        inclination = self.values["inclination"]
+        if self.weights is None:
+            return phase, major_axis, minor_axis, inclination
+        return interpolate_current(
+            phase, major_axis, minor_axis, inclination, self.weights
+        )
+
+    def uv(self) -> np.ndarray:
+        # the coefficients are linear in the rotary components, interpolating
+        # them is the same as interpolating the ellipses
+        if self.weights is None:
+            return self.values["uv"]
+        return interpolate(self.values["uv"], self.weights)
+
+    def bathymetry(self) -> np.ndarray:
+        if self.weights is None:
+            return self.values["bathymetry"]
+        return interpolate(self.values["bathymetry"], self.weights)
+
+
+def _gather(
+    read: Callable[[np.ndarray, np.ndarray], dict[str, np.ndarray]],
+    locate: Callable[[np.ndarray, np.ndarray], CellLookup],
+    lookup: Lookup,
+    grid_lon: np.ndarray,
+    grid_lat: np.ndarray,
+    lon: np.ndarray,
+    lat: np.ndarray,
+) -> _Gathered:
+    """
+    Read values for a batch of points with the given lookup.
+
+    `read(ilon, ilat)` reads the variables at a batch of cells in a single
+    read, `locate(lon, lat)` selects one cell per point (the nearest wet cell
+    for bilinear lookups, used where all four surrounding cells are dry).
+    """
+    if lookup != "bilinear":
+        cells = locate(lon, lat)
+        return _Gathered(read(cells.ilon, cells.ilat), None, cells.distance)
+
+    n = len(lon)
+    ilon, ilat, weights = bilinear_stencil(grid_lon, grid_lat, lon, lat)
+    # neighbouring points share cells, read each cell once
+    unique, inverse = np.unique(
+        np.stack([ilon.ravel(), ilat.ravel()]), axis=1, return_inverse=True
+    )
+    values = {
+        name: value.astype(np.result_type(value, float))[inverse].reshape(
+            (n, 4) + value.shape[1:]
+        )
+        for name, value in read(unique[0], unique[1]).items()
+    }
+    weights = land_aware_weights(weights, _is_wet(values))
+
+    dry = weights.sum(axis=1) == 0
+    if np.any(dry):
+        nearest = locate(lon[dry], lat[dry])
+        ilon[dry, 0], ilat[dry, 0] = nearest.ilon, nearest.ilat
+        weights[dry] = [1.0, 0.0, 0.0, 0.0]
+        for name, value in read(nearest.ilon, nearest.ilat).items():
+            values[name][dry, 0] = value
+
+    distance = great_circle_distance(
+        lon[:, None],
+        lat[:, None],
+        np.asarray(grid_lon, dtype=float)[ilon],
+        np.asarray(grid_lat, dtype=float)[ilat],
+    )
+    distance = np.where(weights > 0, distance, np.inf).min(axis=1)
+    return _Gathered(values, weights, distance)
+
+
+@dataclass
+class _OpenDataset:
+    """
+    An open constituent file together with the metadata needed for lookups.
+    """
+
+    ds: "xr.Dataset"
+    lon: np.ndarray
+    lat: np.ndarray
+    bounds: tuple[float, float, float, float]
+    names: list[str]
+    variables: "dict[str, xr.DataArray]"
+    pid: int
+
+    @staticmethod
+    def open(file_path: Path) -> "_OpenDataset":
+        import xarray as xr
+
+        ds = xr.open_dataset(file_path)
+        lon = ds.lon.values
+        lat = ds.lat.values
+        return _OpenDataset(
+            ds=ds,
+            lon=lon,
+            lat=lat,
+            bounds=(lon.min(), lon.max(), lat.min(), lat.max()),
+            names=[str(name) for name in ds.cons.values],
+            variables={str(name): ds[name] for name in ds.data_vars},
+            pid=os.getpid(),
+        )
+
+    def validate_data_domain(self, lon: np.ndarray, lat: np.ndarray) -> None:
+        """
+        Validates the data domain.
+        """
+        lon_min, lon_max, lat_min, lat_max = self.bounds
+        outside = (lon < lon_min) | (lon > lon_max)
+        if np.any(outside):
+            raise ValueError(f"Longitude {lon[outside][0]} is outside the data domain")
+        outside = (lat < lat_min) | (lat > lat_max)
+        if np.any(outside):
+            raise ValueError(f"Latitude {lat[outside][0]} is outside the data domain")
+
+    def nearest(
+        self, lon: np.ndarray, lat: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Indices of the nearest grid cells."""
+        return _nearest_index(self.lon, lon), _nearest_index(self.lat, lat)
+
+    def wet_mask(self) -> np.ndarray:
+        """
+        Boolean mask of the wet cells, shape (n_lat, n_lon).
+
+        A cell is wet if its constituents are defined and not all zero, and its
+        bathymetry, if known, is below zero.
+        """
+        size = next(name for name in _SIZE_VARIABLES if name in self.variables)
+        wet = np.ones((len(self.lat), len(self.lon)), dtype=bool)
+        nonzero = np.zeros_like(wet)
+        # one constituent at a time to bound the memory use
+        for i in range(len(self.names)):
+            values = self.variables[size].isel(cons=i).transpose("lat", "lon").values
+            wet &= np.isfinite(values)
+            nonzero |= values != 0
+        wet &= nonzero
+        if "bathymetry" in self.variables:
+            bathymetry = self.variables["bathymetry"].transpose("lat", "lon").values
+            wet &= ~(bathymetry >= 0)
+        return wet
+
+    def uv_blocks(self, block_rows: int = 64) -> Iterator[np.ndarray]:
+        """
+        Complex current coefficients of consecutive blocks of latitude rows,
+        shape (n_rows, n_lon, 2 n_constituents).
+        """
+        for i in range(0, len(self.lat), block_rows):
+            rows = {
+                name: self.variables[name]
+                .isel(lat=slice(i, i + block_rows))
+                .transpose("lat", "lon", "cons")
+                .values
+                for name in _VARIABLES["current"]
+            }
+            yield uv_coefficients(
+                major_axis=rows["major_axis"],
+                minor_axis=rows["minor_axis"],
+                inclination=rows["inclination"],
+                phase=rows["phase"],
+            )
+
+    def reader(
+        self, names: list[str]
+    ) -> Callable[[np.ndarray, np.ndarray], dict[str, np.ndarray]]:
+        """Reader of the given variables at a batch of cells."""
+
+        def read(ilon: np.ndarray, ilat: np.ndarray) -> dict[str, np.ndarray]:
+            return {name: self.read_points(name, ilon, ilat) for name in names}
+
+        return read
+
+    def read_points(self, name: str, ilon: np.ndarray, ilat: np.ndarray) -> np.ndarray:
+        """
+        Read a variable at the given grid cells in a single read.
+
+        Clustered cells are read as the enclosing box and picked in memory,
+        scattered cells with a pointwise read.
+
+        Returns an array of shape (n_points,) or (n_points, n_constituents).
+        """
+        import xarray as xr
+
+        da = self.variables[name]
+        if len(ilon) > 0:
+            lon0, lon1 = ilon.min(), ilon.max() + 1
+            lat0, lat1 = ilat.min(), ilat.max() + 1
+            if (lon1 - lon0) * (lat1 - lat0) <= max(16 * len(ilon), 4096):
+                da = da.isel(lon=slice(lon0, lon1), lat=slice(lat0, lat1)).load()
+                ilon, ilat = ilon - lon0, ilat - lat0
+        da = da.isel(
+            lon=xr.DataArray(ilon, dims="point"), lat=xr.DataArray(ilat, dims="point")
+        )
+        if "cons" in da.dims:
+            da = da.transpose("point", "cons")
+        return da.values
+
+
 class ConstituentReader:
     """
     Reads constituents from a file.
+
+    Parameters
+    ----------
+    file_path : Path
+        The path to the NetCDF file.
+    keep_open : bool, optional
+        Keep the file open between calls instead of reopening it for every
+        lookup. Call `close` when done. Default is False.
+    lookup : Lookup, optional
+        How points are mapped to grid cells, "nearest" (default),
+        "nearest_wet" or "bilinear".
+    precompute : bool, optional
+        Read the current coefficients of `get_current_coefficients_batch`
+        from a precomputed sidecar store, built on first use. Default is
+        False.
     """
 
-    def __init__(self, file_path: Path):
+    def __init__(
+        self,
+        file_path: Path,
+        keep_open: bool = False,
+        lookup: Lookup = "nearest",
+        precompute: bool = False,
+    ):
         self.file_path = file_path
         assert self.file_path.exists()
+        if lookup not in _LOOKUPS:
+            raise ValueError(f"Unknown lookup {lookup!r}")
+        self.keep_open = keep_open
+        self.lookup = lookup
+        self.precompute = precompute
+        self._handle: _OpenDataset | None = None
+        self._index: WetCellIndex | None = None
+        self._coefficients: CurrentCoefficientStore | None = None
+
+    @contextmanager
+    def _open(self) -> Iterator[_OpenDataset]:
+        """Yield an open dataset, reusing the long-lived handle if enabled."""
+        if not self.keep_open:
+            handle = _OpenDataset.open(self.file_path)
+            try:
+                yield handle
+            finally:
+                handle.ds.close()
+            return
+
+        if self._handle is not None and self._handle.pid != os.getpid():
+            # inherited from the parent process after a fork, the underlying
+            # HDF5 handle must not be used (or closed) in the child
+            self._handle = None
+        if self._handle is None:
+            self._handle = _OpenDataset.open(self.file_path)
+        yield self._handle
+
+    def close(self) -> None:
+        """Close the long-lived file handle, if any."""
+        if self._handle is not None and self._handle.pid == os.getpid():
+            self._handle.ds.close()
+        self._handle = None
+
+    def __getstate__(self) -> dict:
+        # open file handles can not be pickled, the copy reopens on first use
+        # and loads the wet cell index and coefficients from their sidecars
+        state = self.__dict__.copy()
+        state["_handle"] = None
+        state["_index"] = None
+        state["_coefficients"] = None
+        return state
+
+    def _cells(
+        self, handle: _OpenDataset, lon: np.ndarray, lat: np.ndarray
+    ) -> CellLookup:
+        if self.lookup == "nearest":
+            ilon, ilat = handle.nearest(lon, lat)
+            return cell_lookup(handle.lon, handle.lat, ilon, ilat, lon, lat)
+        if self._index is None:
+            self._index = load_or_build(
+                self.file_path, handle.lon, handle.lat, handle.wet_mask
+            )
+        return self._index.query(lon, lat)
+
+    def _gather(
+        self,
+        handle: _OpenDataset,
+        names: list[str],
+        lon: np.ndarray,
+        lat: np.ndarray,
+        store: CurrentCoefficientStore | None = None,
+    ) -> _Gathered:
+        if self.lookup == "bilinear" and "bathymetry" in handle.variables:
+            # to tell land from water
+            names = list(dict.fromkeys(names + ["bathymetry"]))
+        read = handle.reader(names)
+        if store is not None:
+            read_variables = read
+
+            def read(ilon: np.ndarray, ilat: np.ndarray) -> dict[str, np.ndarray]:
+                return {**store.read(ilon, ilat), **read_variables(ilon, ilat)}
+
+        return _gather(
+            read,
+            lambda lon, lat: self._cells(handle, lon, lat),
+            self.lookup,
+            handle.lon,
+            handle.lat,
+            lon,
+            lat,
+        )
+
+    def locate(self, *, lats: ArrayLike, lons: ArrayLike) -> CellLookup:
+        """
+        The grid cells used for the given points.
+
+        For bilinear lookups this is the nearest wet cell, which is used where
+        all four surrounding cells are dry.
+
+        Parameters
+        ----------
+        lats : array_like
+            The latitudes.
+        lons : array_like
+            The longitudes.
+
+        Returns
+        -------
+        CellLookup
+            The selected cells, their coordinates and the snap distances.
+        """
+        lon, lat = _as_points(lons, lats)
+        with self._open() as handle:
+            return self._cells(handle, lon, lat)
+
+    def get_bathymetry(self, *, lat: float, lon: float) -> float:
+        """
+        Reads the bathymetry (positive depth) at the nearest grid point.
+
+        Parameters
+        ----------
+        lat : float
+            The latitude.
+        lon : float
+            The longitude.
+
+        Returns
+        -------
+        float
+            The water depth.
+        """
+        return self.get_bathymetry_batch(lats=[lat], lons=[lon])[0].item()
 
     def get_level_constituents(
         self, *, lat: float, lon: float
@@ -60,21 +641,16 @@ class ConstituentReader:
         dict[str, Constituent]
             The constituents.
         """
-        with xr.open_dataset(self.file_path) as ds:
-            self._validate_data_domain(ds, lon, lat)
+        arrays = self.get_level_constituents_batch(lats=[lat], lons=[lon])
 
-            df = ds.sel(lon=lon, lat=lat, method="nearest").to_dataframe()
+        constituents = {}
+        for name, amplitude, phase in zip(
+            arrays.names, arrays.amplitude[0], arrays.phase[0]
+        ):
+            constituent = LevelConstituent(name=name, amplitude=amplitude, phase=phase)
+            constituents[name] = constituent
 
-            constituents = {}
-            for name, amplitude, phase in zip(
-                df["amplitude"].index, df["amplitude"], df["phase"]
-            ):
-                constituent = LevelConstituent(
-                    name=name, amplitude=amplitude, phase=phase
-                )
-                constituents[name] = constituent
-
-            return constituents
+        return constituents
 
     def get_current_constituents(
         self, *, lat: float, lon: float
@@ -93,38 +669,206 @@ class ConstituentReader:
         dict[str, CurrentConstituent]
             The constituents.
         """
-        with xr.open_dataset(self.file_path) as ds:
-            self._validate_data_domain(ds, lon, lat)
-            df = ds.sel(lon=lon, lat=lat, method="nearest").to_dataframe()
+        arrays = self.get_current_constituents_batch(lats=[lat], lons=[lon])
 
-            constituents = {}
-            for name, phase, major_axis, minor_axis, inclination in zip(
-                df["phase"].index,
-                df["phase"],
-                df["major_axis"],
-                df["minor_axis"],
-                df["inclination"],
-            ):
-                constituent = CurrentConstituent(
-                    name=name,
-                    phase=phase,
-                    major_axis=major_axis,
-                    minor_axis=minor_axis,
-                    inclination=inclination,
-                )
-                constituents[name] = constituent
+        constituents = {}
+        for name, phase, major_axis, minor_axis, inclination in zip(
+            arrays.names,
+            arrays.phase[0],
+            arrays.major_axis[0],
+            arrays.minor_axis[0],
+            arrays.inclination[0],
+        ):
+            constituent = CurrentConstituent(
+                name=name,
+                phase=phase,
+                major_axis=major_axis,
+                minor_axis=minor_axis,
+                inclination=inclination,
+            )
+            constituents[name] = constituent
 
-            return constituents
+        return constituents
 
-    @staticmethod
-    def _validate_data_domain(ds: xr.Dataset, lon: float, lat: float) -> None:
+    def get_bathymetry_batch(self, *, lats: ArrayLike, lons: ArrayLike) -> np.ndarray:
         """
-        Validates the data domain.
+        Reads the bathymetry (positive depth) at the nearest grid points.
+
+        Parameters
+        ----------
+        lats : array_like
+            The latitudes.
+        lons : array_like
+            The longitudes.
+
+        Returns
+        -------
+        np.ndarray
+            The water depths, shape (n_points,).
+        """
+        lon, lat = _as_points(lons, lats)
+        with self._open() as handle:
+            names = ["bathymetry"]
+            if self.lookup == "bilinear":
+                # to tell land from water
+                size = next(n for n in _SIZE_VARIABLES if n in handle.variables)
+                names.insert(0, size)
+            return -self._gather(handle, names, lon, lat).bathymetry()
+
+    def get_grid(self, bbox: Bbox, stride: int = 1) -> ConstituentGrid:
+        """
+        Reads the constituents of all cells in a bounding box.
+
+        Each variable is read with a single (strided) slice.
+
+        Parameters
+        ----------
+        bbox : Bbox
+            The bounding box, (west, south, east, north).
+        stride : int, optional
+            Read every `stride` cell in each direction. Default is 1.
+
+        Returns
+        -------
+        ConstituentGrid
+            The constituents of the block.
+        """
+        with self._open() as handle:
+            ilon, ilat = _block(handle.lon, handle.lat, bbox, stride)
+            kind = "level" if "amplitude" in handle.variables else "current"
+            names = _VARIABLES[kind] + [
+                name for name in ["bathymetry"] if name in handle.variables
+            ]
+            values = {
+                name: handle.variables[name]
+                .isel(lon=ilon, lat=ilat)
+                .transpose("lat", "lon", ...)
+                .values.astype(float)
+                for name in names
+            }
+            return _constituent_grid(
+                kind, handle.names, handle.lon[ilon], handle.lat[ilat], values
+            )
+
+    def get_level_constituents_batch(
+        self, *, lats: ArrayLike, lons: ArrayLike
+    ) -> LevelConstituentArrays:
+        """
+        Reads level constituents for many points at once.
+
+        Parameters
+        ----------
+        lats : array_like
+            The latitudes.
+        lons : array_like
+            The longitudes.
+
+        Returns
+        -------
+        LevelConstituentArrays
+            The constituents, arrays of shape (n_points, n_constituents).
+        """
+        lon, lat = _as_points(lons, lats)
+        with self._open() as handle:
+            handle.validate_data_domain(lon, lat)
+            gathered = self._gather(handle, ["amplitude", "phase"], lon, lat)
+            amplitude, phase = gathered.level()
+            return LevelConstituentArrays(
+                names=handle.names,
+                amplitude=amplitude,
+                phase=phase,
+                snap_distance=gathered.distance,
+            )
+
+    def get_current_constituents_batch(
+        self, *, lats: ArrayLike, lons: ArrayLike
+    ) -> CurrentConstituentArrays:
+        """
+        Reads current constituents for many points at once.
+
+        Parameters
+        ----------
+        lats : array_like
+            The latitudes.
+        lons : array_like
+            The longitudes.
+
+        Returns
+        -------
+        CurrentConstituentArrays
+            The constituents, arrays of shape (n_points, n_constituents).
+        """
+        lon, lat = _as_points(lons, lats)
+        with self._open() as handle:
+            handle.validate_data_domain(lon, lat)
+            gathered = self._gather(
+                handle, ["phase", "major_axis", "minor_axis", "inclination"], lon, lat
+            )
+            phase, major_axis, minor_axis, inclination = gathered.current()
+            return CurrentConstituentArrays(
+                names=handle.names,
+                phase=phase,
+                major_axis=major_axis,
+                minor_axis=minor_axis,
+                inclination=inclination,
+                snap_distance=gathered.distance,
+            )
+
+    def get_current_coefficients_batch(
+        self, *, lats: ArrayLike, lons: ArrayLike
+    ) -> CurrentCoefficientArrays:
         """
-        if lon < ds.lon.min() or lon > ds.lon.max():
-            raise ValueError(f"Longitude {lon} is outside the data domain")
-        if lat < ds.lat.min() or lat > ds.lat.max():
-            raise ValueError(f"Latitude {lat} is outside the data domain")
+        Reads the complex current coefficients for many points at once.
+
+        With `precompute` they are read from the sidecar store, otherwise
+        they are converted from the ellipses.
+
+        Parameters
+        ----------
+        lats : array_like
+            The latitudes.
+        lons : array_like
+            The longitudes.
+
+        Returns
+        -------
+        CurrentCoefficientArrays
+            The coefficients, shape (n_points, 2 n_constituents).
+        """
+        if not self.precompute:
+            return _current_coefficient_arrays(
+                self.get_current_constituents_batch(lats=lats, lons=lons)
+            )
+        lon, lat = _as_points(lons, lats)
+        with self._open() as handle:
+            handle.validate_data_domain(lon, lat)
+            if self._coefficients is None:
+                self._coefficients = load_or_build_store(
+                    self.file_path,
+                    handle.names,
+                    (len(handle.lat), len(handle.lon)),
+                    handle.uv_blocks,
+                )
+            gathered = self._gather(handle, [], lon, lat, store=self._coefficients)
+            return CurrentCoefficientArrays(
+                names=handle.names, uv=gathered.uv(), snap_distance=gathered.distance
+            )
+
+
+def _current_coefficient_arrays(
+    ccons: CurrentConstituentArrays,
+) -> CurrentCoefficientArrays:
+    """The complex coefficients of current constituents."""
+    return CurrentCoefficientArrays(
+        names=ccons.names,
+        uv=uv_coefficients(
+            major_axis=ccons.major_axis,
+            minor_axis=ccons.minor_axis,
+            inclination=ccons.inclination,
+            phase=ccons.phase,
+        ),
+        snap_distance=ccons.snap_distance,
+    )
 
 
 class ConstituentRepository(Protocol):
@@ -142,27 +886,138 @@ class ConstituentRepository(Protocol):
 
     def get_bathymetry(self, lon: float, lat: float) -> float: ...
 
+    def get_level_constituents_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> LevelConstituentArrays: ...
+
+    def get_current_constituents_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> CurrentConstituentArrays: ...
+
+    def get_bathymetry_batch(self, lons: ArrayLike, lats: ArrayLike) -> np.ndarray: ...
+
+    def get_current_coefficients_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> CurrentCoefficientArrays:
+        """
+        Get the complex current coefficients for many points.
+
+        By default they are converted from `get_current_constituents_batch`,
+        repositories with precomputed coefficients override this.
+        """
+        return _current_coefficient_arrays(
+            self.get_current_constituents_batch(lons, lats)
+        )
+
 
 class NetCDFConstituentRepository(ConstituentRepository):
     """
     A repository of tidal constituents stored in a NetCDF file.
+
+    By default the file is opened for every lookup. With `keep_open=True` the
+    file is opened once and kept open, together with its coordinates, until
+    `close` is called or the repository is used as a context manager. The
+    handle is reopened automatically in a forked child process.
+
+    With `lookup="nearest_wet"` points are mapped to the nearest wet cell
+    rather than the nearest cell, so coastal points do not get land values.
+    The wet cell index is built on first use and saved next to the file.
+    With `lookup="bilinear"` the constituents are interpolated from the four
+    surrounding wet cells, read in a single pointwise read.
+
+    With `precompute=True` the complex current coefficients are converted
+    from the ellipses once, on first use, and saved next to the file, so a
+    current prediction reads them directly and is one complex matrix product.
+
+    Examples
+    --------
+    >>> with NetCDFConstituentRepository(path, keep_open=True) as repo:
+    ...     predictor = LevelPredictor(repo)
     """
 
-    def __init__(self, fp: Path) -> None:
+    def __init__(
+        self,
+        fp: Path,
+        keep_open: bool = False,
+        lookup: Lookup = "nearest",
+        precompute: bool = False,
+    ) -> None:
         """
         Parameters
         ----------
         fp : Path
             The path to the NetCDF file.
+        keep_open : bool, optional
+            Keep the file open between calls. Default is False.
+        lookup : Lookup, optional
+            How points are mapped to grid cells, "nearest" (default),
+            "nearest_wet" or "bilinear".
+        precompute : bool, optional
+            Precompute the complex current coefficients. Default is False.
         """
         self._fp = fp
         # TODO inline functions from reader
-        self._reader = ConstituentReader(fp)
+        self._reader = ConstituentReader(
+            fp, keep_open=keep_open, lookup=lookup, precompute=precompute
+        )
+
+    def close(self) -> None:
+        """Close the underlying file, if kept open."""
+        self._reader.close()
+
+    def __enter__(self) -> "NetCDFConstituentRepository":
+        # keep the file open for the duration of the block only
+        self._keep_open = self._reader.keep_open
+        self._reader.keep_open = True
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+        self._reader.keep_open = self._keep_open
+
+    @property
+    def lookup(self) -> Lookup:
+        """How points are mapped to grid cells."""
+        return self._reader.lookup
+
+    def locate(self, lons: ArrayLike, lats: ArrayLike) -> CellLookup:
+        """
+        The grid cells used for the given points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        CellLookup
+            The selected cells, their coordinates and the snap distances.
+        """
+        return self._reader.locate(lats=lats, lons=lons)
+
+    def get_grid(self, bbox: Bbox, stride: int = 1) -> ConstituentGrid:
+        """
+        Get the constituents of all cells in a bounding box.
+
+        Parameters
+        ----------
+        bbox : Bbox
+            The bounding box, (west, south, east, north).
+        stride : int, optional
+            Every `stride` cell in each direction. Default is 1.
+
+        Returns
+        -------
+        ConstituentGrid
+            The constituents of the block, each variable read in one slice.
+        """
+        return self._reader.get_grid(bbox, stride)
 
     def get_bathymetry(self, lon: float, lat: float) -> float:
-        with xr.open_dataset(self._fp) as ds:
-            bathy = -ds.bathymetry.sel(lon=lon, lat=lat, method="nearest").item()
-        return bathy
+        return self._reader.get_bathymetry(lat=lat, lon=lon)
 
     def get_level_constituents(
         self, lon: float, lat: float
@@ -203,3 +1058,567 @@ class NetCDFConstituentRepository(ConstituentRepository):
             The current constituents.
         """
         return self._reader.get_current_constituents(lat=lat, lon=lon)
+
+    def get_level_constituents_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> LevelConstituentArrays:
+        """
+        Get the level constituents for many points.
+
+        The nearest grid cells are found in one vectorized step and each
+        variable is read with a single indexed read.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        LevelConstituentArrays
+            Amplitude and phase, arrays of shape (n_points, n_constituents).
+        """
+        return self._reader.get_level_constituents_batch(lats=lats, lons=lons)
+
+    def get_current_constituents_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> CurrentConstituentArrays:
+        """
+        Get the current constituents for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        CurrentConstituentArrays
+            Phase and ellipse parameters, arrays of shape
+            (n_points, n_constituents).
+        """
+        return self._reader.get_current_constituents_batch(lats=lats, lons=lons)
+
+    def get_current_coefficients_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> CurrentCoefficientArrays:
+        """
+        Get the complex current coefficients for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        CurrentCoefficientArrays
+            The coefficients of u + iv, shape (n_points, 2 n_constituents).
+        """
+        return self._reader.get_current_coefficients_batch(lats=lats, lons=lons)
+
+    def get_bathymetry_batch(self, lons: ArrayLike, lats: ArrayLike) -> np.ndarray:
+        """
+        Get the water depth for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        np.ndarray
+            The water depths (positive), shape (n_points,).
+        """
+        return self._reader.get_bathymetry_batch(lats=lats, lons=lons)
+
+
+_MMAP_MAGIC = b"TPCONST1"
+_MMAP_ALIGN = 4096
+
+
+def convert_to_mmap(src: Path, dst: Path, block_rows: int = 64) -> None:
+    """
+    Convert a NetCDF constituent file to the memory-mapped binary layout.
+
+    The file starts with a magic string, the length of a JSON header and the
+    header itself (kind, constituent names, variables and offsets), followed by
+    the lon and lat coordinates (float64). The constituents follow as one
+    contiguous float32 record per grid cell, cells in (lat, lon) row major
+    order. A record holds each variable for all constituents followed by the
+    bathymetry.
+
+    Parameters
+    ----------
+    src : Path
+        The NetCDF file, level or current constituents.
+    dst : Path
+        The binary file to write.
+    block_rows : int, optional
+        Number of latitude rows converted at a time, bounding memory use.
+    """
+    import xarray as xr
+
+    with xr.open_dataset(src) as ds:
+        kind = "level" if "amplitude" in ds.data_vars else "current"
+        variables = _VARIABLES[kind]
+        lon = ds.lon.values.astype("<f8")
+        lat = ds.lat.values.astype("<f8")
+        names = [str(name) for name in ds.cons.values]
+        record_size = len(variables) * len(names) + 1
+
+        header = {
+            "version": 1,
+            "kind": kind,
+            "names": names,
+            "variables": variables,
+            "nlon": len(lon),
+            "nlat": len(lat),
+            "record_size": record_size,
+        }
+        # offsets depend on the header length, which depends on the offsets
+        header.update(lon_offset=0, lat_offset=0, data_offset=0)
+        while True:
+            size = len(_MMAP_MAGIC) + 8 + len(json.dumps(header).encode())
+            lon_offset = size
+            lat_offset = lon_offset + lon.nbytes
+            data_offset = -(-(lat_offset + lat.nbytes) // _MMAP_ALIGN) * _MMAP_ALIGN
+            if (header["lon_offset"], header["data_offset"]) == (
+                lon_offset,
+                data_offset,
+            ):
+                break
+            header.update(
+                lon_offset=lon_offset, lat_offset=lat_offset, data_offset=data_offset
+            )
+        encoded = json.dumps(header).encode()
+
+        with open(dst, "wb") as f:
+            f.write(_MMAP_MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(encoded)
+            f.write(lon.tobytes())
+            f.write(lat.tobytes())
+            f.write(b"\0" * (data_offset - f.tell()))
+
+            for i in range(0, len(lat), block_rows):
+                rows = ds.isel(lat=slice(i, i + block_rows))
+                parts = [
+                    rows[var].transpose("lat", "lon", "cons").values
+                    for var in variables
+                ]
+                if "bathymetry" in rows:
+                    bathy = rows["bathymetry"].transpose("lat", "lon").values
+                else:
+                    bathy = np.full(parts[0].shape[:2], np.nan)
+                parts.append(bathy[:, :, None])
+                block = np.concatenate(parts, axis=2).astype("<f4")
+                f.write(block.tobytes())
+
+
+class MmapConstituentRepository(ConstituentRepository):
+    """
+    A repository of tidal constituents in a memory-mapped binary file.
+
+    The file is written by `convert_to_mmap` and holds one contiguous record
+    per grid cell, so a point lookup is a single offset read without
+    decompression. The mapping is shared between processes through the page
+    cache. `lookup` and `precompute` work as for
+    `NetCDFConstituentRepository`.
+
+    Examples
+    --------
+    >>> convert_to_mmap(Path("level.nc"), Path("level.tpc"))
+    >>> predictor = LevelPredictor(MmapConstituentRepository(Path("level.tpc")))
+    """
+
+    def __init__(
+        self, fp: Path, lookup: Lookup = "nearest", precompute: bool = False
+    ) -> None:
+        """
+        Parameters
+        ----------
+        fp : Path
+            The path to the binary file.
+        lookup : Lookup, optional
+            How points are mapped to grid cells, "nearest" (default),
+            "nearest_wet" or "bilinear".
+        precompute : bool, optional
+            Precompute the complex current coefficients. Default is False.
+        """
+        if lookup not in _LOOKUPS:
+            raise ValueError(f"Unknown lookup {lookup!r}")
+        self._fp = fp
+        self.lookup = lookup
+        self.precompute = precompute
+        self._index: WetCellIndex | None = None
+        self._coefficients: CurrentCoefficientStore | None = None
+        with open(fp, "rb") as f:
+            if f.read(len(_MMAP_MAGIC)) != _MMAP_MAGIC:
+                raise ValueError(f"{fp} is not a tidepredictor constituent file")
+            (size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(size))
+        self.kind: str = header["kind"]
+        self._header = header
+        self._names: list[str] = header["names"]
+        self._lon = np.fromfile(
+            fp, dtype="<f8", count=header["nlon"], offset=header["lon_offset"]
+        )
+        self._lat = np.fromfile(
+            fp, dtype="<f8", count=header["nlat"], offset=header["lat_offset"]
+        )
+        self._bounds = (
+            self._lon.min(),
+            self._lon.max(),
+            self._lat.min(),
+            self._lat.max(),
+        )
+        self._records: np.memmap | None = None
+
+    def close(self) -> None:
+        """Unmap the file; it is mapped again on the next lookup."""
+        self._records = None
+        self._coefficients = None
+
+    def __enter__(self) -> "MmapConstituentRepository":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict:
+        # pickle the path, not the mapped data or the sidecars
+        state = self.__dict__.copy()
+        state["_records"] = None
+        state["_index"] = None
+        state["_coefficients"] = None
+        return state
+
+    @property
+    def records(self) -> np.memmap:
+        """The (n_cells, record_size) float32 records, mapped on first use."""
+        if self._records is None:
+            header = self._header
+            self._records = np.memmap(
+                self._fp,
+                dtype="<f4",
+                mode="r",
+                offset=header["data_offset"],
+                shape=(header["nlat"] * header["nlon"], header["record_size"]),
+            )
+        return self._records
+
+    def _wet_mask(self) -> np.ndarray:
+        ilat, ilon = np.divmod(np.arange(len(self.records)), len(self._lon))
+        wet = _is_wet(self._read_cells(ilon, ilat))
+        return wet.reshape(len(self._lat), len(self._lon))
+
+    def locate(self, lons: ArrayLike, lats: ArrayLike) -> CellLookup:
+        """
+        The grid cells used for the given points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        CellLookup
+            The selected cells, their coordinates and the snap distances.
+        """
+        lon, lat = _as_points(lons, lats)
+        if self.lookup == "nearest":
+            ilon = _nearest_index(self._lon, lon)
+            ilat = _nearest_index(self._lat, lat)
+            return cell_lookup(self._lon, self._lat, ilon, ilat, lon, lat)
+        if self._index is None:
+            self._index = load_or_build(self._fp, self._lon, self._lat, self._wet_mask)
+        return self._index.query(lon, lat)
+
+    def _uv_blocks(self, block_rows: int = 64) -> Iterator[np.ndarray]:
+        records = self.records.reshape(len(self._lat), len(self._lon), -1)
+        n = len(self._names)
+        for i in range(0, len(self._lat), block_rows):
+            block = records[i : i + block_rows].astype(float)
+            values = {
+                name: block[:, :, j * n : (j + 1) * n]
+                for j, name in enumerate(self._header["variables"])
+            }
+            yield uv_coefficients(
+                major_axis=values["major_axis"],
+                minor_axis=values["minor_axis"],
+                inclination=values["inclination"],
+                phase=values["phase"],
+            )
+
+    def _read_coefficients(
+        self, ilon: np.ndarray, ilat: np.ndarray
+    ) -> dict[str, np.ndarray]:
+        if self._coefficients is None:
+            self._coefficients = load_or_build_store(
+                self._fp,
+                self._names,
+                (len(self._lat), len(self._lon)),
+                self._uv_blocks,
+            )
+        values = self._coefficients.read(ilon, ilat)
+        if self.lookup == "bilinear":
+            # to tell land from water
+            values["bathymetry"] = self.records[ilat * len(self._lon) + ilon, -1]
+        return values
+
+    def _read(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        kind: str | None,
+        read: Callable[[np.ndarray, np.ndarray], dict[str, np.ndarray]] | None = None,
+    ) -> _Gathered:
+        """
+        Values at the points, checking the kind of constituents unless None.
+
+        `read` reads the cells, default all variables of the records.
+        """
+        if kind is not None and kind != self.kind:
+            raise ValueError(f"{self._fp} contains {self.kind} constituents")
+        lon, lat = _as_points(lons, lats)
+        if kind is not None:
+            lon_min, lon_max, lat_min, lat_max = self._bounds
+            outside = (lon < lon_min) | (lon > lon_max)
+            if np.any(outside):
+                raise ValueError(
+                    f"Longitude {lon[outside][0]} is outside the data domain"
+                )
+            outside = (lat < lat_min) | (lat > lat_max)
+            if np.any(outside):
+                raise ValueError(
+                    f"Latitude {lat[outside][0]} is outside the data domain"
+                )
+        return _gather(
+            self._read_cells if read is None else read,
+            self.locate,
+            self.lookup,
+            self._lon,
+            self._lat,
+            lon,
+            lat,
+        )
+
+    def _read_cells(self, ilon: np.ndarray, ilat: np.ndarray) -> dict[str, np.ndarray]:
+        records = self.records[ilat * len(self._lon) + ilon].astype(float)
+        n = len(self._names)
+        values = {
+            name: records[:, i * n : (i + 1) * n]
+            for i, name in enumerate(self._header["variables"])
+        }
+        values["bathymetry"] = records[:, -1]
+        return values
+
+    def get_grid(self, bbox: Bbox, stride: int = 1) -> ConstituentGrid:
+        """
+        Get the constituents of all cells in a bounding box.
+
+        Parameters
+        ----------
+        bbox : Bbox
+            The bounding box, (west, south, east, north).
+        stride : int, optional
+            Every `stride` cell in each direction. Default is 1.
+
+        Returns
+        -------
+        ConstituentGrid
+            The constituents of the block, read as one strided slice of the
+            records.
+        """
+        ilon, ilat = _block(self._lon, self._lat, bbox, stride)
+        records = self.records.reshape(len(self._lat), len(self._lon), -1)
+        block = records[ilat, ilon].astype(float)
+        n = len(self._names)
+        values = {
+            name: block[:, :, i * n : (i + 1) * n]
+            for i, name in enumerate(self._header["variables"])
+        }
+        values["bathymetry"] = block[:, :, -1]
+        return _constituent_grid(
+            self.kind, self._names, self._lon[ilon], self._lat[ilat], values
+        )
+
+    def get_level_constituents(
+        self, lon: float, lat: float
+    ) -> dict[str, LevelConstituent]:
+        """
+        Get the level constituents for a given longitude and latitude.
+
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+
+        Returns
+        -------
+        dict[str, LevelConstituent]
+            The level constituents.
+        """
+        arrays = self.get_level_constituents_batch([lon], [lat])
+        return {
+            name: LevelConstituent(name=name, amplitude=amplitude, phase=phase)
+            for name, amplitude, phase in zip(
+                arrays.names, arrays.amplitude[0], arrays.phase[0]
+            )
+        }
+
+    def get_current_constituents(
+        self, lon: float, lat: float
+    ) -> dict[str, CurrentConstituent]:
+        """
+        Get the current constituents for a given longitude and latitude.
+
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+
+        Returns
+        -------
+        dict[str, CurrentConstituent]
+            The current constituents.
+        """
+        arrays = self.get_current_constituents_batch([lon], [lat])
+        return {
+            name: CurrentConstituent(
+                name=name,
+                phase=phase,
+                major_axis=major_axis,
+                minor_axis=minor_axis,
+                inclination=inclination,
+            )
+            for name, phase, major_axis, minor_axis, inclination in zip(
+                arrays.names,
+                arrays.phase[0],
+                arrays.major_axis[0],
+                arrays.minor_axis[0],
+                arrays.inclination[0],
+            )
+        }
+
+    def get_bathymetry(self, lon: float, lat: float) -> float:
+        return self.get_bathymetry_batch([lon], [lat])[0].item()
+
+    def get_level_constituents_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> LevelConstituentArrays:
+        """
+        Get the level constituents for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        LevelConstituentArrays
+            Amplitude and phase, arrays of shape (n_points, n_constituents).
+        """
+        gathered = self._read(lons, lats, "level")
+        amplitude, phase = gathered.level()
+        return LevelConstituentArrays(
+            names=self._names,
+            amplitude=amplitude,
+            phase=phase,
+            snap_distance=gathered.distance,
+        )
+
+    def get_current_constituents_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> CurrentConstituentArrays:
+        """
+        Get the current constituents for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        CurrentConstituentArrays
+            Phase and ellipse parameters, arrays of shape
+            (n_points, n_constituents).
+        """
+        gathered = self._read(lons, lats, "current")
+        phase, major_axis, minor_axis, inclination = gathered.current()
+        return CurrentConstituentArrays(
+            names=self._names,
+            phase=phase,
+            major_axis=major_axis,
+            minor_axis=minor_axis,
+            inclination=inclination,
+            snap_distance=gathered.distance,
+        )
+
+    def get_current_coefficients_batch(
+        self, lons: ArrayLike, lats: ArrayLike
+    ) -> CurrentCoefficientArrays:
+        """
+        Get the complex current coefficients for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        CurrentCoefficientArrays
+            The coefficients of u + iv, shape (n_points, 2 n_constituents).
+        """
+        if not self.precompute:
+            return _current_coefficient_arrays(
+                self.get_current_constituents_batch(lons, lats)
+            )
+        gathered = self._read(lons, lats, "current", self._read_coefficients)
+        return CurrentCoefficientArrays(
+            names=self._names, uv=gathered.uv(), snap_distance=gathered.distance
+        )
+
+    def get_bathymetry_batch(self, lons: ArrayLike, lats: ArrayLike) -> np.ndarray:
+        """
+        Get the water depth for many points.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+
+        Returns
+        -------
+        np.ndarray
+            The water depths (positive), shape (n_points,).
+        """
+        return -self._read(lons, lats, None).bathymetry()
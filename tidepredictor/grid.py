@@ -0,0 +1,178 @@
+"""
+Gridded predictions over a bounding box.
+
+The constituents of the cells in the box are read as one block, the wet cells
+are evaluated together against a shared time basis, and the maps are
+produced one chunk of times at a time. `write_netcdf` writes the chunks to a
+compressed NetCDF file as they are predicted, so the memory use is bounded by
+the chunk rather than the whole period.
+"""
+
+import itertools
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from tidepredictor.data import (
+    Bbox,
+    MmapConstituentRepository,
+    NetCDFConstituentRepository,
+)
+from tidepredictor.prediction.harmonics import (
+    current_coefficients,
+    datenum,
+    level_coefficients,
+    time_basis,
+)
+
+if TYPE_CHECKING:
+    import netCDF4
+    import xarray as xr
+
+_UNITS = {"level": "m", "u": "m/s", "v": "m/s"}
+_TIME_UNITS = "seconds since 1970-01-01 00:00:00"
+
+
+def predict_grid(
+    repo: NetCDFConstituentRepository | MmapConstituentRepository,
+    bbox: Bbox,
+    times: ArrayLike,
+    stride: int = 1,
+    chunk_size: int = 24,
+) -> Iterator["xr.Dataset"]:
+    """
+    Predict levels or depth averaged currents for all cells in a bounding box.
+
+    Parameters
+    ----------
+    repo : NetCDFConstituentRepository | MmapConstituentRepository
+        The constituents, level or current.
+    bbox : Bbox
+        The bounding box, (west, south, east, north).
+    times : array_like
+        The times, anything convertible to `np.datetime64`.
+    stride : int, optional
+        Predict every `stride` cell in each direction. Default is 1.
+    chunk_size : int, optional
+        Number of times per yielded dataset. Default is 24.
+
+    Yields
+    ------
+    xr.Dataset
+        Consecutive chunks of the times, with the variable level, or u and v,
+        of shape (time, lat, lon) as float32. Land cells are NaN.
+    """
+    import xarray as xr
+
+    grid = repo.get_grid(bbox, stride)
+    names = tuple(grid.names)
+    wet = grid.wet.ravel()
+    n_wet = int(wet.sum())
+
+    def cells(name: str) -> np.ndarray:
+        return grid.values[name].reshape(-1, len(names))[wet]
+
+    if grid.kind == "level":
+        items = ["level"]
+        coefficients = level_coefficients(cells("amplitude"), cells("phase"))
+    else:
+        items = ["u", "v"]
+        coefficients = np.hstack(
+            current_coefficients(
+                major_axis=cells("major_axis"),
+                minor_axis=cells("minor_axis"),
+                inclination=cells("inclination"),
+                phase=cells("phase"),
+            )
+        )
+
+    t_all = np.atleast_1d(np.asarray(times, dtype="datetime64[ns]"))
+    shape = (len(grid.lat), len(grid.lon))
+    for i in range(0, len(t_all), chunk_size):
+        t = t_all[i : i + chunk_size]
+        # all wet cells (and items) with one matrix product
+        values = time_basis(datenum(t), names).synthesize(coefficients)
+        variables = {}
+        for j, item in enumerate(items):
+            out = np.full((len(t), wet.size), np.nan, dtype=np.float32)
+            out[:, wet] = values[:, j * n_wet : (j + 1) * n_wet]
+            variables[item] = xr.Variable(
+                ("time", "lat", "lon"),
+                out.reshape(len(t), *shape),
+                attrs={"units": _UNITS[item]},
+            )
+        yield xr.Dataset(
+            variables, coords={"time": t, "lat": grid.lat, "lon": grid.lon}
+        )
+
+
+def write_netcdf(
+    path: Path, datasets: Iterable["xr.Dataset"], complevel: int = 4
+) -> None:
+    """
+    Write gridded predictions to a NetCDF file, chunk by chunk.
+
+    The file is created from the first chunk and each chunk is appended along
+    the (unlimited) time dimension as it arrives. The variables are stored
+    compressed, chunked by map (one HDF5 chunk per time step).
+
+    Parameters
+    ----------
+    path : Path
+        The NetCDF file to write.
+    datasets : Iterable[xr.Dataset]
+        Chunks along time with the same grid and variables, as yielded by
+        `predict_grid`.
+    complevel : int, optional
+        zlib compression level, 1 (fastest) to 9 (smallest). Default is 4.
+    """
+    import netCDF4
+
+    # the first chunk is predicted before the file is created, so that a
+    # failing prediction leaves no file behind
+    chunks = iter(datasets)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError("No predictions to write")
+    with netCDF4.Dataset(path, "w") as nc:
+        _create(nc, first, complevel)
+        n = 0
+        for ds in itertools.chain([first], chunks):
+            size = ds.sizes["time"]
+            seconds = (ds["time"].values - np.datetime64(0, "s")) / np.timedelta64(
+                1, "s"
+            )
+            nc["time"][n : n + size] = seconds
+            for name in map(str, ds.data_vars):
+                nc[name][n : n + size] = ds[name].values
+            n += size
+
+
+def _create(nc: "netCDF4.Dataset", ds: "xr.Dataset", complevel: int) -> None:
+    nc.createDimension("time", None)
+    nc.createDimension("lat", ds.sizes["lat"])
+    nc.createDimension("lon", ds.sizes["lon"])
+
+    time = nc.createVariable("time", "f8", ("time",))
+    time.units = _TIME_UNITS
+    time.calendar = "standard"
+    for name, units in [("lat", "degrees_north"), ("lon", "degrees_east")]:
+        coord = nc.createVariable(name, "f8", (name,))
+        coord.units = units
+        coord[:] = ds[name].values
+
+    compression: dict[str, Any] = {"zlib": True, "complevel": complevel}
+    for name in map(str, ds.data_vars):
+        variable = nc.createVariable(
+            name,
+            "f4",
+            ("time", "lat", "lon"),
+            shuffle=True,
+            chunksizes=(1, ds.sizes["lat"], ds.sizes["lon"]),
+            fill_value=np.float32(np.nan),
+            **compression,
+        )
+        variable.units = ds[name].attrs.get("units", "")
@@ -0,0 +1,221 @@
+"""
+Spatial index of the wet (ocean) cells of a constituent grid.
+
+Nearest neighbour selection on the regular grid often lands on a land cell for
+coastal stations. The index finds the nearest wet cell instead, using a KD-tree
+on the cell centres mapped to the unit sphere. It is built once per
+constituent file and stored next to it as a sidecar file.
+"""
+
+import os
+import zipfile
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+EARTH_RADIUS = 6_371_008.8
+"""Mean earth radius in metres."""
+
+SIDECAR_SUFFIX = ".wetcells.npz"
+
+_VERSION = 1
+
+
+def great_circle_distance(
+    lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray
+) -> np.ndarray:
+    """
+    Distance in metres between points given in degrees (haversine formula).
+    """
+    lon1, lat1, lon2, lat2 = (np.radians(x) for x in (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _unit_vectors(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+def _fingerprint(path: Path) -> np.ndarray:
+    stat = os.stat(path)
+    return np.array([_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+@dataclass
+class CellLookup:
+    """
+    Grid cells selected for a batch of points.
+
+    Attributes
+    ----------
+    ilon, ilat : np.ndarray
+        Grid indices of the selected cells.
+    lon, lat : np.ndarray
+        Coordinates of the selected cell centres.
+    distance : np.ndarray
+        Distance in metres from each point to its cell centre.
+    """
+
+    ilon: np.ndarray
+    ilat: np.ndarray
+    lon: np.ndarray
+    lat: np.ndarray
+    distance: np.ndarray
+
+
+class WetCellIndex:
+    """
+    Nearest wet cell lookup on a regular lon/lat grid.
+
+    Parameters
+    ----------
+    lon : np.ndarray
+        The longitudes of the grid.
+    lat : np.ndarray
+        The latitudes of the grid.
+    ilon : np.ndarray
+        Longitude indices of the wet cells.
+    ilat : np.ndarray
+        Latitude indices of the wet cells.
+    """
+
+    def __init__(
+        self, lon: np.ndarray, lat: np.ndarray, ilon: np.ndarray, ilat: np.ndarray
+    ) -> None:
+        from scipy.spatial import cKDTree
+
+        if len(ilon) == 0:
+            raise ValueError("The grid has no wet cells")
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.ilon = np.asarray(ilon, dtype=np.int32)
+        self.ilat = np.asarray(ilat, dtype=np.int32)
+        self._tree = cKDTree(
+            _unit_vectors(self.lon[self.ilon], self.lat[self.ilat]),
+            compact_nodes=False,
+            balanced_tree=False,
+        )
+
+    @staticmethod
+    def from_mask(lon: np.ndarray, lat: np.ndarray, wet: np.ndarray) -> "WetCellIndex":
+        """
+        Build the index from a boolean mask of shape (n_lat, n_lon).
+        """
+        ilat, ilon = np.nonzero(wet)
+        return WetCellIndex(lon, lat, ilon, ilat)
+
+    @staticmethod
+    def sidecar_path(path: Path) -> Path:
+        """The sidecar file of a constituent file."""
+        return path.with_name(path.name + SIDECAR_SUFFIX)
+
+    def save(self, path: Path, source: Path) -> None:
+        """
+        Save the wet cells, tagged with the size and modification time of the
+        constituent file they were computed from.
+        """
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(
+                    f,
+                    fingerprint=_fingerprint(source),
+                    lon=self.lon,
+                    lat=self.lat,
+                    ilon=self.ilon,
+                    ilat=self.ilat,
+                )
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    @staticmethod
+    def load(path: Path, source: Path) -> "WetCellIndex | None":
+        """
+        Load a saved index, or None if it is missing or out of date.
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if not np.array_equal(data["fingerprint"], _fingerprint(source)):
+                    return None
+                return WetCellIndex(
+                    data["lon"], data["lat"], data["ilon"], data["ilat"]
+                )
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+
+    def query(self, lon: np.ndarray, lat: np.ndarray) -> CellLookup:
+        """
+        Find the nearest wet cell for each point.
+
+        Parameters
+        ----------
+        lon : np.ndarray
+            The longitudes.
+        lat : np.ndarray
+            The latitudes.
+
+        Returns
+        -------
+        CellLookup
+            The selected cells and the snap distances.
+        """
+        _, k = self._tree.query(_unit_vectors(lon, lat))
+        ilon = self.ilon[k].astype(np.intp)
+        ilat = self.ilat[k].astype(np.intp)
+        return cell_lookup(self.lon, self.lat, ilon, ilat, lon, lat)
+
+
+def cell_lookup(
+    grid_lon: np.ndarray,
+    grid_lat: np.ndarray,
+    ilon: np.ndarray,
+    ilat: np.ndarray,
+    lon: np.ndarray,
+    lat: np.ndarray,
+) -> CellLookup:
+    """Collect the selected cells of a batch of points and their distances."""
+    cell_lon = np.asarray(grid_lon, dtype=float)[ilon]
+    cell_lat = np.asarray(grid_lat, dtype=float)[ilat]
+    return CellLookup(
+        ilon=ilon,
+        ilat=ilat,
+        lon=cell_lon,
+        lat=cell_lat,
+        distance=great_circle_distance(lon, lat, cell_lon, cell_lat),
+    )
+
+
+def load_or_build(
+    source: Path,
+    lon: np.ndarray,
+    lat: np.ndarray,
+    wet_mask: Callable[[], np.ndarray],
+) -> WetCellIndex:
+    """
+    Load the sidecar index of a constituent file, building it if needed.
+
+    `wet_mask` returns a boolean mask of shape (n_lat, n_lon); it is only
+    called when the sidecar is missing or out of date. When
+    the sidecar can not be written (e.g. a read-only data directory) the index
+    is still returned.
+    """
+    path = WetCellIndex.sidecar_path(source)
+    index = WetCellIndex.load(path, source)
+    if index is not None:
+        return index
+    index = WetCellIndex.from_mask(lon, lat, wet_mask())
+    try:
+        index.save(path, source)
+    except OSError:
+        pass
+    return index
@@ -0,0 +1,162 @@
+"""
+Bilinear interpolation of constituents between grid cells.
+
+Amplitudes and phases can not be interpolated directly, a phase of 359 and 1
+degrees averages to 180. The level constituents are interpolated as complex
+amplitudes A exp(-ig), the tidal ellipses as their counterclockwise and
+clockwise rotating components. Land cells get zero weight, the weights of the
+remaining wet cells are renormalised.
+"""
+
+import numpy as np
+
+
+def _bracket(coords: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Index of the lower of the two coordinates bracketing each value, and the
+    fractional position between them (clipped to [0, 1] outside the grid).
+    """
+    descending = coords[0] > coords[-1]
+    if descending:
+        coords = coords[::-1]
+    i0 = np.clip(np.searchsorted(coords, values, side="right") - 1, 0, len(coords) - 2)
+    t = np.clip((values - coords[i0]) / (coords[i0 + 1] - coords[i0]), 0.0, 1.0)
+    if descending:
+        i0 = len(coords) - 2 - i0
+        t = 1.0 - t
+    return i0, t
+
+
+def bilinear_stencil(
+    grid_lon: np.ndarray, grid_lat: np.ndarray, lon: np.ndarray, lat: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The four cells surrounding each point and their bilinear weights.
+
+    Parameters
+    ----------
+    grid_lon : np.ndarray
+        The longitudes of the grid, at least two.
+    grid_lat : np.ndarray
+        The latitudes of the grid, at least two.
+    lon : np.ndarray
+        The longitudes of the points, shape (n_points,).
+    lat : np.ndarray
+        The latitudes of the points, shape (n_points,).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        Longitude indices, latitude indices and weights, each of shape
+        (n_points, 4).
+    """
+    ilon, tlon = _bracket(np.asarray(grid_lon, dtype=float), lon)
+    ilat, tlat = _bracket(np.asarray(grid_lat, dtype=float), lat)
+    ilons = np.stack([ilon, ilon + 1, ilon, ilon + 1], axis=1)
+    ilats = np.stack([ilat, ilat, ilat + 1, ilat + 1], axis=1)
+    weights = np.stack(
+        [
+            (1 - tlon) * (1 - tlat),
+            tlon * (1 - tlat),
+            (1 - tlon) * tlat,
+            tlon * tlat,
+        ],
+        axis=1,
+    )
+    return ilons, ilats, weights
+
+
+def land_aware_weights(weights: np.ndarray, wet: np.ndarray) -> np.ndarray:
+    """
+    Zero the weights of dry cells and renormalise the rest to sum to one.
+
+    Rows without any wet cell with a positive weight are all zero.
+    """
+    weights = np.where(wet, weights, 0.0)
+    total = weights.sum(axis=1, keepdims=True)
+    return np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+
+
+def _combine(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    # weights of zero must not turn land NaNs into NaN results
+    values = np.where(weights[..., None] > 0, values, 0.0)
+    return np.einsum("ps,ps...->p...", weights, values)
+
+
+def interpolate(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Weighted sum of real or complex values, shape (n_points, 4) or (n_points, 4, n).
+    """
+    if values.ndim == 2:
+        return _combine(values[..., None], weights)[:, 0]
+    return _combine(values, weights)
+
+
+def interpolate_level(
+    amplitude: np.ndarray, phase: np.ndarray, weights: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Interpolate level constituents as complex amplitudes.
+
+    Parameters
+    ----------
+    amplitude : np.ndarray
+        Amplitudes, shape (n_points, 4, n_constituents).
+    phase : np.ndarray
+        Phases in degrees, same shape.
+    weights : np.ndarray
+        Weights, shape (n_points, 4).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Amplitude and phase (degrees in [0, 360)), shape
+        (n_points, n_constituents).
+    """
+    z = _combine(amplitude * np.exp(-1j * np.deg2rad(phase)), weights)
+    return np.abs(z), np.rad2deg(-np.angle(z)) % 360.0
+
+
+def interpolate_current(
+    phase: np.ndarray,
+    major_axis: np.ndarray,
+    minor_axis: np.ndarray,
+    inclination: np.ndarray,
+    weights: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Interpolate tidal current ellipses via their rotary components.
+
+    Parameters
+    ----------
+    phase : np.ndarray
+        Phases in degrees, shape (n_points, 4, n_constituents).
+    major_axis : np.ndarray
+        Semi major axes, same shape.
+    minor_axis : np.ndarray
+        Semi minor axes, negative for clockwise rotation, same shape.
+    inclination : np.ndarray
+        Inclinations in degrees, same shape.
+    weights : np.ndarray
+        Weights, shape (n_points, 4).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Phase, major axis, minor axis and inclination, shape
+        (n_points, n_constituents). The inclination is in [0, 180) and the
+        phase in [0, 360) degrees.
+    """
+    theta = np.deg2rad(inclination)
+    g = np.deg2rad(phase)
+    ap = _combine(0.5 * (major_axis + minor_axis) * np.exp(1j * (theta - g)), weights)
+    am = _combine(0.5 * (major_axis - minor_axis) * np.exp(1j * (theta + g)), weights)
+
+    theta = (np.rad2deg(np.angle(am) + np.angle(ap)) / 2) % 360.0
+    g = np.rad2deg(np.angle(am) - np.angle(ap)) / 2
+    # rotating both the inclination and the phase by 180 degrees describes the
+    # same ellipse
+    flip = theta >= 180.0
+    theta = np.where(flip, theta - 180.0, theta)
+    g = np.where(flip, g - 180.0, g) % 360.0
+    return g, np.abs(ap) + np.abs(am), np.abs(ap) - np.abs(am), theta
@@ -1,36 +1,57 @@
+import sys
+from contextlib import nullcontext
+from collections.abc import Callable, Iterable
 from enum import Enum
 from pathlib import Path
 from typing import Annotated, Optional
+import polars as pl
 import typer
 from datetime import datetime, time, timedelta
 
 from tidepredictor import (
     PredictionType,
     NetCDFConstituentRepository,
-    LevelPredictor,
-    CurrentPredictor,
 )
 from tidepredictor import get_default_constituent_path
+from tidepredictor.batch import predict_stations, read_stations
+from tidepredictor.daemon import (
+    DaemonError,
+    DaemonUnavailable,
+    Request,
+    default_socket_path,
+    forward,
+    serve as serve_forever,
+)
+from tidepredictor.output import (
+    Format,
+    write_arrow,
+    write_frames,
+    write_parquet,
+)
 
 app = typer.Typer()
 
 
-class Format(str, Enum):
-    csv = "csv"
-    json = "json"
+class Lookup(str, Enum):
+    nearest = "nearest"
+    nearest_wet = "nearest_wet"
+    bilinear = "bilinear"
 
 
 midnight = datetime.combine(datetime.today(), time.min)
 
 
-@app.command()
+@app.callback(invoke_without_command=True)
 def main(
+    ctx: typer.Context,
     lon: Annotated[
-        float, typer.Option("--lon", "-x", help="Longitude", min=-180, max=180)
-    ],
+        Optional[float],
+        typer.Option("--lon", "-x", help="Longitude", min=-180, max=180),
+    ] = None,
     lat: Annotated[
-        float, typer.Option("--lat", "-y", help="Latitude", min=-90, max=90)
-    ],
+        Optional[float],
+        typer.Option("--lat", "-y", help="Latitude", min=-90, max=90),
+    ] = None,
     start: Annotated[
         Optional[datetime],
         typer.Option("--start", "-s", help="Start date"),
@@ -57,59 +78,328 @@ def main(
             "--precision", "-p", help="Number of decimal places. (csv only)", min=0
         ),
     ] = 3,
+    chunk: Annotated[
+        int,
+        typer.Option(
+            "--chunk", help="Number of days predicted and written at a time", min=1
+        ),
+    ] = 30,
     alpha: Annotated[
         float,
         typer.Option("--alpha", help="Alpha factor for current profile"),
     ] = 1.0 / 7,
+    lookup: Annotated[
+        Lookup,
+        typer.Option(
+            help="Nearest grid cell, nearest wet grid cell or bilinear interpolation"
+        ),
+    ] = Lookup.nearest,
+    socket: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--socket",
+            help="Socket of a running `tidepredictor serve`, used by default when it exists",
+            envvar="TIDEPREDICTOR_SOCKET",
+        ),
+    ] = None,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            "--cache",
+            help="Serve repeated predictions from a result cache on disk",
+        ),
+    ] = False,
+    cache_dir: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--cache-dir",
+            help="Directory of the result cache, default ~/.cache/tidepredictor",
+            envvar="TIDEPREDICTOR_CACHE_DIR",
+        ),
+    ] = None,
 ) -> None:
     """
     Predict the tides for a given location.
     """
-    path = get_default_constituent_path(type)
+    if ctx.invoked_subcommand is not None:
+        return
+    if lon is None:
+        raise typer.BadParameter("Missing option", param_hint="'--lon' / '-x'")
+    if lat is None:
+        raise typer.BadParameter("Missing option", param_hint="'--lat' / '-y'")
 
-    repo = NetCDFConstituentRepository(path)
+    if output is not None:
+        format = Format(output.suffix[1:])
+    if output is None and format == Format.parquet:
+        raise typer.BadParameter(
+            "parquet output requires --output", param_hint="format"
+        )
 
     prediction_start: datetime = start or midnight
     prediction_end: datetime = end or (prediction_start + timedelta(days=1))
+    request = Request(
+        lon=lon,
+        lat=lat,
+        start=prediction_start,
+        end=prediction_end,
+        interval=interval,
+        type=type,
+        lookup=lookup.value,
+        format=format,
+        precision=precision,
+        chunk=chunk,
+        alpha=alpha,
+        cache=cache,
+        cache_dir=None if cache_dir is None else str(cache_dir.expanduser().resolve()),
+    )
 
-    match type:
-        case PredictionType.level:
-            predictor = LevelPredictor(constituent_repo=repo)
-            df = predictor.predict(
-                lon=lon,
-                lat=lat,
-                start=prediction_start,
-                end=prediction_end,
-                interval=timedelta(minutes=interval),
-            )
-        # TODO move this to a separate command (current has more options, alpha, depth, output levels)
-        case PredictionType.current:
-            cpredictor = CurrentPredictor(constituent_repo=repo, alpha=alpha)
-            df = cpredictor.predict_depth_averaged(
-                lon=lon,
-                lat=lat,
-                start=prediction_start,
-                end=prediction_end,
-                interval=timedelta(minutes=interval),
+    # each chunk is written as soon as it is predicted
+    sys.stdout.flush()
+    with (
+        open(output, "wb") if output is not None else nullcontext(sys.stdout.buffer)
+    ) as sink:
+        if socket is not None or default_socket_path().exists():
+            try:
+                forward(socket or default_socket_path(), request, sink)
+                return
+            except DaemonUnavailable:
+                # predict in this process instead
+                pass
+            except DaemonError as e:
+                typer.echo(f"Error: {e}", err=True)
+                raise typer.Exit(1)
+
+        repo = NetCDFConstituentRepository(
+            get_default_constituent_path(type), lookup=lookup.value
+        )
+        write_frames(request.frames(repo), format, sink, precision=precision)
+
+
+@app.command()
+def batch(
+    stations: Annotated[
+        Path,
+        typer.Argument(
+            help="Stations file (csv or parquet) with the columns id, lon, lat and optionally start and end",
+            exists=True,
+            dir_okay=False,
+        ),
+    ],
+    output: Annotated[
+        Path,
+        typer.Option(
+            "--output",
+            "-o",
+            help="Output file, .parquet or .arrow (Arrow IPC)",
+            writable=True,
+        ),
+    ],
+    start: Annotated[
+        Optional[datetime],
+        typer.Option("--start", "-s", help="Start date, for stations without one"),
+    ] = None,
+    end: Annotated[
+        Optional[datetime],
+        typer.Option("--end", "-e", help="End date, for stations without one"),
+    ] = None,
+    interval: Annotated[
+        int, typer.Option("--interval", "-i", help="Interval in minutes", min=1)
+    ] = 30,
+    type: Annotated[
+        PredictionType, typer.Option(help="Type of prediction, level or u,v")
+    ] = PredictionType.level,
+    lookup: Annotated[
+        Lookup,
+        typer.Option(
+            help="Nearest grid cell, nearest wet grid cell or bilinear interpolation"
+        ),
+    ] = Lookup.nearest,
+    batch_size: Annotated[
+        int,
+        typer.Option("--batch-size", help="Number of stations per row group", min=1),
+    ] = 1000,
+    workers: Annotated[
+        int, typer.Option("--workers", "-w", help="Number of worker processes", min=1)
+    ] = 1,
+) -> None:
+    """
+    Predict the tides for all stations in a file.
+
+    The predictions are written in long format (station, time, level or u, v),
+    one row group per batch of stations.
+    """
+    write: Callable[[Iterable[pl.DataFrame], Path], None]
+    match output.suffix:
+        case ".parquet":
+            write = write_parquet
+        case ".arrow" | ".ipc" | ".feather":
+            write = write_arrow
+        case _:
+            raise typer.BadParameter(
+                "Output must be a .parquet or .arrow file", param_hint="'--output'"
             )
+    try:
+        table = read_stations(stations)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="STATIONS")
 
-    # use iso8601 format for datetime and make sure it uses UTC
-    DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
-
-    if output is None:
-        match format:
-            case Format.json:
-                typer.echo(df.write_json())
-            case Format.csv:
-                typer.echo(
-                    df.write_csv(datetime_format=DATE_FORMAT, float_precision=precision)
-                )
-    else:
-        format = Format(output.suffix[1:])
-        if format == "json":
-            df.write_json(output)
-        elif format == "csv":
-            df.write_csv(output, datetime_format=DATE_FORMAT, float_precision=precision)
+    prediction_start: datetime = start or midnight
+    prediction_end: datetime = end or (prediction_start + timedelta(days=1))
+    frames = predict_stations(
+        get_default_constituent_path(type),
+        table,
+        start=prediction_start,
+        end=prediction_end,
+        interval=timedelta(minutes=interval),
+        prediction_type=type,
+        lookup=lookup.value,
+        batch_size=batch_size,
+        workers=workers,
+    )
+    write(frames, output)
+
+
+def _parse_bbox(value: str) -> tuple[float, float, float, float]:
+    try:
+        west, south, east, north = (float(x) for x in value.split(","))
+    except ValueError:
+        raise typer.BadParameter(
+            "Expected four numbers, west,south,east,north", param_hint="'--bbox'"
+        )
+    if west > east or south > north:
+        raise typer.BadParameter(
+            "Expected west <= east and south <= north", param_hint="'--bbox'"
+        )
+    return west, south, east, north
+
+
+@app.command()
+def grid(
+    bbox: Annotated[
+        str,
+        typer.Option(
+            "--bbox", "-b", help="Bounding box, west,south,east,north in degrees"
+        ),
+    ],
+    output: Annotated[
+        Path,
+        typer.Option("--output", "-o", help="Output NetCDF file", writable=True),
+    ],
+    start: Annotated[
+        Optional[datetime],
+        typer.Option("--start", "-s", help="Start date"),
+    ] = None,
+    end: Annotated[
+        Optional[datetime], typer.Option("--end", "-e", help="End date")
+    ] = None,
+    interval: Annotated[
+        int, typer.Option("--interval", "-i", help="Interval in minutes", min=1)
+    ] = 30,
+    type: Annotated[
+        PredictionType, typer.Option(help="Type of prediction, level or u,v")
+    ] = PredictionType.level,
+    stride: Annotated[
+        int,
+        typer.Option(help="Predict every n-th grid cell in each direction", min=1),
+    ] = 1,
+    chunk: Annotated[
+        int,
+        typer.Option("--chunk", help="Number of time steps predicted at a time", min=1),
+    ] = 24,
+) -> None:
+    """
+    Predict the tides for all grid cells in a bounding box.
+
+    The maps are written to a compressed NetCDF file with the dimensions time,
+    lat and lon, chunk by chunk.
+    """
+    from tidepredictor.grid import predict_grid, write_netcdf
+    from tidepredictor.prediction.harmonics import time_grid
+
+    box = _parse_bbox(bbox)
+    prediction_start: datetime = start or midnight
+    prediction_end: datetime = end or (prediction_start + timedelta(days=1))
+    times = time_grid(prediction_start, prediction_end, timedelta(minutes=interval))
+    with NetCDFConstituentRepository(get_default_constituent_path(type)) as repo:
+        try:
+            maps = predict_grid(repo, box, times, stride=stride, chunk_size=chunk)
+            write_netcdf(output, maps)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="'--bbox'")
+
+
+@app.command()
+def serve(
+    socket: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--socket",
+            help="Socket to listen on, default is private to the user",
+            envvar="TIDEPREDICTOR_SOCKET",
+        ),
+    ] = None,
+) -> None:
+    """
+    Serve predictions to the tidepredictor command from a resident process.
+
+    The constituent files are kept open and the time basis cache warm between
+    calls. Stop the daemon with Ctrl-C.
+    """
+    try:
+        serve_forever(socket or default_socket_path())
+    except DaemonError as e:
+        raise typer.BadParameter(str(e), param_hint="'--socket'")
+
+
+@app.command()
+def http(
+    host: Annotated[
+        str, typer.Option(help="Address to listen on, default local only")
+    ] = "127.0.0.1",
+    port: Annotated[int, typer.Option("--port", "-p", help="Port")] = 8000,
+    workers: Annotated[
+        int, typer.Option("--workers", "-w", help="Number of worker threads", min=1)
+    ] = 4,
+    window: Annotated[
+        float,
+        typer.Option(
+            help="Milliseconds single point requests are collected to be predicted together",
+            min=0,
+        ),
+    ] = 5.0,
+    cache: Annotated[
+        bool,
+        typer.Option(
+            "--cache",
+            help="Store predictions in a result cache on disk and serve repeated requests from it",
+        ),
+    ] = False,
+    cache_dir: Annotated[
+        Optional[Path],
+        typer.Option(
+            "--cache-dir",
+            help="Directory of the result cache, default ~/.cache/tidepredictor",
+            envvar="TIDEPREDICTOR_CACHE_DIR",
+        ),
+    ] = None,
+) -> None:
+    """
+    Serve predictions over HTTP.
+
+    GET /predict?lon=..&lat=.. predicts a point, POST /predict a list of
+    stations and GET /metrics reports latencies and cache statistics.
+    """
+    from tidepredictor.cache import ResultCache
+    from tidepredictor.service import run
+
+    typer.echo(f"Listening on http://{host}:{port}", err=True)
+    run(
+        host=host,
+        port=port,
+        workers=workers,
+        window=window / 1000,
+        disk_cache=ResultCache(cache_dir) if cache else None,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+"""
+Writing predictions.
+
+The writers consume an iterable of frames (chunks of a prediction) and write
+each one as it arrives, so the full prediction is never held in memory.
+"""
+
+import io
+from collections.abc import Iterable
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+import polars as pl
+
+# use iso8601 format for datetime and make sure it uses UTC
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+class Format(str, Enum):
+    csv = "csv"
+    json = "json"
+    ndjson = "ndjson"
+    parquet = "parquet"
+    arrow = "arrow"
+
+
+def write_csv(frames: Iterable[pl.DataFrame], stream: TextIO, precision: int) -> None:
+    """
+    Write frames as CSV, with the header from the first frame.
+
+    Parameters
+    ----------
+    frames : Iterable[pl.DataFrame]
+        The frames, with the same columns.
+    stream : TextIO
+        The output.
+    precision : int
+        Number of decimal places.
+    """
+    for i, df in enumerate(frames):
+        df.write_csv(
+            stream,
+            include_header=i == 0,
+            datetime_format=DATE_FORMAT,
+            float_precision=precision,
+        )
+        stream.flush()
+
+
+def write_json(frames: Iterable[pl.DataFrame], stream: TextIO) -> None:
+    """
+    Write frames as a single JSON array of row objects.
+
+    The output is the same as `pl.DataFrame.write_json` of the concatenated
+    frames.
+
+    Parameters
+    ----------
+    frames : Iterable[pl.DataFrame]
+        The frames, with the same columns.
+    stream : TextIO
+        The output.
+    """
+    stream.write("[")
+    first = True
+    for df in frames:
+        # the rows of the frame without the enclosing brackets
+        rows = df.write_json()[1:-1]
+        if not rows:
+            continue
+        if not first:
+            stream.write(",")
+        stream.write(rows)
+        stream.flush()
+        first = False
+    stream.write("]\n")
+    stream.flush()
+
+
+def write_ndjson(frames: Iterable[pl.DataFrame], stream: TextIO) -> None:
+    """
+    Write frames as newline delimited JSON, one object per row.
+
+    Parameters
+    ----------
+    frames : Iterable[pl.DataFrame]
+        The frames, with the same columns.
+    stream : TextIO
+        The output.
+    """
+    for df in frames:
+        stream.write(df.write_ndjson())
+        stream.flush()
+
+
+def write_parquet(frames: Iterable[pl.DataFrame], sink: Path | BinaryIO) -> None:
+    """
+    Write frames to a Parquet file, one row group per frame.
+
+    Parameters
+    ----------
+    frames : Iterable[pl.DataFrame]
+        The frames, with the same schema.
+    sink : Path | BinaryIO
+        The output file or stream.
+    """
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for df in frames:
+            table = df.to_arrow()
+            if writer is None:
+                writer = pq.ParquetWriter(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_arrow(frames: Iterable[pl.DataFrame], sink: Path | BinaryIO) -> None:
+    """
+    Write frames as Arrow IPC, one record batch per frame.
+
+    A path is written in the IPC file format, a binary stream (e.g. stdout)
+    in the IPC streaming format, which a reader can consume as the batches
+    arrive.
+
+    Parameters
+    ----------
+    frames : Iterable[pl.DataFrame]
+        The frames, with the same schema.
+    sink : Path | BinaryIO
+        The output file or stream.
+    """
+    import pyarrow as pa
+
+    new_writer = pa.ipc.new_file if isinstance(sink, (str, Path)) else pa.ipc.new_stream
+    writer = None
+    try:
+        for df in frames:
+            table = df.to_arrow()
+            if writer is None:
+                writer = new_writer(sink, table.schema)
+            writer.write_table(table)
+            if not isinstance(sink, (str, Path)):
+                sink.flush()
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_frames(
+    frames: Iterable[pl.DataFrame],
+    format: Format,
+    stream: BinaryIO,
+    precision: int = 3,
+) -> None:
+    """
+    Write frames to a binary stream in any of the output formats.
+
+    Parameters
+    ----------
+    frames : Iterable[pl.DataFrame]
+        The frames, with the same schema.
+    format : Format
+        The output format.
+    stream : BinaryIO
+        The output, text formats are encoded as UTF-8.
+    precision : int, optional
+        Number of decimal places, csv only.
+    """
+    match format:
+        case Format.parquet:
+            write_parquet(frames, stream)
+        case Format.arrow:
+            write_arrow(frames, stream)
+        case _:
+            text = io.TextIOWrapper(
+                stream, encoding="utf-8", newline="", write_through=True
+            )
+            try:
+                match format:
+                    case Format.csv:
+                        write_csv(frames, text, precision=precision)
+                    case Format.json:
+                        write_json(frames, text)
+                    case Format.ndjson:
+                        write_ndjson(frames, text)
+            finally:
+                # leave the stream open for the caller
+                text.detach()
@@ -1,4 +1,19 @@
-from .level import LevelPredictor
-from .current import CurrentPredictor
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .level import LevelPredictor
+    from .current import CurrentPredictor
+
+_LAZY = {"LevelPredictor": ".level", "CurrentPredictor": ".current"}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["LevelPredictor", "CurrentPredictor"]
@@ -0,0 +1,48 @@
+"""Assembling multi-station predictions into data frames."""
+
+from collections.abc import Sequence
+
+import numpy as np
+import polars as pl
+
+
+def station_ids(ids: Sequence | None, n: int) -> list:
+    """Station ids, defaulting to 0..n-1."""
+    if ids is None:
+        return list(range(n))
+    ids = list(ids)
+    if len(ids) != n:
+        raise ValueError(f"Expected {n} station ids, got {len(ids)}")
+    return ids
+
+
+def stations_frame(
+    times: np.ndarray,
+    ids: list,
+    values: dict[str, np.ndarray],
+    wide: bool = False,
+) -> pl.DataFrame:
+    """
+    Build a frame from predictions of shape (n_times, n_stations).
+
+    The long format has the columns station, time and one column per item,
+    ordered by station and time. The wide format has a time column and one
+    column per station, named by the station id for a single item or
+    `{item}_{station}` for several items.
+    """
+    if wide:
+        columns: dict[str, np.ndarray] = {"time": times}
+        for i, station in enumerate(ids):
+            for item, value in values.items():
+                name = str(station) if len(values) == 1 else f"{item}_{station}"
+                columns[name] = value[:, i]
+        return pl.DataFrame(columns)
+
+    n_times = len(times)
+    return pl.DataFrame(
+        {
+            "station": pl.Series(ids).gather(np.repeat(np.arange(len(ids)), n_times)),
+            "time": np.tile(times, len(ids)),
+            **{item: value.T.ravel() for item, value in values.items()},
+        }
+    )
@@ -1,90 +1,185 @@
-"""Coef class for utide adapter."""
+"""Prepared coefficients for the utide adapter."""
+
+import functools
+from types import MappingProxyType
+from typing import Any, Mapping
 
-from dataclasses import dataclass
-from typing import Any
 import numpy as np
+from numpy.typing import ArrayLike
+
+from .harmonics import constituent_index, ut_constants
+
+# the options of the original configuration, without nodal corrections, trend
+# or prefiltering
+_OPT: Mapping[str, Any] = MappingProxyType(
+    {
+        "twodim": False,
+        "nodiagn": True,
+        "nodsatlint": 0,
+        "nodsatnone": True,
+        "gwchlint": False,
+        "gwchnone": False,
+        "notrend": True,
+        "prefilt": np.array([]),
+    }
+)
+_REFTIME = 737429.1458333333
+_LAT = 42.0
+
+
+def _read_only(values: ArrayLike) -> np.ndarray:
+    array = np.array(values, dtype=float)
+    array.flags.writeable = False
+    return array
+
+
+class _Frozen:
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
 
-@dataclass
-class Coef:
-    name: list[str]
-    mean: float  # level
-    umean: float  # current
-    vmean: float  # current
-    A: np.ndarray  # level
+class CoefSkeleton(_Frozen):
+    """
+    The part of the coefficients that depends on the constituents only.
+
+    Shared by all points with the same constituents, see `skeleton`.
+
+    Attributes
+    ----------
+    name : tuple[str, ...]
+        The constituent names.
+    aux : Mapping[str, Any]
+        The frequencies (cycles per hour) and indices into the UTide tables of
+        the constituents and the options of `utide.reconstruct`, read-only.
+    """
+
+    __slots__ = ("name", "aux")
+    name: tuple[str, ...]
+    aux: Mapping[str, Any]
+
+    def __init__(self, names: tuple[str, ...], twodim: bool) -> None:
+        index = constituent_index()
+        try:
+            lind = np.array([index[name] for name in names], dtype=int)
+        except KeyError as e:
+            raise ValueError(f"Unknown constituent in {names}") from e
+        lind.flags.writeable = False
+        frq = _read_only(ut_constants()["const"]["freq"][lind])
+
+        object.__setattr__(self, "name", names)
+        object.__setattr__(
+            self,
+            "aux",
+            MappingProxyType(
+                {
+                    "reftime": _REFTIME,
+                    "frq": frq,
+                    "lind": lind,
+                    "lat": _LAT,
+                    "opt": MappingProxyType({**_OPT, "twodim": twodim}),
+                }
+            ),
+        )
+
+
+@functools.cache
+def skeleton(names: tuple[str, ...], twodim: bool = False) -> CoefSkeleton:
+    """
+    The skeleton of a constituent set, built once per set and process.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        The constituent names.
+    twodim : bool, optional
+        Currents (u and v) rather than levels. Default is False.
+    """
+    return CoefSkeleton(names, twodim)
+
+
+_EMPTY = _read_only([])
+
+
+class Coef(_Frozen):
+    """
+    Immutable coefficients of one point for `utide.reconstruct`.
+
+    Only the amplitudes (or ellipses) and phases are per point, the rest is
+    the shared `CoefSkeleton` of the constituents. Use `Coef.level` or
+    `Coef.current` to create one and `as_dict` to pass it to `reconstruct`.
+    """
+
+    __slots__ = ("skeleton", "A", "g", "Lsmaj", "Lsmin", "theta")
+    skeleton: CoefSkeleton
+    A: np.ndarray
     g: np.ndarray
-    Lsmaj: np.ndarray  # current
-    Lsmin: np.ndarray  # current
-    theta: np.ndarray  # current
-    aux: dict[str, Any]  # TODO exctract aux to a separate dataclass
+    Lsmaj: np.ndarray
+    Lsmin: np.ndarray
+    theta: np.ndarray
 
-    def __post_init__(self) -> None:
-        # TODO add validation for current
-        assert len(self.A) == len(self.g) == len(self.name) == len(self.aux["frq"])
+    def __init__(
+        self,
+        skeleton: CoefSkeleton,
+        g: np.ndarray,
+        A: np.ndarray = _EMPTY,
+        Lsmaj: np.ndarray = _EMPTY,
+        Lsmin: np.ndarray = _EMPTY,
+        theta: np.ndarray = _EMPTY,
+    ) -> None:
+        for name, value in [
+            ("skeleton", skeleton),
+            ("A", A),
+            ("g", g),
+            ("Lsmaj", Lsmaj),
+            ("Lsmin", Lsmin),
+            ("theta", theta),
+        ]:
+            object.__setattr__(self, name, value)
 
     @staticmethod
-    def template() -> "Coef":
-        """Create a template Coef object with default values from the original configuration."""
+    def level(names: tuple[str, ...], amplitude: ArrayLike, phase: ArrayLike) -> "Coef":
+        """Coefficients of the level at a point."""
+        return Coef(skeleton(names), A=_read_only(amplitude), g=_read_only(phase))
+
+    @staticmethod
+    def current(
+        names: tuple[str, ...],
+        major_axis: ArrayLike,
+        minor_axis: ArrayLike,
+        inclination: ArrayLike,
+        phase: ArrayLike,
+    ) -> "Coef":
+        """Coefficients of the depth averaged current at a point."""
         return Coef(
-            name=["K1", "K2", "M2", "M4", "MF", "MM", "MN4", "MS4", "N2"],
-            mean=0.0,
-            umean=0.0,
-            vmean=0.0,
-            A=np.array(
-                [
-                    1.00227454,
-                    0.02250278,
-                    0.01775812,
-                    0.01605451,
-                    0.01220086,
-                    0.00751468,
-                    0.00708371,
-                    0.00577484,
-                    0.00313313,
-                ]
-            ),
-            g=np.array(
-                [
-                    139.03197411,
-                    144.78007052,
-                    117.14151752,
-                    104.1430418,
-                    216.82454621,
-                    4.40876086,
-                    240.44658427,
-                    50.66603851,
-                    144.04531879,
-                ]
-            ),
-            Lsmaj=np.array([]),
-            Lsmin=np.array([]),
-            theta=np.array([]),
-            aux={
-                "reftime": 737429.1458333333,
-                "frq": np.array(
-                    [
-                        0.0805114,
-                        0.04178075,
-                        0.3220456,
-                        0.20280355,
-                        0.1207671,
-                        0.28331495,
-                        0.1610228,
-                        0.2415342,
-                        0.20844741,
-                    ]
-                ),
-                "lind": np.array([47, 20, 124, 95, 68, 119, 81, 105, 98]),
-                "lat": 42.0,
-                "opt": {
-                    "twodim": False,
-                    "nodiagn": True,
-                    "nodsatlint": 0,
-                    "nodsatnone": True,
-                    "gwchlint": False,
-                    "gwchnone": False,
-                    "notrend": True,
-                    "prefilt": np.array([]),
-                },
-            },
+            skeleton(names, twodim=True),
+            Lsmaj=_read_only(major_axis),
+            Lsmin=_read_only(minor_axis),
+            theta=_read_only(inclination),
+            g=_read_only(phase),
         )
+
+    @property
+    def name(self) -> tuple[str, ...]:
+        return self.skeleton.name
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        The mapping `utide.reconstruct` expects.
+
+        The arrays and `aux` are shared, not copied; `reconstruct` only reads
+        them.
+        """
+        return {
+            "name": self.skeleton.name,
+            "mean": 0.0,
+            "umean": 0.0,
+            "vmean": 0.0,
+            "A": self.A,
+            "g": self.g,
+            "Lsmaj": self.Lsmaj,
+            "Lsmin": self.Lsmin,
+            "theta": self.theta,
+            "aux": self.skeleton.aux,
+        }
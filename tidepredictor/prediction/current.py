@@ -1,21 +1,37 @@
+from collections.abc import Iterator, Sequence
 from typing import Collection
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 
-from dataclasses import asdict
+from numpy.typing import ArrayLike
 from tidepredictor.data import ConstituentRepository
 
 import polars as pl
 
-import warnings
-
+from ._frames import station_ids, stations_frame
 from .coef import Coef
-
-# Suppress warnings issued by utide
-warnings.filterwarnings("ignore", category=RuntimeWarning)
-warnings.filterwarnings("ignore", category=DeprecationWarning)
-from utide import reconstruct, ut_constants  # noqa: E402
+from .events import (
+    reversals,
+    speed_turning_points,
+    synthesize_at,
+    threshold_crossings,
+)
+from .harmonics import (
+    Backend,
+    align_coefficients,
+    current_coefficients,
+    datenum,
+    from_datenum,
+    grid_basis,
+    level_coefficients,
+    reconstruct,
+    time_basis,
+    time_chunks,
+    time_grid,
+)
+from .level import LevelPredictor
+from .profile import CurrentProfile, power_law_profile, profile_depths
+from .track import group_samples, synthesize_track, track_samples
 
 
 class CurrentPredictor:
@@ -27,14 +43,22 @@ class CurrentPredictor:
         Current constituent repository.
     alpha:
         Current profile power exponent.
+    backend:
+        Harmonic synthesis backend. "native" (default) uses the vectorized
+        engine in `tidepredictor.prediction.harmonics`, "utide" uses
+        `utide.reconstruct` and is kept as a reference.
 
     """
 
     def __init__(
-        self, constituent_repo: ConstituentRepository, alpha: float = 1.0 / 7
+        self,
+        constituent_repo: ConstituentRepository,
+        alpha: float = 1.0 / 7,
+        backend: Backend = "native",
     ) -> None:
         self._constituent_repo = constituent_repo
         self._alpha = alpha
+        self._backend = backend
 
     def predict_profile(
         self,
@@ -44,34 +68,135 @@ class CurrentPredictor:
         end: datetime,
         interval: timedelta = timedelta(hours=1),
         levels: Collection[float] | None = None,
+        level_repo: ConstituentRepository | None = None,
     ) -> pl.DataFrame:
-        """Predict current profiles."""
-        df = self.predict_depth_averaged(
-            lon=lon, lat=lat, start=start, end=end, interval=interval
-        ).rename({"u": "uavg", "v": "vavg"})
+        """Predict current profiles.
 
-        total_water_depth = self._constituent_repo.get_bathymetry(lon, lat)
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        interval : timedelta
+            The interval between predictions.
+        levels : Collection[float], optional
+            The levels, negative below the surface. Default is 10 levels from
+            the bed to the surface.
+        level_repo : ConstituentRepository, optional
+            Level constituents, the water depth then follows the tide, see
+            `predict_profiles`.
 
-        if levels is None:
-            depths = np.linspace(-total_water_depth, 0, num=10)
-        else:
-            depths = levels  # type: ignore
+        Returns
+        -------
+        pl.DataFrame
+            The columns time, depth, uavg, u, vavg, v and total_water_depth
+            (and level with `level_repo`), ordered by time and level.
+        """
+        profile = self.predict_profiles(
+            [lon],
+            [lat],
+            start,
+            end,
+            interval,
+            depths=None if levels is None else list(levels),
+            level_repo=level_repo,
+        )
+        return profile.to_frame().drop("station")
 
-        # TODO validate depths is in valid range
+    def predict_profiles(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(hours=1),
+        depths: ArrayLike | None = None,
+        n_levels: int = 10,
+        alpha: ArrayLike | None = None,
+        ids: Sequence | None = None,
+        level_repo: ConstituentRepository | None = None,
+    ) -> CurrentProfile:
+        """Predict current profiles for many points.
 
-        df_expanded = df.join(pl.DataFrame({"depth": depths}), how="cross")
+        The profiles are computed with array broadcasting, as dense
+        (time, level, point) arrays.
 
-        z = total_water_depth
-        alpha = self._alpha
-        factor = (1.0 + alpha) * ((pl.col("depth") + z) / z).pow(alpha)
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        interval : timedelta
+            The interval between predictions.
+        depths : array_like, optional
+            The levels, negative below the surface, shape (n_levels,) for all
+            points or (n_points, n_levels) per point. Default is `n_levels`
+            levels from the bed to the surface of each point.
+        n_levels : int, optional
+            Number of default levels, default 10.
+        alpha : array_like, optional
+            Power law exponent, a scalar or one per point. Default is the
+            alpha of the predictor.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        level_repo : ConstituentRepository, optional
+            Level constituents. When given, the total water depth follows the
+            tide, h(t) = bathymetry + level(t), with the levels relative to
+            the instantaneous surface, and the default levels span the
+            shallowest water column. The levels and the currents are
+            synthesized together from one time basis.
 
-        dfr = df_expanded.with_columns(
-            (pl.col("uavg") * factor).alias("u"),
-            (pl.col("vavg") * factor).alias("v"),
-            pl.lit(total_water_depth).alias("total_water_depth"),
+        Returns
+        -------
+        CurrentProfile
+            The profiles, see `CurrentProfile.to_frame` and
+            `CurrentProfile.to_xarray` for a frame or a Dataset.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        stations = station_ids(ids, len(lons))
+        bathymetry = np.asarray(
+            self._constituent_repo.get_bathymetry_batch(lons, lats), dtype=float
+        )
+        if level_repo is None:
+            times, uavg, vavg = self._depth_averaged(lons, lats, start, end, interval)
+            level = None
+            water_depth = bathymetry
+            depth = profile_depths(bathymetry, depths, n_levels)
+        else:
+            times, uavg, vavg, level = self._depth_averaged_and_level(
+                level_repo, lons, lats, start, end, interval
+            )
+            water_depth = bathymetry + level
+            depth = profile_depths(water_depth.min(axis=0), depths, n_levels)
+        u, v = power_law_profile(
+            uavg,
+            vavg,
+            depth,
+            water_depth,
+            self._alpha if alpha is None else np.asarray(alpha, dtype=float),
+        )
+        return CurrentProfile(
+            time=times,
+            ids=stations,
+            depth=depth,
+            water_depth=water_depth,
+            uavg=uavg,
+            vavg=vavg,
+            u=u,
+            v=v,
+            level=level,
         )
-
-        return dfr["time", "depth", "uavg", "u", "vavg", "v", "total_water_depth"]
 
     def predict_depth_averaged(
         self,
@@ -103,8 +228,15 @@ class CurrentPredictor:
 
         Notes
         -----
-        The workhorse of this functions the `reconstruct` function from [`UTide`](https://github.com/wesleybowman/UTide)
+        With the "utide" backend the workhorse of this functions the `reconstruct` function from [`UTide`](https://github.com/wesleybowman/UTide)
         """
+        if self._backend == "native":
+            times = time_grid(start, end, interval)
+            names, cu, cv = self._native_coefficients(lon=lon, lat=lat)
+            basis = grid_basis(start, interval, len(times), names)
+            return pl.DataFrame(
+                {"time": times, "u": basis.synthesize(cu), "v": basis.synthesize(cv)}
+            )
 
         df = pl.DataFrame().with_columns(
             # TODO use ms instead of ns
@@ -112,6 +244,8 @@ class CurrentPredictor:
                 "time"
             ),
         )
+        import pandas as pd
+
         # TODO do we need this?
         t = pd.date_range(start=start, end=end, freq=interval)
 
@@ -119,9 +253,7 @@ class CurrentPredictor:
             lon=lon,
             lat=lat,
         )
-        coefd = asdict(coef)
-        coefd["aux"]["opt"]["twodim"] = True
-        uv = reconstruct(t, coefd, verbose=False)
+        uv = reconstruct(t, coef.as_dict())
 
         df = df.with_columns(
             pl.Series("u", uv["u"]).alias("u"),
@@ -130,26 +262,482 @@ class CurrentPredictor:
 
         return df
 
-    def _coef(self, lon: float, lat: float) -> Coef:
-        coef = Coef.template()
+    def predict_depth_averaged_iter(
+        self,
+        lon: float,
+        lat: float,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(hours=1),
+        chunk: timedelta = timedelta(days=30),
+    ) -> Iterator[pl.DataFrame]:
+        """Predict depth averaged currents chunk by chunk.
 
-        ccons = self._constituent_repo.get_current_constituents(lon=lon, lat=lat)
-        coef.Lsmaj = np.array([v.major_axis for v in ccons.values()])
-        coef.Lsmin = np.array([v.minor_axis for v in ccons.values()])
-        coef.theta = np.array([v.inclination for v in ccons.values()])
-        coef.g = np.array([v.phase for v in ccons.values()])
-        names = list(ccons.keys())
+        Long, high resolution series can be produced with bounded memory, only
+        one chunk is computed and held at a time.
+
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        interval : timedelta
+            The interval between predictions.
+        chunk : timedelta
+            The period covered by each chunk, default 30 days.
+
+        Yields
+        ------
+        pl.DataFrame
+            Consecutive parts of the frame returned by `predict_depth_averaged`.
+            With the native backend the concatenated chunks are identical to
+            `predict_depth_averaged`.
+        """
+        if self._backend == "native":
+            names, cu, cv = self._native_coefficients(lon=lon, lat=lat)
+
+        for times in time_chunks(start, end, interval, chunk):
+            if self._backend == "native":
+                basis = time_basis(datenum(times), names)
+                yield pl.DataFrame(
+                    {
+                        "time": times,
+                        "u": basis.synthesize(cu),
+                        "v": basis.synthesize(cv),
+                    }
+                )
+            else:
+                yield self.predict_depth_averaged(
+                    lon=lon,
+                    lat=lat,
+                    start=times[0].astype("datetime64[us]").item(),
+                    end=times[-1].astype("datetime64[us]").item(),
+                    interval=interval,
+                )
+
+    def predict_depth_averaged_many(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(hours=1),
+        ids: Sequence | None = None,
+        wide: bool = False,
+    ) -> pl.DataFrame:
+        """Predict depth averaged currents for many stations over the same period.
+
+        The time basis is computed once and all stations are evaluated with
+        a single matrix product.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        interval : timedelta
+            The interval between predictions.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        wide : bool, optional
+            Return columns u_{id} and v_{id} per station instead of the long
+            format with columns station, time, u and v. Default is False.
 
-        # TODO extract below into common function for level and current
-        unames = ut_constants["const"]["name"]
-        ufreqs = ut_constants["const"]["freq"]
+        Returns
+        -------
+        pl.DataFrame
+            The predicted currents.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        stations = station_ids(ids, len(lons))
+        times, u, v = self._depth_averaged(lons, lats, start, end, interval)
+        return stations_frame(times, stations, {"u": u, "v": v}, wide=wide)
 
-        freq_map = {n: float(f) for n, f in zip(unames, ufreqs)}
+    def _depth_averaged(
+        self,
+        lons: np.ndarray,
+        lats: np.ndarray,
+        start: datetime,
+        end: datetime,
+        interval: timedelta,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The times and u and v of shape (n_times, n_points)."""
+        times = time_grid(start, end, interval)
+        if self._backend == "native":
+            coefficients = self._constituent_repo.get_current_coefficients_batch(
+                lons, lats
+            )
+            basis = grid_basis(start, interval, len(times), tuple(coefficients.names))
+            # u + iv of all points with one matrix product
+            uv = basis.synthesize_complex(coefficients.uv.T)
+            u, v = uv.real, uv.imag
+        else:
+            dfs = [
+                self.predict_depth_averaged(lon, lat, start, end, interval)
+                for lon, lat in zip(lons, lats)
+            ]
+            u = np.column_stack([df["u"].to_numpy() for df in dfs])
+            v = np.column_stack([df["v"].to_numpy() for df in dfs])
+        return times, u, v
+
+    def _depth_averaged_and_level(
+        self,
+        level_repo: ConstituentRepository,
+        lons: np.ndarray,
+        lats: np.ndarray,
+        start: datetime,
+        end: datetime,
+        interval: timedelta,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """The times, u, v and level of shape (n_times, n_points)."""
+        if self._backend != "native":
+            times, u, v = self._depth_averaged(lons, lats, start, end, interval)
+            wide = LevelPredictor(level_repo, backend=self._backend).predict_many(
+                lons, lats, start, end, interval, wide=True
+            )
+            return times, u, v, wide.drop("time").to_numpy()
+
+        times = time_grid(start, end, interval)
+        current_names, cu, cv = self._native_coefficients_batch(lons, lats)
+        lcons = level_repo.get_level_constituents_batch(lons, lats)
+        cl = level_coefficients(lcons.amplitude, lcons.phase)
+
+        # one basis for the constituents of both, and one matrix product
+        level_names = tuple(lcons.names)
+        names = tuple(dict.fromkeys(current_names + level_names))
+        basis = grid_basis(start, interval, len(times), names)
+        u, v, level = np.split(
+            basis.synthesize(
+                np.hstack(
+                    [
+                        align_coefficients(cu, current_names, names),
+                        align_coefficients(cv, current_names, names),
+                        align_coefficients(cl, level_names, names),
+                    ]
+                )
+            ),
+            3,
+            axis=1,
+        )
+        return times, u, v, level
 
-        coef.name = names
-        freqs = np.array([freq_map[name] for name in names])
+    def predict_depth_averaged_at(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        times: ArrayLike,
+        batch_size: int = 100_000,
+    ) -> pl.DataFrame:
+        """Predict depth averaged currents at arbitrary times, optionally along a track.
 
-        coef.aux["frq"] = freqs
-        coef.aux["lind"] = np.array([unames.tolist().index(n) for n in names])
+        The samples are grouped by the grid cell they snap to, the
+        coefficients are read once per group and u + iv of the samples is
+        evaluated in batches with a time basis of their own times. The native
+        engine is used whatever the backend.
 
-        return coef
+        Parameters
+        ----------
+        lons : array_like
+            The longitude of each sample, or a single longitude.
+        lats : array_like
+            The latitude of each sample, or a single latitude.
+        times : array_like
+            The times, anything convertible to `np.datetime64`, in any order.
+        batch_size : int, optional
+            Number of cells read, and of samples evaluated, at a time.
+            Default 100 000.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns time, lon, lat, u and v, one row per sample in the
+            order of the input.
+        """
+        lon, lat, t = track_samples(lons, lats, times)
+        group_lons, group_lats, group = group_samples(self._constituent_repo, lon, lat)
+
+        def coefficients(
+            lons: np.ndarray, lats: np.ndarray
+        ) -> tuple[tuple[str, ...], np.ndarray]:
+            arrays = self._constituent_repo.get_current_coefficients_batch(lons, lats)
+            return tuple(arrays.names), arrays.uv.T
+
+        uv = synthesize_track(
+            coefficients, group_lons, group_lats, group, t, batch_size
+        )
+        return pl.DataFrame(
+            {"time": t, "lon": lon, "lat": lat, "u": uv.real, "v": uv.imag}
+        )
+
+    def events(
+        self,
+        lon: float,
+        lat: float,
+        start: datetime,
+        end: datetime,
+        step: timedelta = timedelta(minutes=30),
+    ) -> pl.DataFrame:
+        """Find slack water, peak currents and reversals.
+
+        The events are bracketed on a coarse time grid and refined with
+        Newton iterations on the analytic time derivatives of the u and v
+        harmonic sums, so no dense prediction is needed.
+
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        step : timedelta
+            Interval of the coarse grid, events closer together than this may
+            be missed. Default 30 minutes.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns time, type, speed and direction, see `events_many`.
+        """
+        return self.events_many([lon], [lat], start, end, step=step).drop("station")
+
+    def events_iter(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        ids: Sequence | None = None,
+        step: timedelta = timedelta(minutes=30),
+        chunk: timedelta = timedelta(days=30),
+    ) -> Iterator[pl.DataFrame]:
+        """Find slack water, peak currents and reversals chunk by chunk.
+
+        All stations are bracketed together with one matrix product per
+        chunk of the period, and only one chunk is held at a time. The native
+        engine is used whatever the backend.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        step : timedelta
+            Interval of the coarse grid, default 30 minutes.
+        chunk : timedelta
+            Period covered by each chunk, default 30 days.
+
+        Yields
+        ------
+        pl.DataFrame
+            The events of consecutive periods, see `events_many`.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        stations = pl.Series(station_ids(ids, len(lons)))
+        names, cu, cv = self._native_coefficients_batch(lons, lats)
+
+        for turning, reversed_ in zip(
+            speed_turning_points(names, cu, cv, start, end, step, chunk),
+            reversals(names, cu, cv, start, end, step, chunk),
+        ):
+            point = np.concatenate((turning.point, reversed_.point))
+            t = np.concatenate((turning.t, reversed_.t))
+            kind = np.concatenate(
+                (
+                    np.where(turning.rising, "slack", "peak"),
+                    ["reversal"] * len(reversed_),
+                )
+            )
+            synthesize = synthesize_at(t, names, point)
+            u, v = synthesize(cu), synthesize(cv)
+            order = np.lexsort((t, point))
+            yield pl.DataFrame(
+                {
+                    "station": stations.gather(point[order]),
+                    "time": from_datenum(t[order]),
+                    "type": kind[order],
+                    "speed": np.hypot(u, v)[order],
+                    "direction": np.degrees(np.arctan2(u, v))[order] % 360,
+                },
+                schema_overrides={"type": pl.String},
+            )
+
+    def events_many(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        ids: Sequence | None = None,
+        step: timedelta = timedelta(minutes=30),
+        chunk: timedelta = timedelta(days=30),
+    ) -> pl.DataFrame:
+        """Find slack water, peak currents and reversals of many stations.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        step : timedelta
+            Interval of the coarse grid, default 30 minutes.
+        chunk : timedelta
+            Period bracketed at a time, bounding the memory use. Default 30
+            days.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns station, time (to the second), type, speed and
+            direction, ordered by station and time. The type is "slack" for a
+            minimum of the speed, "peak" for a maximum and "reversal" where
+            the component along the principal axis of the current changes
+            sign. The direction is the direction the current flows to, in
+            degrees clockwise from north.
+        """
+        return pl.concat(
+            self.events_iter(lons, lats, start, end, ids=ids, step=step, chunk=chunk)
+        ).sort("station", maintain_order=True)
+
+    def slack_windows(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        threshold: float,
+        ids: Sequence | None = None,
+        step: timedelta = timedelta(minutes=30),
+        chunk: timedelta = timedelta(days=30),
+    ) -> pl.DataFrame:
+        """Find the periods where the current speed is below a threshold.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        threshold : float
+            The speed, in m/s.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        step : timedelta
+            Interval of the coarse grid, windows shorter than this may be
+            missed. Default 30 minutes.
+        chunk : timedelta
+            Period bracketed at a time, bounding the memory use. Default 30
+            days.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns station, start and end, ordered by station and start.
+            Windows are cut at the start and end of the period.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        stations = pl.Series(station_ids(ids, len(lons)))
+        names, cu, cv = self._native_coefficients_batch(lons, lats)
+
+        crossings = list(
+            threshold_crossings(names, cu, cv, threshold, start, end, step, chunk)
+        )
+        # windows are open at the ends of the period where the speed is below
+        # the threshold
+        n = len(lons)
+        bounds = datenum(np.array([start, end], dtype="datetime64[ns]"))
+        synthesize = synthesize_at(
+            np.repeat(bounds, n), names, np.tile(np.arange(n), 2)
+        )
+        below = np.hypot(synthesize(cu), synthesize(cv)) < threshold
+        opened, closed = np.flatnonzero(below[:n]), np.flatnonzero(below[n:])
+
+        point = np.concatenate([opened, *(r.point for r in crossings), closed])
+        t = np.concatenate(
+            [
+                np.full(len(opened), bounds[0]),
+                *(r.t for r in crossings),
+                np.full(len(closed), bounds[1]),
+            ]
+        )
+        rising = np.concatenate(
+            [
+                np.zeros(len(opened), dtype=bool),
+                *(r.rising for r in crossings),
+                np.ones(len(closed), dtype=bool),
+            ]
+        )
+        # the edges are in time order, the opening and closing edges of each
+        # station alternate
+        order = np.argsort(point, kind="stable")
+        point, t, rising = point[order], t[order], rising[order]
+        return pl.DataFrame(
+            {
+                "station": stations.gather(point[~rising]),
+                "start": from_datenum(t[~rising]),
+                "end": from_datenum(t[rising]),
+            }
+        )
+
+    def _native_coefficients_batch(
+        self, lons: np.ndarray, lats: np.ndarray
+    ) -> tuple[tuple[str, ...], np.ndarray, np.ndarray]:
+        coefficients = self._constituent_repo.get_current_coefficients_batch(lons, lats)
+        uv = coefficients.uv.T
+        return tuple(coefficients.names), uv.real, uv.imag
+
+    def _native_coefficients(
+        self, lon: float, lat: float
+    ) -> tuple[tuple[str, ...], np.ndarray, np.ndarray]:
+        ccons = self._constituent_repo.get_current_constituents(lon=lon, lat=lat)
+        cu, cv = current_coefficients(
+            major_axis=[v.major_axis for v in ccons.values()],
+            minor_axis=[v.minor_axis for v in ccons.values()],
+            inclination=[v.inclination for v in ccons.values()],
+            phase=[v.phase for v in ccons.values()],
+        )
+        return tuple(ccons.keys()), cu, cv
+
+    def _coef(self, lon: float, lat: float) -> Coef:
+        ccons = self._constituent_repo.get_current_constituents(lon=lon, lat=lat)
+        return Coef.current(
+            tuple(ccons.keys()),
+            major_axis=[v.major_axis for v in ccons.values()],
+            minor_axis=[v.minor_axis for v in ccons.values()],
+            inclination=[v.inclination for v in ccons.values()],
+            phase=[v.phase for v in ccons.values()],
+        )
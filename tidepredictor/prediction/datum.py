@@ -0,0 +1,152 @@
+"""
+Tidal datums from the harmonic constituents.
+
+The highest and lowest astronomical tide are the extremes of the predicted
+level over a nodal cycle of 18.61 years. Rather than predicting the whole
+cycle densely, the high and low waters are found with the event finder of
+`tidepredictor.prediction.events`, which evaluates all stations of a batch
+with one shared time basis per chunk, and reduced to running statistics
+chunk by chunk, so the memory use does not grow with the period.
+
+The predictions of this package do not apply nodal corrections, and neither
+do the datums, so that they are consistent with the predicted levels.
+"""
+
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+
+import numpy as np
+import polars as pl
+from numpy.typing import ArrayLike
+
+from tidepredictor.data import ConstituentRepository
+
+from ._frames import station_ids
+from .events import turning_points
+from .harmonics import level_coefficients
+
+NODAL_PERIOD = timedelta(days=6798.383)
+"""The period of the regression of the lunar nodes, 18.61 years."""
+
+DATUMS = ["LAT", "MLWS", "MLWN", "MLW", "MSL", "MHW", "MHWN", "MHWS", "HAT"]
+"""The datums, from lowest to highest."""
+
+
+def _datums(
+    names: list[str],
+    amplitude: np.ndarray,
+    phase: np.ndarray,
+    start: datetime,
+    end: datetime,
+    step: timedelta,
+    chunk: timedelta,
+) -> dict[str, np.ndarray]:
+    """The datums of a batch of points, each of shape (n_points,)."""
+    n = amplitude.shape[0]
+    highest = np.full(n, -np.inf)
+    lowest = np.full(n, np.inf)
+    high_sum, high_count = np.zeros(n), np.zeros(n)
+    low_sum, low_count = np.zeros(n), np.zeros(n)
+
+    coefficients = level_coefficients(amplitude, phase)
+    for roots, level in turning_points(
+        tuple(names), coefficients, start, end, step=step, chunk=chunk
+    ):
+        low = roots.rising
+        np.maximum.at(highest, roots.point[~low], level[~low])
+        np.minimum.at(lowest, roots.point[low], level[low])
+        high_sum += np.bincount(roots.point[~low], level[~low], minlength=n)
+        high_count += np.bincount(roots.point[~low], minlength=n)
+        low_sum += np.bincount(roots.point[low], level[low], minlength=n)
+        low_count += np.bincount(roots.point[low], minlength=n)
+
+    # the spring and neap datums from the amplitudes of M2 and S2
+    position = {name: i for i, name in enumerate(names)}
+    m2 = amplitude[:, position["M2"]] if "M2" in position else np.zeros(n)
+    s2 = amplitude[:, position["S2"]] if "S2" in position else np.zeros(n)
+    # the constituents have no mean (Z0), the datums are relative to MSL
+    msl = np.zeros(n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "LAT": np.where(np.isfinite(lowest), lowest, np.nan),
+            "MLWS": msl - (m2 + s2),
+            "MLWN": msl - (m2 - s2),
+            "MLW": low_sum / low_count,
+            "MSL": msl,
+            "MHW": high_sum / high_count,
+            "MHWN": msl + (m2 - s2),
+            "MHWS": msl + (m2 + s2),
+            "HAT": np.where(np.isfinite(highest), highest, np.nan),
+        }
+
+
+def tidal_datums(
+    repo: ConstituentRepository,
+    lons: ArrayLike,
+    lats: ArrayLike,
+    ids: Sequence | None = None,
+    start: datetime = datetime(2020, 1, 1),
+    period: timedelta = NODAL_PERIOD,
+    step: timedelta = timedelta(minutes=30),
+    chunk: timedelta = timedelta(days=30),
+    batch_size: int = 1000,
+) -> pl.DataFrame:
+    """
+    Compute tidal datums for many stations.
+
+    Parameters
+    ----------
+    repo : ConstituentRepository
+        The level constituents.
+    lons : array_like
+        The longitudes.
+    lats : array_like
+        The latitudes.
+    ids : Sequence, optional
+        Station ids, default is 0, 1, ..., n-1.
+    start : datetime, optional
+        The start of the period searched for the extremes, default 2020-01-01.
+    period : timedelta, optional
+        The length of the period, default the nodal cycle of 18.61 years.
+    step : timedelta, optional
+        Interval of the coarse grid the high and low waters are bracketed on,
+        default 30 minutes.
+    chunk : timedelta, optional
+        Period evaluated at a time, default 30 days.
+    batch_size : int, optional
+        Number of stations evaluated together. With `chunk`, this bounds the
+        memory use.
+
+    Returns
+    -------
+    pl.DataFrame
+        One row per station, with the column station and the datums in
+        `DATUMS`, in metres relative to mean sea level:
+
+        - LAT and HAT, the lowest and highest predicted level over the period;
+        - MLW and MHW, the means of all low and high waters;
+        - MLWS, MLWN, MHWN and MHWS, the mean low and high waters of spring
+          and neap tides from the M2 and S2 amplitudes, MSL ∓ (M2 ± S2).
+    """
+    lons = np.atleast_1d(np.asarray(lons, dtype=float))
+    lats = np.atleast_1d(np.asarray(lats, dtype=float))
+    stations = station_ids(ids, len(lons))
+    end = start + period
+
+    batches = []
+    for i in range(0, len(lons), batch_size):
+        cons = repo.get_level_constituents_batch(
+            lons[i : i + batch_size], lats[i : i + batch_size]
+        )
+        batches.append(
+            _datums(cons.names, cons.amplitude, cons.phase, start, end, step, chunk)
+        )
+    return pl.DataFrame(
+        {
+            "station": stations,
+            **{
+                datum: np.concatenate([b[datum] for b in batches] + [np.zeros(0)])
+                for datum in DATUMS
+            },
+        }
+    )
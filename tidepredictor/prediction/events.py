@@ -0,0 +1,443 @@
+"""
+Times of tidal events, found on the analytic harmonic series.
+
+Events such as high and low water are roots of a function of harmonic sums
+and their time derivatives, e.g. the rate of change of the level. Instead of
+sampling the prediction densely, the roots are bracketed by the sign changes
+of the function on a coarse time grid, evaluated for all points with one
+matrix product per chunk of the period, and then refined with safeguarded
+Newton iterations using the analytic time derivative.
+"""
+
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from .harmonics import datenum, derivative_coefficients, time_basis, time_chunks
+
+Synthesize = Callable[[np.ndarray], np.ndarray]
+"""Evaluates a harmonic sum given its basis coefficients."""
+
+RootFunction = Callable[[Synthesize], np.ndarray]
+"""A function of harmonic sums, evaluated elementwise with a `Synthesize`."""
+
+
+@dataclass(frozen=True)
+class Roots:
+    """
+    Roots of a function of harmonic sums.
+
+    Attributes
+    ----------
+    point : np.ndarray
+        Index of the point of each root.
+    t : np.ndarray
+        Time of each root in days since 0000-12-31, see `datenum`.
+    rising : np.ndarray
+        True where the function changes from negative to positive.
+    """
+
+    point: np.ndarray
+    t: np.ndarray
+    rising: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+
+def synthesize_at(
+    t: np.ndarray, names: tuple[str, ...], points: np.ndarray
+) -> Synthesize:
+    """
+    Evaluate harmonic sums of many points, each at its own time.
+
+    Parameters
+    ----------
+    t : np.ndarray
+        Time in days since 0000-12-31, shape (n,).
+    names : tuple[str, ...]
+        Constituent names.
+    points : np.ndarray
+        Index of the point evaluated at each time, shape (n,).
+
+    Returns
+    -------
+    Synthesize
+        Maps coefficients of shape (2 n_constituents, n_points) to the values
+        of shape (n,).
+    """
+    matrix = time_basis(t, names).matrix
+
+    def synthesize(coefficients: np.ndarray) -> np.ndarray:
+        return np.einsum("ek,ke->e", matrix, coefficients[:, points])
+
+    return synthesize
+
+
+def find_roots(
+    names: tuple[str, ...],
+    value: RootFunction,
+    slope: RootFunction,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(minutes=30),
+    chunk: timedelta = timedelta(days=30),
+    tolerance: float = 1e-5,
+    max_iterations: int = 20,
+) -> Iterator[Roots]:
+    """
+    Find the roots of a function of harmonic sums, chunk by chunk.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        Constituent names of the basis.
+    value : RootFunction
+        The function, for all points at once.
+    slope : RootFunction
+        Its time derivative (per day).
+    start : datetime
+        The start of the period.
+    end : datetime
+        The end of the period (inclusive).
+    step : timedelta, optional
+        Interval of the coarse grid. Roots closer together than this may be
+        missed, the default of 30 minutes resolves the double high and low
+        waters of shallow water tides.
+    chunk : timedelta, optional
+        Period evaluated at a time, bounding the memory use to that of a
+        prediction of this period on the coarse grid.
+    tolerance : float, optional
+        Size of the last Newton step in days, default about one second. The
+        last step is applied, so the error of the roots is much smaller.
+    max_iterations : int, optional
+        Maximum number of refinement iterations.
+
+    Yields
+    ------
+    Roots
+        The roots of each chunk, ordered by time within each point. The
+        chunks only depend on the period, step and chunk.
+    """
+    names = tuple(names)
+    last_end = datenum(np.datetime64(end, "ns"))
+    previous: tuple[float, np.ndarray, np.ndarray] | None = None
+    # the coarse grid extends past the end so that the last step is covered
+    for times in time_chunks(start, end + step, step, chunk):
+        t = datenum(times)
+        synthesize = time_basis(t, names).synthesize
+        g, dg = value(synthesize), slope(synthesize)
+        if previous is not None:
+            t = np.concatenate(([previous[0]], t))
+            g = np.vstack((previous[1], g))
+            dg = np.vstack((previous[2], dg))
+        previous = (t[-1], g[-1], dg[-1])
+
+        positive = g > 0
+        i, point = np.nonzero(positive[1:] != positive[:-1])
+        if len(i) == 0:
+            # every chunk is yielded, so that the roots of several functions
+            # can be merged chunk by chunk
+            yield Roots(point=point, t=np.zeros(0), rising=np.zeros(0, dtype=bool))
+            continue
+        lo, hi = t[i], t[i + 1]
+        guess = _hermite_root(
+            g[i, point], g[i + 1, point], dg[i, point], dg[i + 1, point], hi - lo
+        )
+        root = _refine(
+            names,
+            value,
+            slope,
+            point,
+            lo,
+            hi,
+            g[i, point] > 0,
+            lo + guess * (hi - lo),
+            tolerance,
+            max_iterations,
+        )
+        keep = root <= last_end
+        order = np.lexsort((root[keep], point[keep]))
+        yield Roots(
+            point=point[keep][order],
+            t=root[keep][order],
+            rising=~positive[i, point][keep][order],
+        )
+
+
+def _hermite_root(
+    g0: np.ndarray, g1: np.ndarray, dg0: np.ndarray, dg1: np.ndarray, h: np.ndarray
+) -> np.ndarray:
+    """
+    Root in [0, 1] of the cubic Hermite interpolant of a bracket.
+
+    Newton iterations on the cubic, which is cheap to evaluate, give a first
+    estimate close enough that one or two iterations on the harmonic series
+    converge.
+    """
+    m0, m1 = dg0 * h, dg1 * h
+    # p(s) = g0 + m0 s + c2 s^2 + c3 s^3
+    c2 = 3 * (g1 - g0) - 2 * m0 - m1
+    c3 = 2 * (g0 - g1) + m0 + m1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = g0 / (g0 - g1)
+        for _ in range(4):
+            p = g0 + s * (m0 + s * (c2 + s * c3))
+            dp = m0 + s * (2 * c2 + 3 * s * c3)
+            s = np.clip(s - p / dp, 0.0, 1.0)
+    return np.where(np.isfinite(s), s, 0.5)
+
+
+def _refine(
+    names: tuple[str, ...],
+    value: RootFunction,
+    slope: RootFunction,
+    point: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    positive_lo: np.ndarray,
+    t: np.ndarray,
+    tolerance: float,
+    max_iterations: int,
+) -> np.ndarray:
+    """
+    Newton iterations, falling back to bisection, kept within the brackets.
+
+    Only the roots that have not converged are evaluated again.
+    """
+    lo, hi, t = lo.copy(), hi.copy(), t.copy()
+    active = np.arange(len(t))
+    for _ in range(max_iterations):
+        synthesize = synthesize_at(t[active], names, point[active])
+        g, dg = value(synthesize), slope(synthesize)
+        same = (g > 0) == positive_lo[active]
+        lo[active] = np.where(same, t[active], lo[active])
+        hi[active] = np.where(same, hi[active], t[active])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = t[active] - g / dg
+        outside = ~((newton >= lo[active]) & (newton <= hi[active]))
+        newton[outside] = 0.5 * (lo[active][outside] + hi[active][outside])
+        converged = np.abs(newton - t[active]) < tolerance
+        t[active] = newton
+        active = active[~converged]
+        if len(active) == 0:
+            break
+    return t
+
+
+def turning_points(
+    names: tuple[str, ...],
+    coefficients: np.ndarray,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(minutes=30),
+    chunk: timedelta = timedelta(days=30),
+) -> Iterator[tuple[Roots, np.ndarray]]:
+    """
+    Maxima and minima of harmonic sums, chunk by chunk.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        Constituent names.
+    coefficients : np.ndarray
+        Shape (2 n_constituents, n_points), e.g. from `level_coefficients`.
+    start : datetime
+        The start of the period.
+    end : datetime
+        The end of the period (inclusive).
+    step : timedelta, optional
+        Interval of the coarse grid, see `find_roots`.
+    chunk : timedelta, optional
+        Period evaluated at a time.
+
+    Yields
+    ------
+    tuple[Roots, np.ndarray]
+        The times of the turning points, where `rising` (of the derivative)
+        marks the minima, and the values of the sums at these times.
+    """
+    names = tuple(names)
+    first = derivative_coefficients(coefficients, names)
+    second = derivative_coefficients(first, names)
+    for roots in find_roots(
+        names,
+        lambda synthesize: synthesize(first),
+        lambda synthesize: synthesize(second),
+        start,
+        end,
+        step,
+        chunk,
+    ):
+        yield roots, synthesize_at(roots.t, names, roots.point)(coefficients)
+
+
+def principal_axis(cu: np.ndarray, cv: np.ndarray) -> np.ndarray:
+    """
+    Direction of the principal axis of the current of each point.
+
+    The axis along which the variance of the current is largest, from the
+    variances and covariance of the harmonic sums of u and v.
+
+    Parameters
+    ----------
+    cu, cv : np.ndarray
+        Coefficients of u and v, shape (2 n_constituents, n_points), see
+        `current_coefficients`.
+
+    Returns
+    -------
+    np.ndarray
+        Radians counterclockwise from east, in (-π/2, π/2], shape (n_points,).
+    """
+    uu = np.sum(cu * cu, axis=0)
+    vv = np.sum(cv * cv, axis=0)
+    uv = np.sum(cu * cv, axis=0)
+    return 0.5 * np.arctan2(2 * uv, uu - vv)
+
+
+def speed_turning_points(
+    names: tuple[str, ...],
+    cu: np.ndarray,
+    cv: np.ndarray,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(minutes=30),
+    chunk: timedelta = timedelta(days=30),
+) -> Iterator[Roots]:
+    """
+    Minima (slack water) and maxima (peak current) of the current speed.
+
+    The roots of (u u' + v v'), half the rate of change of the squared
+    speed. `rising` marks the minima.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        Constituent names.
+    cu, cv : np.ndarray
+        Coefficients of u and v, shape (2 n_constituents, n_points).
+    start, end : datetime
+        The period.
+    step : timedelta, optional
+        Interval of the coarse grid, see `find_roots`.
+    chunk : timedelta, optional
+        Period evaluated at a time.
+
+    Yields
+    ------
+    Roots
+        The turning points of each chunk.
+    """
+    names = tuple(names)
+    du, dv = (derivative_coefficients(c, names) for c in (cu, cv))
+    ddu, ddv = (derivative_coefficients(c, names) for c in (du, dv))
+
+    def value(synthesize: Synthesize) -> np.ndarray:
+        return synthesize(cu) * synthesize(du) + synthesize(cv) * synthesize(dv)
+
+    def slope(synthesize: Synthesize) -> np.ndarray:
+        u, v = synthesize(cu), synthesize(cv)
+        return (
+            synthesize(du) ** 2
+            + u * synthesize(ddu)
+            + synthesize(dv) ** 2
+            + v * synthesize(ddv)
+        )
+
+    yield from find_roots(names, value, slope, start, end, step, chunk)
+
+
+def reversals(
+    names: tuple[str, ...],
+    cu: np.ndarray,
+    cv: np.ndarray,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(minutes=30),
+    chunk: timedelta = timedelta(days=30),
+) -> Iterator[Roots]:
+    """
+    Reversals of the current, where the component along the principal axis
+    changes sign.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        Constituent names.
+    cu, cv : np.ndarray
+        Coefficients of u and v, shape (2 n_constituents, n_points).
+    start, end : datetime
+        The period.
+    step : timedelta, optional
+        Interval of the coarse grid, see `find_roots`.
+    chunk : timedelta, optional
+        Period evaluated at a time.
+
+    Yields
+    ------
+    Roots
+        The reversals of each chunk, `rising` where the current turns to the
+        direction of the principal axis.
+    """
+    names = tuple(names)
+    theta = principal_axis(cu, cv)
+    along = np.cos(theta) * cu + np.sin(theta) * cv
+    slope = derivative_coefficients(along, names)
+    yield from find_roots(
+        names,
+        lambda synthesize: synthesize(along),
+        lambda synthesize: synthesize(slope),
+        start,
+        end,
+        step,
+        chunk,
+    )
+
+
+def threshold_crossings(
+    names: tuple[str, ...],
+    cu: np.ndarray,
+    cv: np.ndarray,
+    threshold: float,
+    start: datetime,
+    end: datetime,
+    step: timedelta = timedelta(minutes=30),
+    chunk: timedelta = timedelta(days=30),
+) -> Iterator[Roots]:
+    """
+    Times where the current speed crosses a threshold.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        Constituent names.
+    cu, cv : np.ndarray
+        Coefficients of u and v, shape (2 n_constituents, n_points).
+    threshold : float
+        The speed.
+    start, end : datetime
+        The period.
+    step : timedelta, optional
+        Interval of the coarse grid, see `find_roots`.
+    chunk : timedelta, optional
+        Period evaluated at a time.
+
+    Yields
+    ------
+    Roots
+        The crossings of each chunk, `rising` where the speed rises above the
+        threshold.
+    """
+    names = tuple(names)
+    du, dv = (derivative_coefficients(c, names) for c in (cu, cv))
+
+    def value(synthesize: Synthesize) -> np.ndarray:
+        return synthesize(cu) ** 2 + synthesize(cv) ** 2 - threshold**2
+
+    def slope(synthesize: Synthesize) -> np.ndarray:
+        return 2 * (synthesize(cu) * synthesize(du) + synthesize(cv) * synthesize(dv))
+
+    yield from find_roots(names, value, slope, start, end, step, chunk)
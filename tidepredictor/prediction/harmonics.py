@@ -0,0 +1,678 @@
+"""
+Harmonic synthesis of tidal constituents.
+
+A native replacement for `utide.reconstruct` on the prediction hot path. The
+astronomical arguments (and optionally the nodal corrections) are computed once
+for the requested times, giving a time basis matrix
+
+    B = [F cos(2π(U + V)) | F sin(2π(U + V))]    shape (n_times, 2 n_constituents)
+
+and a prediction is the matrix product of the basis with the coefficients of
+one or more points. The constituent tables (Doodson numbers, satellites and
+shallow water compositions) are those of UTide, so the results agree with
+`utide.reconstruct` to rounding.
+"""
+
+import functools
+import threading
+import warnings
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Iterator, Literal
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+
+Backend = Literal["native", "utide"]
+"""Harmonic synthesis backend, the in-package engine or `utide.reconstruct`."""
+
+
+@functools.cache
+def ut_constants() -> Any:
+    """
+    The UTide constituent tables.
+
+    utide is imported on first use, importing it takes longer than the rest of
+    the package.
+    """
+    with warnings.catch_warnings():
+        # utide issues warnings when building its tables
+        warnings.simplefilter("ignore")
+        from utide import ut_constants
+
+    return ut_constants
+
+
+@functools.cache
+def constituent_index() -> dict[str, int]:
+    """Position of each constituent in the UTide tables, built once."""
+    return {str(name): i for i, name in enumerate(ut_constants()["const"]["name"])}
+
+
+def reconstruct(t: Any, coef: dict) -> Any:
+    """`utide.reconstruct`, without the warnings it issues."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from utide import reconstruct
+
+        return reconstruct(t, coef, verbose=False)
+
+
+# days from 0000-12-31 (day 1 is 0001-01-01, as `datetime.toordinal`) to 1970-01-01
+_UNIX_EPOCH_DAYS = 719163
+_NS_PER_DAY = 86_400_000_000_000
+
+# Coefficients of the polynomials for the mean longitudes of the moon (s),
+# the sun (h), the lunar perigee (p), the negative of the lunar node (N') and
+# the perihelion (p'), from the Explanatory Supplement to the Astronomical
+# Ephemeris (1961), as used in t_tide and UTide.
+_ASTRO_COEFS = np.array(
+    [
+        [270.434164, 13.1763965268, -0.0000850, 0.000000039],
+        [279.696678, 0.9856473354, 0.00002267, 0.000000000],
+        [334.329556, 0.1114040803, -0.0007739, -0.00000026],
+        [-259.183275, 0.0529539222, -0.0001557, -0.000000050],
+        [281.220844, 0.0000470684, 0.0000339, 0.000000070],
+    ]
+)
+# 1899-12-31 12:00
+_ASTRO_EPOCH = 693595.5
+
+
+def grid_length(start: datetime, end: datetime, interval: timedelta) -> int:
+    """Number of times in the regular grid from start to end (inclusive)."""
+    span = np.datetime64(end, "ns") - np.datetime64(start, "ns")
+    return max(int(span // np.timedelta64(interval, "ns")) + 1, 0)
+
+
+def time_grid(start: datetime, end: datetime, interval: timedelta) -> np.ndarray:
+    """Regular time grid from start to end (inclusive), as datetime64[ns]."""
+    n = grid_length(start, end, interval)
+    return np.datetime64(start, "ns") + np.arange(n) * np.timedelta64(interval, "ns")
+
+
+def time_chunks(
+    start: datetime, end: datetime, interval: timedelta, chunk: timedelta
+) -> Iterator[np.ndarray]:
+    """
+    The regular time grid from start to end, in consecutive parts.
+
+    Each part covers (at most) `chunk`, and at least one interval.
+    """
+    n = grid_length(start, end, interval)
+    size = max(chunk // interval, 1)
+    first = np.datetime64(start, "ns")
+    step = np.timedelta64(interval, "ns")
+    for i in range(0, n, size):
+        yield first + np.arange(i, min(i + size, n)) * step
+
+
+def datenum(times: ArrayLike) -> np.ndarray:
+    """
+    Convert times to days since 0000-12-31, the time axis of UTide.
+
+    Parameters
+    ----------
+    times : array_like
+        Times, anything convertible to `np.datetime64`.
+
+    Returns
+    -------
+    np.ndarray
+        Time in (fractional) days.
+    """
+    ns = np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+    days, remainder = np.divmod(ns, _NS_PER_DAY)
+    return (days + _UNIX_EPOCH_DAYS) + remainder / _NS_PER_DAY
+
+
+def from_datenum(t: ArrayLike) -> np.ndarray:
+    """
+    Convert days since 0000-12-31 to times, rounded to whole seconds.
+
+    Parameters
+    ----------
+    t : array_like
+        Time in (fractional) days, see `datenum`.
+
+    Returns
+    -------
+    np.ndarray
+        The times, as datetime64[ns].
+    """
+    seconds = np.round((np.asarray(t, dtype=float) - _UNIX_EPOCH_DAYS) * 86400)
+    return (seconds.astype(np.int64) * 1_000_000_000).astype("datetime64[ns]")
+
+
+def astronomical_variables(t: np.ndarray) -> np.ndarray:
+    """
+    Astronomical variables (tau, s, h, p, N', p') in cycles.
+
+    Parameters
+    ----------
+    t : np.ndarray
+        Time in days since 0000-12-31, shape (n_times,).
+
+    Returns
+    -------
+    np.ndarray
+        Shape (6, n_times).
+    """
+    d = t - _ASTRO_EPOCH
+    D = d / 10000
+    args = np.vstack((np.ones_like(d), d, D * D, D**3))
+    astro = np.fmod(_ASTRO_COEFS @ args / 360, 1)
+    # lunar time: fractional part of solar day plus hour angle to longitude of
+    # sun minus longitude of moon
+    tau = t % 1 + astro[1] - astro[0]
+    return np.vstack((tau, astro))
+
+
+@dataclass(frozen=True)
+class _ConstituentTable:
+    """Constituent indices into the UTide tables, with shallow water expansions."""
+
+    lind: np.ndarray
+    # indices of the base (non-shallow) constituents needed
+    base: np.ndarray
+    # (n_constituents, n_base) exponents composing each constituent from the
+    # base constituents, the identity for non-shallow constituents
+    composition: np.ndarray
+
+    @staticmethod
+    @functools.cache
+    def from_names(names: tuple[str, ...]) -> "_ConstituentTable":
+        const = ut_constants()["const"]
+        shallow = ut_constants()["shallow"]
+        index = constituent_index()
+
+        try:
+            lind = np.array([index[name] for name in names], dtype=int)
+        except KeyError as e:
+            raise ValueError(f"Unknown constituent in {names}") from e
+
+        parts: list[dict[int, float]] = []
+        for k in lind:
+            if np.isnan(const["ishallow"][k]):
+                parts.append({int(k): 1.0})
+            else:
+                i0 = int(const["ishallow"][k]) - 1
+                ik = i0 + np.arange(int(const["nshallow"][k]))
+                parts.append(
+                    {
+                        int(j): float(c)
+                        for j, c in zip(shallow["iname"][ik] - 1, shallow["coef"][ik])
+                    }
+                )
+        base = np.array(sorted({j for part in parts for j in part}), dtype=int)
+        position = {j: i for i, j in enumerate(base)}
+        composition = np.zeros((len(lind), len(base)))
+        for i, part in enumerate(parts):
+            for j, c in part.items():
+                composition[i, position[j]] = c
+
+        # the tables are cached and shared
+        for array in (lind, base, composition):
+            array.flags.writeable = False
+        return _ConstituentTable(lind=lind, base=base, composition=composition)
+
+
+def astronomical_arguments(t: np.ndarray, names: tuple[str, ...]) -> np.ndarray:
+    """
+    Equilibrium (astronomical) argument V in cycles.
+
+    Parameters
+    ----------
+    t : np.ndarray
+        Time in days since 0000-12-31, shape (n_times,).
+    names : tuple[str, ...]
+        Constituent names.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (n_times, n_constituents).
+    """
+    table = _ConstituentTable.from_names(names)
+    const = ut_constants()["const"]
+    astro = astronomical_variables(t)
+    V = const["doodson"][table.base] @ astro + const["semi"][table.base][:, None]
+    np.fmod(V, 1, out=V)
+    return V.T @ table.composition.T
+
+
+def nodal_corrections(
+    t: np.ndarray, names: tuple[str, ...], lat: float
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Nodal/satellite amplitude factor F and phase correction U (cycles).
+
+    Parameters
+    ----------
+    t : np.ndarray
+        Time in days since 0000-12-31, shape (n_times,).
+    names : tuple[str, ...]
+        Constituent names.
+    lat : float
+        Latitude, used for the latitude dependent satellites.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        F and U, each of shape (n_times, n_constituents).
+    """
+    table = _ConstituentTable.from_names(names)
+    sat = ut_constants()["sat"]
+    astro = astronomical_variables(t)
+
+    if abs(lat) < 5:
+        lat = np.sign(lat) * 5
+    slat = np.sin(np.deg2rad(lat))
+    rr = sat["amprat"].copy()
+    rr[sat["ilatfac"] == 1] *= 0.36309 * (1.0 - 5.0 * slat**2) / slat
+    rr[sat["ilatfac"] == 2] *= 2.59808 * slat
+
+    uu = sat["deldood"] @ astro[3:6] + sat["phcorr"][:, None]
+    np.fmod(uu, 1, out=uu)
+    mat = rr[:, None] * np.exp(2j * np.pi * uu)
+
+    iconst = sat["iconst"].astype(int) - 1
+    # sum of satellites per base constituent
+    members = iconst[None, :] == table.base[:, None]
+    Fc = 1 + members @ mat
+    U = np.angle(Fc) / (2 * np.pi)
+    F = np.abs(Fc)
+
+    # shallow water constituents are products of their base constituents
+    F = np.exp(np.log(F.T) @ np.abs(table.composition.T))
+    U = U.T @ table.composition.T
+    return F, U
+
+
+@dataclass(frozen=True)
+class TimeBasis:
+    """
+    Harmonic basis for a set of times and constituents.
+
+    Attributes
+    ----------
+    names : tuple[str, ...]
+        Constituent names, the order of the coefficients.
+    matrix : np.ndarray
+        Shape (n_times, 2 n_constituents), the columns are
+        F cos(2π(U + V)) followed by F sin(2π(U + V)).
+    """
+
+    names: tuple[str, ...]
+    matrix: np.ndarray
+
+    def synthesize(self, coefficients: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the harmonic sum.
+
+        Parameters
+        ----------
+        coefficients : np.ndarray
+            Shape (2 n_constituents,) or (2 n_constituents, n_points), see
+            `level_coefficients` and `current_coefficients`.
+
+        Returns
+        -------
+        np.ndarray
+            Shape (n_times,) or (n_times, n_points).
+
+        Notes
+        -----
+        For a single point each time is evaluated independently of the
+        others, so the result for a time does not depend on the grid it is
+        part of (chunked and whole-period predictions are bit-identical). For
+        many points a BLAS matrix product is used.
+        """
+        if coefficients.ndim == 1:
+            return np.einsum("tk,k->t", self.matrix, coefficients)
+        return self.matrix @ coefficients
+
+    def synthesize_complex(self, coefficients: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the harmonic sum of complex coefficients.
+
+        Parameters
+        ----------
+        coefficients : np.ndarray
+            Complex, shape (2 n_constituents,) or (2 n_constituents, n_points),
+            e.g. the coefficients of u + iv of `uv_coefficients`.
+
+        Returns
+        -------
+        np.ndarray
+            Complex, shape (n_times,) or (n_times, n_points).
+
+        Notes
+        -----
+        The basis is real, the real and imaginary parts are evaluated
+        together as one real matrix product with the interleaved parts, so
+        the basis is read once and not converted to complex.
+        """
+        c = np.ascontiguousarray(coefficients, dtype=complex)
+        if c.ndim == 1:
+            parts = np.einsum("tk,kc->tc", self.matrix, c.view(float).reshape(-1, 2))
+            return parts.view(complex)[:, 0]
+        return (self.matrix @ c.view(float)).view(complex)
+
+
+def time_basis(
+    t: np.ndarray,
+    names: tuple[str, ...],
+    nodal: bool = False,
+    lat: float = 0.0,
+) -> TimeBasis:
+    """
+    Build the harmonic basis.
+
+    Parameters
+    ----------
+    t : np.ndarray
+        Time in days since 0000-12-31, see `datenum`.
+    names : tuple[str, ...]
+        Constituent names.
+    nodal : bool, optional
+        Apply nodal/satellite corrections. Default is False, matching the
+        configuration used with `utide.reconstruct` in this package.
+    lat : float, optional
+        Latitude for the nodal corrections.
+
+    Returns
+    -------
+    TimeBasis
+        The basis.
+    """
+    phase = astronomical_arguments(t, names)
+    if nodal:
+        F, U = nodal_corrections(t, names, lat)
+        phase = 2 * np.pi * (phase + U)
+        matrix = np.hstack((F * np.cos(phase), F * np.sin(phase)))
+    else:
+        phase = 2 * np.pi * phase
+        matrix = np.hstack((np.cos(phase), np.sin(phase)))
+    return TimeBasis(names=tuple(names), matrix=matrix)
+
+
+@dataclass(frozen=True)
+class CacheInfo:
+    """Statistics of a `BasisCache`."""
+
+    hits: int
+    misses: int
+    entries: int
+    nbytes: int
+    max_bytes: int
+
+
+class BasisCache:
+    """
+    Bounded LRU cache of time bases for regular time grids.
+
+    Entries are keyed by the start, interval and length of the time grid and
+    the constituents, and evicted least recently used first when the total
+    size of the cached matrices exceeds `max_bytes`. The cache is thread-safe
+    and the cached matrices are read-only.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum total size of the cached bases, default 256 MB. A basis larger
+        than this is computed but not cached.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, TimeBasis] = OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> TimeBasis | None:
+        with self._lock:
+            basis = self._entries.get(key)
+            if basis is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+            return basis
+
+    def put(self, key: tuple, basis: TimeBasis) -> None:
+        nbytes = basis.matrix.nbytes
+        if nbytes > self.max_bytes:
+            return
+        basis.matrix.flags.writeable = False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.matrix.nbytes
+            self._entries[key] = basis
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.matrix.nbytes
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def info(self) -> CacheInfo:
+        """Cache statistics."""
+        with self._lock:
+            return CacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                entries=len(self._entries),
+                nbytes=self._nbytes,
+                max_bytes=self.max_bytes,
+            )
+
+
+basis_cache = BasisCache()
+"""Process wide cache used by the predictors."""
+
+
+def grid_basis(
+    start: datetime,
+    interval: timedelta,
+    n: int,
+    names: tuple[str, ...],
+    nodal: bool = False,
+    lat: float = 0.0,
+    cache: BasisCache | None = basis_cache,
+) -> TimeBasis:
+    """
+    Time basis for the regular grid of `n` times from `start`, with caching.
+
+    Parameters
+    ----------
+    start : datetime
+        The first time.
+    interval : timedelta
+        The interval between times.
+    n : int
+        The number of times.
+    names : tuple[str, ...]
+        Constituent names.
+    nodal : bool, optional
+        Apply nodal/satellite corrections, see `time_basis`.
+    lat : float, optional
+        Latitude for the nodal corrections.
+    cache : BasisCache, optional
+        The cache to use, default is the process wide `basis_cache`. None
+        disables caching.
+
+    Returns
+    -------
+    TimeBasis
+        The basis, read-only if cached.
+    """
+    first = np.datetime64(start, "ns")
+    step = np.timedelta64(interval, "ns")
+    key = (first, step, n, tuple(names), nodal, lat if nodal else None)
+    if cache is not None:
+        basis = cache.get(key)
+        if basis is not None:
+            return basis
+
+    t = datenum(first + np.arange(n) * step)
+    basis = time_basis(t, tuple(names), nodal=nodal, lat=lat)
+    if cache is not None:
+        cache.put(key, basis)
+    return basis
+
+
+def angular_frequencies(names: tuple[str, ...]) -> np.ndarray:
+    """
+    Angular frequencies of constituents in radians per day.
+
+    Parameters
+    ----------
+    names : tuple[str, ...]
+        Constituent names.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (n_constituents,).
+    """
+    table = _ConstituentTable.from_names(tuple(names))
+    return 2 * np.pi * 24 * ut_constants()["const"]["freq"][table.lind]
+
+
+def derivative_coefficients(
+    coefficients: np.ndarray, names: tuple[str, ...], order: int = 1
+) -> np.ndarray:
+    """
+    Basis coefficients for a time derivative of a harmonic sum.
+
+    The derivative of a cos(ωt) + b sin(ωt) is ωb cos(ωt) - ωa sin(ωt), so
+    the derivatives are evaluated with the same basis as the sum itself.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        Shape (2 n_constituents,) or (2 n_constituents, n_points).
+    names : tuple[str, ...]
+        The constituents of the coefficients.
+    order : int, optional
+        Order of the derivative, default 1.
+
+    Returns
+    -------
+    np.ndarray
+        Coefficients of the derivative in units per day**order, same shape
+        as `coefficients`.
+    """
+    n = len(names)
+    omega = angular_frequencies(names).reshape((n,) + (1,) * (coefficients.ndim - 1))
+    derivative = coefficients
+    for _ in range(order):
+        a, b = derivative[:n], derivative[n:]
+        derivative = np.concatenate((omega * b, -omega * a))
+    return derivative
+
+
+def level_coefficients(amplitude: ArrayLike, phase: ArrayLike) -> np.ndarray:
+    """
+    Basis coefficients for the surface elevation.
+
+    Parameters
+    ----------
+    amplitude : array_like
+        Amplitudes, shape (n_constituents,) or (n_points, n_constituents).
+    phase : array_like
+        Greenwich phase lags in degrees, same shape as `amplitude`.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (2 n_constituents,) or (2 n_constituents, n_points).
+    """
+    A = np.asarray(amplitude, dtype=float)
+    g = np.deg2rad(np.asarray(phase, dtype=float))
+    return np.concatenate((A * np.cos(g), A * np.sin(g)), axis=-1).T
+
+
+def current_coefficients(
+    major_axis: ArrayLike,
+    minor_axis: ArrayLike,
+    inclination: ArrayLike,
+    phase: ArrayLike,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Basis coefficients for the u and v components of the current.
+
+    Parameters
+    ----------
+    major_axis : array_like
+        Semi major axes, shape (n_constituents,) or (n_points, n_constituents).
+    minor_axis : array_like
+        Semi minor axes (negative for clockwise rotation).
+    inclination : array_like
+        Inclination of the major axis, degrees counterclockwise from east.
+    phase : array_like
+        Greenwich phase lags in degrees.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Coefficients for u and v, each of shape (2 n_constituents,) or
+        (2 n_constituents, n_points).
+    """
+    major = np.asarray(major_axis, dtype=float)
+    minor = np.asarray(minor_axis, dtype=float)
+    theta = np.deg2rad(np.asarray(inclination, dtype=float))
+    g = np.deg2rad(np.asarray(phase, dtype=float))
+
+    # counterclockwise and clockwise rotating components, as in utide
+    ap = 0.5 * (major + minor) * np.exp(1j * (theta - g))
+    am = 0.5 * (major - minor) * np.exp(1j * (theta + g))
+
+    cu = np.concatenate((ap.real + am.real, am.imag - ap.imag), axis=-1).T
+    cv = np.concatenate((ap.imag + am.imag, ap.real - am.real), axis=-1).T
+    return cu, cv
+
+
+def align_coefficients(
+    coefficients: np.ndarray, names: tuple[str, ...], to: tuple[str, ...]
+) -> np.ndarray:
+    """
+    Coefficients for a basis with other (more) constituents.
+
+    Lets predictions with different constituent sets, e.g. levels and
+    currents, share one time basis.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        Shape (2 n_constituents,) or (2 n_constituents, n_points), in the
+        order of `names`.
+    names : tuple[str, ...]
+        The constituents of the coefficients.
+    to : tuple[str, ...]
+        The constituents of the basis, a superset of `names`.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (2 len(to),) or (2 len(to), n_points), zero for the
+        constituents not in `names`.
+    """
+    position = {name: i for i, name in enumerate(to)}
+    rows = np.array([position[name] for name in names], dtype=int)
+    aligned = np.zeros((2 * len(to), *coefficients.shape[1:]))
+    aligned[rows] = coefficients[: len(names)]
+    aligned[rows + len(to)] = coefficients[len(names) :]
+    return aligned
@@ -1,20 +1,28 @@
+from collections.abc import Iterator, Sequence
+
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 
-from dataclasses import asdict
+from numpy.typing import ArrayLike
 from tidepredictor.data import ConstituentRepository
 
 import polars as pl
 
+from ._frames import station_ids, stations_frame
 from .coef import Coef
-
-import warnings
-
-# Suppress warnings issued by utide
-warnings.filterwarnings("ignore", category=RuntimeWarning)
-warnings.filterwarnings("ignore", category=DeprecationWarning)
-from utide import reconstruct, ut_constants  # noqa: E402
+from .events import turning_points
+from .harmonics import (
+    Backend,
+    datenum,
+    from_datenum,
+    grid_basis,
+    level_coefficients,
+    reconstruct,
+    time_basis,
+    time_chunks,
+    time_grid,
+)
+from .track import group_samples, synthesize_track, track_samples
 
 
 class LevelPredictor:
@@ -24,10 +32,17 @@ class LevelPredictor:
     ----------
     constituent_repo : ConstituentRepository
         Repository
+    backend : {"native", "utide"}, optional
+        Harmonic synthesis backend. "native" (default) uses the vectorized
+        engine in `tidepredictor.prediction.harmonics`, "utide" uses
+        `utide.reconstruct` and is kept as a reference.
     """
 
-    def __init__(self, constituent_repo: ConstituentRepository) -> None:
+    def __init__(
+        self, constituent_repo: ConstituentRepository, backend: Backend = "native"
+    ) -> None:
         self._constituent_repo = constituent_repo
+        self._backend = backend
 
     def predict(
         self,
@@ -59,8 +74,15 @@ class LevelPredictor:
 
         Notes
         -----
-        The workhorse of this functions the `reconstruct` function from [`UTide`](https://github.com/wesleybowman/UTide)
+        With the "utide" backend the workhorse of this functions the `reconstruct` function from [`UTide`](https://github.com/wesleybowman/UTide)
         """
+        if self._backend == "native":
+            times = time_grid(start, end, interval)
+            names, coefficients = self._native_coefficients(lon=lon, lat=lat)
+            basis = grid_basis(start, interval, len(times), names)
+            return pl.DataFrame(
+                {"time": times, "level": basis.synthesize(coefficients)}
+            )
 
         df = pl.DataFrame().with_columns(
             # TODO use ms instead of ns
@@ -68,36 +90,293 @@ class LevelPredictor:
                 "time"
             ),
         )
+        import pandas as pd
+
         # TODO do we need this?
         t = pd.date_range(start=start, end=end, freq=interval)
         coef = self._coef(
             lon=lon,
             lat=lat,
         )
-        tide = reconstruct(t, asdict(coef), verbose=False)
+        tide = reconstruct(t, coef.as_dict())
         df = df.with_columns(
             pl.Series("level", tide["h"]).alias("level"),
         )
 
         return df
 
-    def _coef(self, lon: float, lat: float) -> Coef:
-        coef = Coef.template()
+    def predict_iter(
+        self,
+        lon: float,
+        lat: float,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(hours=1),
+        chunk: timedelta = timedelta(days=30),
+    ) -> Iterator[pl.DataFrame]:
+        """Predict tide levels chunk by chunk.
 
-        cons = self._constituent_repo.get_level_constituents(lon=lon, lat=lat)
-        coef.A = np.array([v.amplitude for v in cons.values()])
-        coef.g = np.array([v.phase for v in cons.values()])
-        names = list(cons.keys())
+        Long, high resolution series can be produced with bounded memory, only
+        one chunk is computed and held at a time.
+
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        interval : timedelta
+            The interval between predictions.
+        chunk : timedelta
+            The period covered by each chunk, default 30 days.
+
+        Yields
+        ------
+        pl.DataFrame
+            Consecutive parts of the frame returned by `predict`. With the
+            native backend the concatenated chunks are identical to `predict`.
+        """
+        if self._backend == "native":
+            names, coefficients = self._native_coefficients(lon=lon, lat=lat)
+
+        for times in time_chunks(start, end, interval, chunk):
+            if self._backend == "native":
+                basis = time_basis(datenum(times), names)
+                yield pl.DataFrame(
+                    {"time": times, "level": basis.synthesize(coefficients)}
+                )
+            else:
+                yield self.predict(
+                    lon=lon,
+                    lat=lat,
+                    start=times[0].astype("datetime64[us]").item(),
+                    end=times[-1].astype("datetime64[us]").item(),
+                    interval=interval,
+                )
+
+    def predict_many(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        interval: timedelta = timedelta(hours=1),
+        ids: Sequence | None = None,
+        wide: bool = False,
+    ) -> pl.DataFrame:
+        """Predict tide levels for many stations over the same period.
+
+        The time basis is computed once and all stations are evaluated with
+        a single matrix product.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        interval : timedelta
+            The interval between predictions.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        wide : bool, optional
+            Return one level column per station (named by the station id)
+            instead of the long format with columns station, time and level.
+            Default is False.
+
+        Returns
+        -------
+        pl.DataFrame
+            The predicted tide levels.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        stations = station_ids(ids, len(lons))
+        times = time_grid(start, end, interval)
+
+        if self._backend == "native":
+            cons = self._constituent_repo.get_level_constituents_batch(lons, lats)
+            basis = grid_basis(start, interval, len(times), tuple(cons.names))
+            level = basis.synthesize(level_coefficients(cons.amplitude, cons.phase))
+        else:
+            level = np.column_stack(
+                [
+                    self.predict(lon, lat, start, end, interval)["level"].to_numpy()
+                    for lon, lat in zip(lons, lats)
+                ]
+            )
+
+        return stations_frame(times, stations, {"level": level}, wide=wide)
+
+    def predict_at(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        times: ArrayLike,
+        batch_size: int = 100_000,
+    ) -> pl.DataFrame:
+        """Predict tide levels at arbitrary times, optionally along a track.
+
+        The samples are grouped by the grid cell they snap to, the
+        constituents are read once per group and the samples are evaluated in
+        batches with a time basis of their own times. The native engine is
+        used whatever the backend.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitude of each sample, or a single longitude.
+        lats : array_like
+            The latitude of each sample, or a single latitude.
+        times : array_like
+            The times, anything convertible to `np.datetime64`, in any order.
+        batch_size : int, optional
+            Number of cells read, and of samples evaluated, at a time.
+            Default 100 000.
 
-        unames = ut_constants["const"]["name"]
-        ufreqs = ut_constants["const"]["freq"]
+        Returns
+        -------
+        pl.DataFrame
+            The columns time, lon, lat and level, one row per sample in the
+            order of the input.
+        """
+        lon, lat, t = track_samples(lons, lats, times)
+        group_lons, group_lats, group = group_samples(self._constituent_repo, lon, lat)
 
-        freq_map = {n: float(f) for n, f in zip(unames, ufreqs)}
+        def coefficients(
+            lons: np.ndarray, lats: np.ndarray
+        ) -> tuple[tuple[str, ...], np.ndarray]:
+            cons = self._constituent_repo.get_level_constituents_batch(lons, lats)
+            return tuple(cons.names), level_coefficients(cons.amplitude, cons.phase)
 
-        coef.name = names
-        freqs = np.array([freq_map[name] for name in names])
+        level = synthesize_track(
+            coefficients, group_lons, group_lats, group, t, batch_size
+        )
+        return pl.DataFrame({"time": t, "lon": lon, "lat": lat, "level": level})
 
-        coef.aux["frq"] = freqs
-        coef.aux["lind"] = np.array([unames.tolist().index(n) for n in names])
+    def extrema(
+        self,
+        lon: float,
+        lat: float,
+        start: datetime,
+        end: datetime,
+        step: timedelta = timedelta(minutes=30),
+    ) -> pl.DataFrame:
+        """Find the times and heights of high and low water.
+
+        The turning points of the level are bracketed on a coarse time grid
+        and refined with Newton iterations on the analytic time derivative of
+        the harmonic sum, so no dense prediction is needed.
 
-        return coef
+        Parameters
+        ----------
+        lon : float
+            The longitude.
+        lat : float
+            The latitude.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        step : timedelta
+            Interval of the coarse grid, turning points closer together than
+            this may be missed. Default 30 minutes.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns time (to the second), level and type ("high" or
+            "low"), ordered by time.
+        """
+        return self.extrema_many([lon], [lat], start, end, step=step).drop("station")
+
+    def extrema_many(
+        self,
+        lons: ArrayLike,
+        lats: ArrayLike,
+        start: datetime,
+        end: datetime,
+        ids: Sequence | None = None,
+        step: timedelta = timedelta(minutes=30),
+        chunk: timedelta = timedelta(days=30),
+    ) -> pl.DataFrame:
+        """Find the times and heights of high and low water of many stations.
+
+        All stations are bracketed together with one matrix product per
+        chunk of the period, see `extrema`. The native engine is used
+        whatever the backend.
+
+        Parameters
+        ----------
+        lons : array_like
+            The longitudes.
+        lats : array_like
+            The latitudes.
+        start : datetime
+            The start date.
+        end : datetime
+            The end date.
+        ids : Sequence, optional
+            Station ids, default is 0, 1, ..., n-1.
+        step : timedelta
+            Interval of the coarse grid, default 30 minutes.
+        chunk : timedelta
+            Period bracketed at a time, bounding the memory use. Default 30
+            days.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns station, time, level and type ("high" or "low"),
+            ordered by station and time.
+        """
+        lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        stations = station_ids(ids, len(lons))
+        cons = self._constituent_repo.get_level_constituents_batch(lons, lats)
+        coefficients = level_coefficients(cons.amplitude, cons.phase)
+
+        found = list(
+            turning_points(
+                tuple(cons.names), coefficients, start, end, step=step, chunk=chunk
+            )
+        )
+        point = np.concatenate([r.point for r, _ in found] + [np.zeros(0, int)])
+        t = np.concatenate([r.t for r, _ in found] + [np.zeros(0)])
+        level = np.concatenate([v for _, v in found] + [np.zeros(0)])
+        low = np.concatenate([r.rising for r, _ in found] + [np.zeros(0, bool)])
+        # the chunks are in time order, a stable sort keeps it within stations
+        order = np.argsort(point, kind="stable")
+        return pl.DataFrame(
+            {
+                "station": pl.Series(stations).gather(point[order]),
+                "time": from_datenum(t[order]),
+                "level": level[order],
+                "type": np.where(low[order], "low", "high"),
+            }
+        )
+
+    def _native_coefficients(
+        self, lon: float, lat: float
+    ) -> tuple[tuple[str, ...], np.ndarray]:
+        cons = self._constituent_repo.get_level_constituents(lon=lon, lat=lat)
+        coefficients = level_coefficients(
+            [v.amplitude for v in cons.values()], [v.phase for v in cons.values()]
+        )
+        return tuple(cons.keys()), coefficients
+
+    def _coef(self, lon: float, lat: float) -> Coef:
+        cons = self._constituent_repo.get_level_constituents(lon=lon, lat=lat)
+        return Coef.level(
+            tuple(cons.keys()),
+            amplitude=[v.amplitude for v in cons.values()],
+            phase=[v.phase for v in cons.values()],
+        )
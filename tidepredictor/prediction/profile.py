@@ -0,0 +1,223 @@
+"""
+Vertical current profiles.
+
+The depth averaged current is distributed over the water column with the
+power law
+
+    u(z) = (1 + α) ((z + h) / h)^α ū
+
+where h is the water depth and z the level, from -h at the bed to 0 at the
+surface. The profiles of many points, levels and times are evaluated by
+broadcasting into preallocated (time, level, point) arrays.
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+from numpy.typing import ArrayLike
+
+if TYPE_CHECKING:
+    import xarray as xr
+
+
+def profile_depths(
+    water_depth: np.ndarray, depths: ArrayLike | None = None, n_levels: int = 10
+) -> np.ndarray:
+    """
+    The levels of the profiles of each point.
+
+    Parameters
+    ----------
+    water_depth : np.ndarray
+        The water depths (positive), shape (n_points,).
+    depths : array_like, optional
+        The levels (negative below the surface), shape (n_levels,) for the
+        same levels at all points or (n_points, n_levels). Default is
+        `n_levels` levels evenly spaced from the bed to the surface.
+    n_levels : int, optional
+        Number of default levels.
+
+    Returns
+    -------
+    np.ndarray
+        Shape (n_levels, n_points).
+    """
+    if depths is None:
+        return np.linspace(-water_depth, 0.0, num=n_levels)
+    depths = np.asarray(depths, dtype=float)
+    if depths.ndim == 1:
+        return np.repeat(depths[:, None], len(water_depth), axis=1)
+    if depths.ndim != 2 or depths.shape[0] != len(water_depth):
+        raise ValueError(
+            f"Expected depths of shape (n_levels,) or ({len(water_depth)}, n_levels), "
+            f"got {depths.shape}"
+        )
+    return depths.T.copy()
+
+
+def power_law_profile(
+    uavg: np.ndarray,
+    vavg: np.ndarray,
+    depths: np.ndarray,
+    water_depth: np.ndarray,
+    alpha: np.ndarray | float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Distribute depth averaged currents over the water column.
+
+    Parameters
+    ----------
+    uavg, vavg : np.ndarray
+        Depth averaged currents, shape (n_times, n_points).
+    depths : np.ndarray
+        Levels, negative below the surface, shape (n_levels, n_points).
+    water_depth : np.ndarray
+        Water depths, shape (n_points,), or (n_times, n_points) for a water
+        depth following the tide.
+    alpha : np.ndarray | float
+        Power law exponent, a scalar or shape (n_points,).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        u and v, each of shape (n_times, n_levels, n_points). Levels below
+        the bed or above the surface are NaN.
+    """
+    n_times, n_points = uavg.shape
+    alpha = np.broadcast_to(np.asarray(alpha, dtype=float), (n_points,))
+    h = np.asarray(water_depth, dtype=float)
+    # the power law factor, shape (n_levels, n_points) for a static water
+    # depth, otherwise computed in place in the output array
+    h = h[None, :] if h.ndim == 1 else h[:, None, :]
+    factor = np.empty((h.shape[0], *depths.shape))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # dry points (h = 0) are NaN
+        np.add(depths, h, out=factor)
+        np.divide(factor, h, out=factor)
+    factor[(factor < 0) | (factor > 1)] = np.nan
+    np.power(factor, alpha, out=factor)
+    np.multiply(factor, 1.0 + alpha, out=factor)
+
+    if water_depth.ndim == 1:
+        shape = (n_times, depths.shape[0], n_points)
+        u = np.multiply(uavg[:, None, :], factor[0], out=np.empty(shape))
+        v = np.multiply(vavg[:, None, :], factor[0], out=np.empty(shape))
+        return u, v
+    v = np.multiply(vavg[:, None, :], factor)
+    u = np.multiply(uavg[:, None, :], factor, out=factor)
+    return u, v
+
+
+@dataclass
+class CurrentProfile:
+    """
+    Current profiles of many points on a common time grid.
+
+    Attributes
+    ----------
+    time : np.ndarray
+        The times, shape (n_times,).
+    ids : list
+        The station ids, n_points.
+    depth : np.ndarray
+        The levels of each point, negative below the surface, shape
+        (n_levels, n_points).
+    water_depth : np.ndarray
+        The total water depth, shape (n_points,), or (n_times, n_points) when
+        it follows the tide.
+    uavg, vavg : np.ndarray
+        Depth averaged currents, shape (n_times, n_points).
+    u, v : np.ndarray
+        Currents at the levels, shape (n_times, n_levels, n_points).
+    level : np.ndarray, optional
+        The surface elevation, shape (n_times, n_points), when the water depth
+        follows the tide.
+    """
+
+    time: np.ndarray
+    ids: list
+    depth: np.ndarray
+    water_depth: np.ndarray
+    uavg: np.ndarray
+    vavg: np.ndarray
+    u: np.ndarray
+    v: np.ndarray
+    level: np.ndarray | None = None
+
+    def to_frame(self) -> pl.DataFrame:
+        """
+        Long format, ordered by station, time and level.
+
+        Returns
+        -------
+        pl.DataFrame
+            The columns station, time, depth, uavg, u, vavg, v,
+            total_water_depth and, when the water depth follows the tide,
+            level.
+        """
+        n_times, n_levels, n_points = self.u.shape
+        shape = (n_points, n_times, n_levels)
+
+        def per_point(x: np.ndarray) -> np.ndarray:
+            return np.broadcast_to(x.T[:, None, None], shape).ravel()
+
+        def per_time(x: np.ndarray) -> np.ndarray:
+            return np.broadcast_to(x.T[:, :, None], shape).ravel()
+
+        def per_level(x: np.ndarray) -> np.ndarray:
+            return np.broadcast_to(x.T[:, None, :], shape).ravel()
+
+        columns = {
+            "station": pl.Series(self.ids).gather(
+                np.repeat(np.arange(n_points), n_times * n_levels)
+            ),
+            "time": np.tile(np.repeat(self.time, n_levels), n_points),
+            "depth": per_level(self.depth),
+            "uavg": per_time(self.uavg),
+            "u": self.u.transpose(2, 0, 1).ravel(),
+            "vavg": per_time(self.vavg),
+            "v": self.v.transpose(2, 0, 1).ravel(),
+            "total_water_depth": per_point(self.water_depth)
+            if self.water_depth.ndim == 1
+            else per_time(self.water_depth),
+        }
+        if self.level is not None:
+            columns["level"] = per_time(self.level)
+        return pl.DataFrame(columns)
+
+    def to_xarray(self) -> "xr.Dataset":
+        """
+        Dense arrays with the dimensions time, level and point.
+
+        Returns
+        -------
+        xr.Dataset
+            u and v of shape (time, level, point), uavg, vavg (and level) of
+            shape (time, point), total_water_depth of shape (point) or
+            (time, point) and the coordinates station (point) and depth
+            (level, point).
+        """
+        import xarray as xr
+
+        variables = {
+            "u": (("time", "level", "point"), self.u),
+            "v": (("time", "level", "point"), self.v),
+            "uavg": (("time", "point"), self.uavg),
+            "vavg": (("time", "point"), self.vavg),
+            "total_water_depth": (
+                ("point",) if self.water_depth.ndim == 1 else ("time", "point"),
+                self.water_depth,
+            ),
+        }
+        if self.level is not None:
+            variables["level"] = (("time", "point"), self.level)
+        return xr.Dataset(
+            variables,
+            coords={
+                "time": self.time,
+                "station": ("point", list(self.ids)),
+                "depth": (("level", "point"), self.depth),
+            },
+        )
@@ -0,0 +1,124 @@
+"""
+Predictions at arbitrary times, optionally along a track.
+
+Samples (lon_i, lat_i, t_i) are grouped by the grid cell their position snaps
+to, so the constituents are read and converted once per group rather than
+once per sample. The samples are then evaluated in batches, sorted by group,
+with a time basis of their own times, each row against the coefficients of
+its group (see `synthesize_at`). The memory use is bounded by the batch size,
+whatever the length of the track.
+"""
+
+from collections.abc import Callable
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from tidepredictor.data import ConstituentRepository
+
+from .events import synthesize_at
+from .harmonics import datenum
+
+Coefficients = Callable[[np.ndarray, np.ndarray], tuple[tuple[str, ...], np.ndarray]]
+"""Reads the names and coefficients, shape (2 n_constituents, n), of n points."""
+
+
+def track_samples(
+    lons: ArrayLike, lats: ArrayLike, times: ArrayLike
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The longitude, latitude and time of each sample.
+
+    A single position is used for all times.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        Longitudes and latitudes (float) and times (datetime64[ns]), each of
+        shape (n_samples,).
+    """
+    t = np.atleast_1d(np.asarray(times, dtype="datetime64[ns]"))
+    lon = np.asarray(lons, dtype=float)
+    lat = np.asarray(lats, dtype=float)
+    if t.ndim != 1 or lon.ndim > 1 or lat.ndim > 1:
+        raise ValueError("lons, lats and times must be scalars or 1-D arrays")
+    try:
+        lon, lat, t = np.broadcast_arrays(lon, lat, t)
+    except ValueError as e:
+        raise ValueError(
+            f"Expected {len(t)} positions, got {lon.size} lons and {lat.size} lats"
+        ) from e
+    return lon, lat, t
+
+
+def group_samples(
+    repo: ConstituentRepository, lons: np.ndarray, lats: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group samples with the same constituents.
+
+    With a nearest (or nearest wet) cell lookup, the samples are grouped by
+    the cell they snap to, otherwise (bilinear interpolation, repositories
+    that can not locate cells) by their position.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        The longitude and latitude read for each group and the group of each
+        sample.
+    """
+    locate = getattr(repo, "locate", None)
+    if locate is not None and getattr(repo, "lookup", None) != "bilinear":
+        cells = locate(lons, lats)
+        keys = np.stack([cells.ilon, cells.ilat])
+    else:
+        keys = np.stack([lons, lats])
+    _, first, group = np.unique(keys, axis=1, return_index=True, return_inverse=True)
+    return lons[first], lats[first], group.ravel()
+
+
+def synthesize_track(
+    coefficients: Coefficients,
+    lons: np.ndarray,
+    lats: np.ndarray,
+    group: np.ndarray,
+    times: np.ndarray,
+    batch_size: int = 100_000,
+) -> np.ndarray:
+    """
+    Evaluate the harmonic sums of the samples.
+
+    Parameters
+    ----------
+    coefficients : Coefficients
+        Reads the coefficients of the groups, real or complex.
+    lons, lats : np.ndarray
+        The position read for each group, shape (n_groups,).
+    group : np.ndarray
+        The group of each sample, shape (n_samples,).
+    times : np.ndarray
+        The time of each sample, datetime64, shape (n_samples,).
+    batch_size : int, optional
+        Number of groups read, and of samples evaluated, at a time.
+
+    Returns
+    -------
+    np.ndarray
+        The values in the order of the samples, shape (n_samples,).
+    """
+    order = np.argsort(group, kind="stable")
+    sorted_group = group[order]
+    out: np.ndarray | None = None
+    for g0 in range(0, len(lons), batch_size):
+        g1 = min(g0 + batch_size, len(lons))
+        names, c = coefficients(lons[g0:g1], lats[g0:g1])
+        if out is None:
+            out = np.empty(len(group), dtype=np.result_type(c, float))
+        s0, s1 = np.searchsorted(sorted_group, [g0, g1])
+        for i in range(s0, s1, batch_size):
+            samples = order[i : min(i + batch_size, s1)]
+            synthesize = synthesize_at(
+                datenum(times[samples]), names, group[samples] - g0
+            )
+            out[samples] = synthesize(c)
+    return np.zeros(0) if out is None else out
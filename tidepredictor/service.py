@@ -0,0 +1,431 @@
+"""
+HTTP prediction service.
+
+A small asyncio HTTP/1.1 server (standard library only) for running the
+predictors behind a local web service.
+
+Endpoints
+---------
+GET /predict?lon=..&lat=..[&start=..&end=..&interval=..&type=..&lookup=..]
+    A single point, rows of time and level (or u and v) as JSON.
+POST /predict
+    A JSON object with a list of stations ({"lon", "lat", "id"}) and
+    optionally start, end, interval (minutes), type and lookup. Long format
+    rows of station, time and level (or u and v) as JSON.
+GET /metrics
+    Request counts and latencies, coalescing and cache statistics.
+
+Concurrent single point requests for the same period, type and lookup are
+coalesced: they are collected for a short window and predicted together with
+one matrix product. The predictions run in a pool of worker threads, each
+with its own open repositories; the harmonic synthesis releases the GIL.
+With a `ResultCache`, predictions are also stored on disk and served from
+there by later requests, across restarts and other processes.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from http import HTTPStatus
+
+import numpy as np
+import polars as pl
+
+from tidepredictor import PredictionType, get_default_constituent_path
+from tidepredictor.batch import _open_repository, _predict_part
+from tidepredictor.cache import ResultCache, result_key
+from tidepredictor.data import _LOOKUPS, ConstituentRepository, Lookup
+from tidepredictor.prediction.harmonics import basis_cache
+
+
+@dataclass(frozen=True)
+class _Window:
+    """What a group of stations must share to be predicted together."""
+
+    type: PredictionType
+    lookup: Lookup
+    start: datetime
+    end: datetime
+    interval: timedelta
+
+
+class _Latency:
+    """Counts and recent latencies of an endpoint."""
+
+    def __init__(self, size: int = 1000) -> None:
+        self.requests = 0
+        self.errors = 0
+        self._seconds: deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float, error: bool) -> None:
+        self.requests += 1
+        self.errors += error
+        self._seconds.append(seconds)
+
+    def summary(self) -> dict:
+        ms = np.array(self._seconds) * 1000
+        stats = (
+            {
+                "mean_ms": float(ms.mean()),
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "max_ms": float(ms.max()),
+            }
+            if len(ms)
+            else {}
+        )
+        return {"requests": self.requests, "errors": self.errors, **stats}
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class PredictionService:
+    """
+    Predictions over HTTP, with request coalescing.
+
+    Parameters
+    ----------
+    workers : int, optional
+        Number of worker threads, default 4.
+    window : float, optional
+        Seconds single point requests are collected before they are predicted
+        together, default 0.005.
+    max_batch : int, optional
+        Maximum number of points predicted together, a full batch is
+        predicted without waiting for the window to end.
+    cache_size : int, optional
+        Number of single point predictions kept, least recently used first
+        out. Default 1024, 0 disables the cache.
+    disk_cache : ResultCache, optional
+        Predictions stored on disk, shared with other processes. Default
+        None, no disk cache.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        window: float = 0.005,
+        max_batch: int = 1000,
+        cache_size: int = 1024,
+        disk_cache: ResultCache | None = None,
+    ) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.disk_cache = disk_cache
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="tidepredictor"
+        )
+        self._local = threading.local()
+        self._pending: dict[
+            _Window, list[tuple[float, float, asyncio.Future[pl.DataFrame]]]
+        ] = {}
+        self._timers: dict[_Window, asyncio.TimerHandle] = {}
+        self._cache: OrderedDict[tuple, pl.DataFrame] = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._batches = 0
+        self._coalesced = 0
+        self._largest_batch = 0
+        self._latency: dict[str, _Latency] = {}
+
+    def _repository(self, window: _Window) -> ConstituentRepository:
+        # open files are not shared between threads
+        repos = self._local.__dict__.setdefault("repos", {})
+        key = (window.type, window.lookup)
+        if key not in repos:
+            repos[key] = _open_repository(
+                get_default_constituent_path(window.type), window.lookup
+            )
+        return repos[key]
+
+    def _compute(
+        self, window: _Window, lons: np.ndarray, lats: np.ndarray, ids: list
+    ) -> pl.DataFrame:
+        def predict() -> pl.DataFrame:
+            return _predict_part(
+                self._repository(window),
+                window.type,
+                lons,
+                lats,
+                ids,
+                window.start,
+                window.end,
+                window.interval,
+                False,
+            )
+
+        if self.disk_cache is None:
+            return predict()
+        key = result_key(
+            get_default_constituent_path(window.type),
+            **asdict(window),
+            lons=lons,
+            lats=lats,
+            ids=ids,
+        )
+        return self.disk_cache.get_or_predict(key, predict)
+
+    async def predict_stations(
+        self, window: _Window, lons: np.ndarray, lats: np.ndarray, ids: list
+    ) -> pl.DataFrame:
+        """Predict many stations in a worker, long format."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._compute, window, lons, lats, ids
+        )
+
+    async def predict_point(
+        self, window: _Window, lon: float, lat: float
+    ) -> pl.DataFrame:
+        """Predict a single point, together with concurrent requests."""
+        key = (window, lon, lat)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache_hits += 1
+            self._cache.move_to_end(key)
+            return cached
+        self._cache_misses += 1
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[pl.DataFrame] = loop.create_future()
+        if window not in self._pending:
+            self._pending[window] = []
+            self._timers[window] = loop.call_later(self.window, self._flush, window)
+        self._pending[window].append((lon, lat, future))
+        if len(self._pending[window]) >= self.max_batch:
+            self._timers[window].cancel()
+            self._flush(window)
+        df = await future
+
+        if self.cache_size > 0:
+            self._cache[key] = df
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return df
+
+    def _flush(self, window: _Window) -> None:
+        # called by the timer or when the batch is full, whichever is first
+        self._timers.pop(window, None)
+        points = self._pending.pop(window, None)
+        if points:
+            asyncio.ensure_future(self._predict_batch(window, points))
+
+    async def _predict_batch(
+        self,
+        window: _Window,
+        points: list[tuple[float, float, asyncio.Future[pl.DataFrame]]],
+    ) -> None:
+        self._batches += 1
+        self._coalesced += len(points)
+        self._largest_batch = max(self._largest_batch, len(points))
+        lons = np.array([p[0] for p in points])
+        lats = np.array([p[1] for p in points])
+        try:
+            df = await self.predict_stations(
+                window, lons, lats, list(range(len(points)))
+            )
+        except Exception as e:
+            if len(points) == 1:
+                points[0][2].set_exception(e)
+            else:
+                # one bad point must not fail the others
+                for point in points:
+                    asyncio.ensure_future(self._predict_batch(window, [point]))
+            return
+        for (station, part), (_, _, future) in zip(
+            df.partition_by("station", maintain_order=True, as_dict=True).items(),
+            points,
+        ):
+            future.set_result(part.drop("station"))
+
+    def metrics(self) -> dict:
+        """Latencies per endpoint, coalescing and cache statistics."""
+        return {
+            "endpoints": {
+                name: latency.summary() for name, latency in self._latency.items()
+            },
+            "coalescing": {
+                "batches": self._batches,
+                "points": self._coalesced,
+                "mean_batch": self._coalesced / self._batches if self._batches else 0,
+                "largest_batch": self._largest_batch,
+            },
+            "result_cache": {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "entries": len(self._cache),
+                "max_entries": self.cache_size,
+            },
+            "basis_cache": asdict(basis_cache.info()),
+            "disk_cache": None
+            if self.disk_cache is None
+            else asdict(self.disk_cache.info()),
+        }
+
+    async def _route(self, method: str, target: str, body: bytes) -> bytes:
+        url = urllib.parse.urlsplit(target)
+        match url.path, method:
+            case "/predict", "GET":
+                params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+                lon, lat = _float(params, "lon"), _float(params, "lat")
+                df = await self.predict_point(_window(params), lon, lat)
+                return df.write_json().encode()
+            case "/predict", "POST":
+                try:
+                    request = json.loads(body)
+                    stations = request["stations"]
+                    lons = np.array([s["lon"] for s in stations], dtype=float)
+                    lats = np.array([s["lat"] for s in stations], dtype=float)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise _HTTPError(
+                        HTTPStatus.BAD_REQUEST, f"Invalid request body: {e}"
+                    ) from e
+                ids = [s.get("id", i) for i, s in enumerate(stations)]
+                df = await self.predict_stations(_window(request), lons, lats, ids)
+                return df.write_json().encode()
+            case "/metrics", "GET":
+                return json.dumps(self.metrics()).encode()
+            case "/predict" | "/metrics", _:
+                raise _HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed")
+        raise _HTTPError(HTTPStatus.NOT_FOUND, f"No endpoint {url.path}")
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one HTTP request on a connection."""
+        started = time.perf_counter()
+        path = "invalid"
+        try:
+            try:
+                method, target, _ = (await reader.readline()).decode().split()
+                path = urllib.parse.urlsplit(target).path
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+            except ValueError as e:
+                raise _HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request") from e
+            try:
+                content = await self._route(method, target, body)
+            except ValueError as e:
+                raise _HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from e
+            status = HTTPStatus.OK
+        except _HTTPError as e:
+            status = e.status
+            content = json.dumps({"error": str(e)}).encode()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            content = json.dumps({"error": str(e)}).encode()
+
+        if path in ("/predict", "/metrics"):
+            self._latency.setdefault(path, _Latency()).add(
+                time.perf_counter() - started, status != HTTPStatus.OK
+            )
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(content)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            + content
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> asyncio.Server:
+        """Start listening, port 0 picks a free port."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        """Stop the worker threads."""
+        self._executor.shutdown()
+
+
+def _float(params: dict, name: str) -> float:
+    if name not in params:
+        raise ValueError(f"Missing parameter {name}")
+    return float(params[name])
+
+
+def _window(params: dict) -> _Window:
+    """The prediction window of a request, with the defaults of the CLI."""
+    start = (
+        datetime.fromisoformat(params["start"])
+        if params.get("start")
+        else datetime.combine(datetime.today(), datetime.min.time())
+    )
+    end = (
+        datetime.fromisoformat(params["end"])
+        if params.get("end")
+        else start + timedelta(days=1)
+    )
+    interval = float(params.get("interval", 30))
+    if interval <= 0:
+        raise ValueError("The interval must be positive")
+    lookup = params.get("lookup", "nearest")
+    if lookup not in _LOOKUPS:
+        raise ValueError(f"Unknown lookup {lookup!r}")
+    return _Window(
+        type=PredictionType(params.get("type", "level")),
+        lookup=lookup,
+        start=start,
+        end=end,
+        interval=timedelta(minutes=interval),
+    )
+
+
+def run(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 4,
+    window: float = 0.005,
+    disk_cache: ResultCache | None = None,
+) -> None:
+    """
+    Run the service until it is interrupted.
+
+    Parameters
+    ----------
+    host : str, optional
+        The address to listen on, default only local connections.
+    port : int, optional
+        The port, default 8000.
+    workers : int, optional
+        Number of worker threads.
+    window : float, optional
+        Seconds single point requests are collected for coalescing.
+    disk_cache : ResultCache, optional
+        Predictions stored on disk, default None.
+    """
+    service = PredictionService(workers=workers, window=window, disk_cache=disk_cache)
+
+    async def main() -> None:
+        server = await service.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()